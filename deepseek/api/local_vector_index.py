@@ -0,0 +1,319 @@
+"""
+进程内的 NumPy 向量索引，可替代 MilvusClient 用于小语料
+
+笔记本每次检索都依赖 MilvusClient(uri="./milvus_demo.db")。对 mfd.md 这样只有几十个片段的语料，
+这意味着一个很重的依赖和较慢的启动。LocalVectorClient 提供笔记本用到的同名接口:
+
+    has_collection / drop_collection / create_collection / insert / upsert / delete / search
+
+数据存放在 uri 目录下，每个 collection 五个文件:
+    <name>.vectors.npy   float32 向量，按容量翻倍预分配，用 mmap 打开，启动几乎不花时间
+    <name>.ids.npy       int64 主键，与向量按行对齐
+    <name>.offsets.npy   int64 (偏移, 长度)，每行的其他字段在 fields.jsonl 中的位置，与向量按行对齐
+    <name>.fields.jsonl  每行的其他字段(如 text)，只追加；检索时只读取命中的行
+    <name>.json          维度、度量、行数等少量元数据，大小与行数无关
+
+每次 insert / delete 只追加新行的字段并改写很小的元数据，写入量与批大小成正比。
+被删除或覆盖的行留在 fields.jsonl 里，失效部分超过有效部分时整体压缩一次。
+
+检索用一次矩阵乘法算出所有查询与所有向量的分数，再用 argpartition 取 top-k，
+支持一次传入多个查询。返回结构与 MilvusClient.search 相同:
+    [[{"id": ..., "distance": ..., "entity": {"text": ...}}, ...], ...]
+
+用法:
+    from local_vector_index import LocalVectorClient
+    milvus_client = LocalVectorClient(uri="./vector_index")  # 其余笔记本代码不变
+"""
+import os
+import json
+import threading
+
+import numpy as np
+
+METRICS = ("IP", "COSINE", "L2")
+INITIAL_CAPACITY = 1024
+COMPACT_MIN_BYTES = 1 << 20  # fields.jsonl 小于这个大小时不压缩
+SUFFIXES = (".json", ".vectors.npy", ".ids.npy", ".offsets.npy", ".fields.jsonl")
+
+
+class _Collection:
+    def __init__(self, directory, name):
+        self.base = os.path.join(directory, name)
+        with open(self.base + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dimension = meta["dimension"]
+        self.metric_type = meta["metric_type"]
+        self.count = meta["count"]
+        self.next_id = meta.get("next_id", 0)
+        self.fields_size = meta["fields_size"]
+        self.vectors = np.load(self.base + ".vectors.npy", mmap_mode="r+")
+        self.ids = np.load(self.base + ".ids.npy", mmap_mode="r+")
+        self.offsets = np.load(self.base + ".offsets.npy", mmap_mode="r+")
+        self.rows = {int(i): row for row, i in enumerate(self.ids[:self.count])}
+        self.live_bytes = int(self.offsets[:self.count, 1].sum())
+
+    @staticmethod
+    def create(directory, name, dimension, metric_type):
+        base = os.path.join(directory, name)
+        np.lib.format.open_memmap(base + ".vectors.npy", mode="w+", dtype=np.float32,
+                                  shape=(INITIAL_CAPACITY, dimension)).flush()
+        np.lib.format.open_memmap(base + ".ids.npy", mode="w+", dtype=np.int64,
+                                  shape=(INITIAL_CAPACITY,)).flush()
+        np.lib.format.open_memmap(base + ".offsets.npy", mode="w+", dtype=np.int64,
+                                  shape=(INITIAL_CAPACITY, 2)).flush()
+        open(base + ".fields.jsonl", "wb").close()
+        _Collection.write_meta(base, {"dimension": dimension, "metric_type": metric_type,
+                                      "count": 0, "next_id": 0, "fields_size": 0})
+
+    @staticmethod
+    def write_meta(base, meta):
+        tmp_path = base + ".json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, base + ".json")
+
+    def save(self):
+        if self.fields_size > max(2 * self.live_bytes, COMPACT_MIN_BYTES):
+            self.compact()
+        self.vectors.flush()
+        self.ids.flush()
+        self.offsets.flush()
+        self.write_meta(self.base, {"dimension": self.dimension, "metric_type": self.metric_type,
+                                    "count": self.count, "next_id": self.next_id,
+                                    "fields_size": self.fields_size})
+
+    def compact(self):
+        # 按行顺序重写 fields.jsonl，只保留现有行的字段
+        offsets = self.offsets[:self.count]
+        position = 0
+        with open(self.base + ".fields.jsonl", "rb") as src, \
+                open(self.base + ".fields.jsonl.tmp", "wb") as dst:
+            for row, (offset, length) in enumerate(offsets.tolist()):
+                src.seek(offset)
+                dst.write(src.read(length))
+                offsets[row, 0] = position
+                position += length
+        os.replace(self.base + ".fields.jsonl.tmp", self.base + ".fields.jsonl")
+        self.fields_size = position
+
+    def reserve(self, extra):
+        # 容量不够时翻倍，已有数据整体复制一次，均摊到每行是 O(1)
+        capacity = len(self.ids)
+        if self.count + extra <= capacity:
+            return
+        while capacity < self.count + extra:
+            capacity *= 2
+        suffixes = (".vectors.npy", ".ids.npy", ".offsets.npy")
+        arrays = (self.vectors, self.ids, self.offsets)
+        for suffix, old in zip(suffixes, arrays):
+            grown = np.lib.format.open_memmap(self.base + suffix + ".tmp", mode="w+", dtype=old.dtype,
+                                              shape=(capacity,) + old.shape[1:])
+            grown[:self.count] = old[:self.count]
+            grown.flush()
+            del grown
+        self.vectors = self.ids = self.offsets = arrays = old = None  # 先释放旧的映射再替换文件
+        for suffix in suffixes:
+            os.replace(self.base + suffix + ".tmp", self.base + suffix)
+        self.vectors = np.load(self.base + ".vectors.npy", mmap_mode="r+")
+        self.ids = np.load(self.base + ".ids.npy", mmap_mode="r+")
+        self.offsets = np.load(self.base + ".offsets.npy", mmap_mode="r+")
+
+    def read_fields(self, rows):
+        """按行号读取其他字段，返回 dict 列表"""
+        fields = []
+        with open(self.base + ".fields.jsonl", "rb") as f:
+            for offset, length in self.offsets[rows].tolist():
+                f.seek(offset)
+                fields.append(json.loads(f.read(length)))
+        return fields
+
+    def normalize(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None]
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"向量维度为 {vectors.shape[1]}，collection 要求 {self.dimension}")
+        if self.metric_type == "COSINE":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def insert(self, data):
+        # 重复主键以最后一次为准，包括同一批内的重复
+        latest = {}
+        for row in data:
+            if "id" in row:
+                i = int(row["id"])
+            else:
+                i = self.next_id
+                self.next_id += 1
+            latest.pop(i, None)
+            latest[i] = row
+        ids, data = list(latest), list(latest.values())
+        self.delete([i for i in ids if i in self.rows])
+        vectors = self.normalize([row["vector"] for row in data])
+        self.reserve(len(data))
+        lines = [json.dumps({k: v for k, v in row.items() if k not in ("id", "vector")},
+                            ensure_ascii=False).encode("utf-8") + b"\n" for row in data]
+        with open(self.base + ".fields.jsonl", "r+b") as f:
+            # 从已记录的末尾写起，覆盖之前写失败留下的残余
+            f.seek(self.fields_size)
+            f.write(b"".join(lines))
+            f.truncate()
+        lengths = np.array([len(line) for line in lines], dtype=np.int64)
+        start, end = self.count, self.count + len(data)
+        self.vectors[start:end] = vectors
+        self.ids[start:end] = ids
+        self.offsets[start:end, 0] = self.fields_size + np.cumsum(lengths) - lengths
+        self.offsets[start:end, 1] = lengths
+        for offset, i in enumerate(ids):
+            self.rows[i] = start + offset
+        self.count = end
+        self.fields_size += int(lengths.sum())
+        self.live_bytes += int(lengths.sum())
+        self.next_id = max(self.next_id, max(ids, default=-1) + 1)
+        self.save()
+        return ids
+
+    def delete(self, ids):
+        # 用最后一行填补被删除的行，保持数据连续
+        deleted = 0
+        for i in ids:
+            row = self.rows.pop(int(i), None)
+            if row is None:
+                continue
+            last = self.count - 1
+            self.live_bytes -= int(self.offsets[row, 1])
+            if row != last:
+                self.vectors[row] = self.vectors[last]
+                self.ids[row] = self.ids[last]
+                self.offsets[row] = self.offsets[last]
+                self.rows[int(self.ids[row])] = row
+            self.count -= 1
+            deleted += 1
+        return deleted
+
+    def search(self, queries, limit, output_fields):
+        queries = self.normalize(queries)
+        n = self.count
+        if n == 0:
+            return [[] for _ in range(len(queries))]
+        vectors = self.vectors[:n]
+        if self.metric_type == "L2":
+            # ||q - v||^2 = ||q||^2 - 2 q·v + ||v||^2，分数越大越近
+            scores = 2 * queries @ vectors.T - np.einsum("ij,ij->i", vectors, vectors)[None]
+            scores -= np.einsum("ij,ij->i", queries, queries)[:, None]
+        else:
+            scores = queries @ vectors.T
+        k = min(limit, n)
+        if k < n:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(n), (len(queries), n))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        if self.metric_type == "L2":
+            top_scores = -top_scores  # 与 Milvus 一致，L2 返回平方距离
+
+        fields = self.read_fields(top.ravel()) if output_fields else None
+        results = []
+        for q, (rows, distances) in enumerate(zip(top, top_scores)):
+            hits = []
+            for j, (row, distance) in enumerate(zip(rows.tolist(), distances.tolist())):
+                hits.append({
+                    "id": int(self.ids[row]),
+                    "distance": distance,
+                    "entity": {name: fields[q * k + j].get(name) for name in output_fields or []},
+                })
+            results.append(hits)
+        return results
+
+
+class LocalVectorClient:
+    """
+    MilvusClient 接口子集的本地实现
+
+    参数:
+        uri (str): 存放数据的目录；为了与笔记本兼容，以 .db 结尾时去掉后缀作为目录名
+    """
+
+    def __init__(self, uri="./vector_index", **kwargs):
+        if uri.endswith(".db"):
+            uri = uri[:-3]
+        self.directory = uri
+        os.makedirs(uri, exist_ok=True)
+        self.collections = {}
+        self.lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _get(self, collection_name):
+        if collection_name not in self.collections:
+            if not self.has_collection(collection_name):
+                raise ValueError(f"collection {collection_name} 不存在")
+            self.collections[collection_name] = _Collection(self.directory, collection_name)
+        return self.collections[collection_name]
+
+    def has_collection(self, collection_name, **kwargs):
+        return os.path.exists(self._path(collection_name) + ".json")
+
+    def list_collections(self, **kwargs):
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def create_collection(self, collection_name, dimension, metric_type="IP", consistency_level=None, **kwargs):
+        if metric_type not in METRICS:
+            raise ValueError(f"不支持的 metric_type: {metric_type}")
+        with self.lock:
+            if self.has_collection(collection_name):
+                raise ValueError(f"collection {collection_name} 已存在")
+            _Collection.create(self.directory, collection_name, dimension, metric_type)
+
+    def drop_collection(self, collection_name, **kwargs):
+        with self.lock:
+            self.collections.pop(collection_name, None)
+            for suffix in SUFFIXES:
+                path = self._path(collection_name) + suffix
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def insert(self, collection_name, data, **kwargs):
+        if isinstance(data, dict):
+            data = [data]
+        with self.lock:
+            ids = self._get(collection_name).insert(data)
+        return {"insert_count": len(ids), "ids": ids}
+
+    def upsert(self, collection_name, data, **kwargs):
+        # 插入时已按主键覆盖旧行
+        if isinstance(data, dict):
+            data = [data]
+        with self.lock:
+            ids = self._get(collection_name).insert(data)
+        return {"upsert_count": len(ids)}
+
+    def delete(self, collection_name, ids=None, **kwargs):
+        if ids is None:
+            raise ValueError("LocalVectorClient 只支持按 ids 删除")
+        if not isinstance(ids, (list, tuple)):
+            ids = [ids]
+        with self.lock:
+            collection = self._get(collection_name)
+            deleted = collection.delete(ids)
+            collection.save()
+        return {"delete_count": deleted}
+
+    def search(self, collection_name, data, limit=10, output_fields=None, search_params=None, **kwargs):
+        """data 为一个或多个查询向量，返回每个查询的 top-limit 结果列表"""
+        with self.lock:
+            collection = self._get(collection_name)
+            metric = (search_params or {}).get("metric_type", collection.metric_type)
+            if metric != collection.metric_type:
+                raise ValueError(f"collection 的度量是 {collection.metric_type}，不能按 {metric} 检索")
+            return collection.search(data, limit, output_fields)
+
+    def get_collection_stats(self, collection_name, **kwargs):
+        with self.lock:
+            return {"row_count": self._get(collection_name).count}
@@ -0,0 +1,178 @@
+"""
+流式、按 markdown 结构切分的 RAG 分块器
+
+笔记本用 file.read() 读入整个文件再按 "# " 切开，片段长短悬殊，内存随语料增长。
+这里改为逐行读取:
+    - 在 markdown 标题处断开，代码块(``` / ~~~)里的 # 不算标题
+    - 每个片段以所在的标题路径开头，例如 "中华人民共和国民法典 > （二）物权编 > 第一章 一般规定"
+    - 片段长度不超过 chunk_size，超长的段落按行、再按字符切开
+    - 同一节内相邻片段重叠 overlap，避免答案被切在边界上
+    - batched() 把片段流按固定大小分批，直接交给 embedding 和插入
+
+任何时刻内存里只有当前片段和一个段落，与文件大小无关。
+
+用法:
+    from rag_chunker import iter_chunks, batched
+    for batch in batched(iter_chunks("docs/**/*.md"), 64):
+        vectors = embedding_model.encode_documents([chunk.text for chunk in batch])
+"""
+import re
+import sys
+import argparse
+from glob import iglob
+from itertools import islice
+from collections import namedtuple
+
+DEFAULT_CHUNK_SIZE = 800
+DEFAULT_OVERLAP = 100
+HEADING_SEPARATOR = " > "
+
+HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+FENCES = ("```", "~~~")
+
+Chunk = namedtuple("Chunk", ["text", "source", "heading"])
+
+
+def iter_blocks(lines, max_chars):
+    """
+    把行流切成 ("heading", 标题路径) 和 ("text", 段落) 两种块
+
+    段落以空行分隔；单个段落超过 max_chars 个字符时提前断开，保证内存有界。
+    """
+    path = []  # [(级别, 标题)]
+    paragraph = []
+    size = 0
+    in_fence = False
+    for line in lines:
+        line = line.rstrip("\r\n")
+        stripped = line.lstrip()
+        if stripped[:3] in FENCES:
+            in_fence = not in_fence
+        # 先用首字符过滤，绝大多数行不需要跑正则
+        match = HEADING.match(line) if not in_fence and line[:1] == "#" else None
+        if match or (not in_fence and not stripped) or size > max_chars:
+            if paragraph:
+                yield "text", "\n".join(paragraph)
+                paragraph, size = [], 0
+        if match:
+            level = len(match.group(1))
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, match.group(2)))
+            yield "heading", HEADING_SEPARATOR.join(title for _, title in path)
+        elif in_fence or stripped:
+            paragraph.append(line)
+            size += len(line) + 1
+    if paragraph:
+        yield "text", "\n".join(paragraph)
+
+
+def split_long(text, budget, length_function=len):
+    """把超过预算的段落按行切开，单行仍超长时按字符切开"""
+    if budget < 1:
+        raise ValueError("budget 必须至少为 1")
+    if length_function(text) <= budget:
+        yield text
+        return
+    for line in text.split("\n"):
+        while length_function(line) > budget:
+            cut = budget
+            while cut > 1 and length_function(line[:cut]) > budget:
+                cut = cut * 3 // 4
+            yield line[:cut]
+            line = line[cut:]
+        if line:
+            yield line
+
+
+def chunk_lines(lines, source="", chunk_size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_OVERLAP, length_function=len):
+    """
+    把一个文件的行流切成 Chunk
+
+    参数:
+        lines (iterable[str]): 文件的行
+        source (str): 来源，写入 Chunk.source
+        chunk_size (int): 每个片段的预算(包括开头的标题路径)，按 length_function 计量
+        overlap (int): 同一节内相邻片段的重叠量，必须小于 chunk_size 的一半
+        length_function (callable): 计量函数，默认按字符；可换成分词器的 token 计数
+    """
+    if not 0 <= overlap < chunk_size // 2:
+        raise ValueError("overlap 必须小于 chunk_size 的一半")
+    heading = ""
+    pieces = []
+    size = 0
+    budget = chunk_size
+
+    def emit():
+        body = "\n\n".join(pieces)
+        return Chunk(f"{heading}\n\n{body}" if heading else body, source, heading)
+
+    for kind, value in iter_blocks(lines, max_chars=chunk_size * 8):
+        if kind == "heading":
+            if pieces:
+                yield emit()
+            heading, pieces, size = value, [], 0
+            # 标题路径也占预算，但至少给正文留一半
+            budget = max(chunk_size - length_function(heading) - 2, chunk_size // 2) if heading else chunk_size
+            continue
+        # 标题很长或 overlap 接近上限时预算可能不剩多少，至少按 1 切，否则会死循环
+        for piece in split_long(value, max(budget - overlap - 4, 1), length_function):
+            piece_size = length_function(piece) + 2
+            if pieces and size + piece_size > budget:
+                yield emit()
+                # 从上一个片段末尾取不超过 overlap 的内容作为下一片段的开头
+                tail, tail_size = [], 0
+                for previous in reversed(pieces):
+                    previous_size = length_function(previous) + 2
+                    if tail_size + previous_size > overlap:
+                        if not tail and overlap:
+                            tail = [previous[-overlap:]]
+                            tail_size = length_function(tail[0]) + 2
+                        break
+                    tail.insert(0, previous)
+                    tail_size += previous_size
+                pieces, size = tail, tail_size
+            pieces.append(piece)
+            size += piece_size
+    if pieces:
+        yield emit()
+
+
+def iter_chunks(pattern, chunk_size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_OVERLAP, length_function=len,
+                encoding="utf-8"):
+    """逐个文件、逐行地产出 glob 匹配到的所有文件的 Chunk"""
+    for file_path in iglob(pattern, recursive=True):
+        with open(file_path, "r", encoding=encoding) as file:
+            yield from chunk_lines(file, file_path, chunk_size, overlap, length_function)
+
+
+def batched(iterable, size):
+    """按固定大小分批，最后一批可能不足 size"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="预览 markdown 分块结果")
+    parser.add_argument("pattern", help="文件 glob，例如 mfd.md")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每个片段的字符数上限")
+    parser.add_argument("--overlap", type=int, default=DEFAULT_OVERLAP, help="相邻片段的重叠字符数")
+    parser.add_argument("--show", type=int, default=3, help="打印前几个片段")
+    args = parser.parse_args(argv)
+
+    count = total = longest = 0
+    for chunk in iter_chunks(args.pattern, args.chunk_size, args.overlap):
+        if count < args.show:
+            print(f"--- {chunk.source} | {chunk.heading}\n{chunk.text}\n")
+        count += 1
+        total += len(chunk.text)
+        longest = max(longest, len(chunk.text))
+    print(f"{count} chunks, average {total / max(count, 1):.0f} chars, longest {longest}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""
+Milvus RAG 的增量索引
+
+笔记本里每次运行都会 drop_collection，再把 mfd.md 的所有片段重新 embedding。
+这个模块改为:
+    1. 每个文本片段用 sha256 得到内容哈希，主键 id 也由哈希导出，内容不变 id 就不变
+    2. embedding 结果持久化到 SQLite，键为 (模型名, 内容哈希)，换机器/重启都能复用
+    3. 记录每个 collection 里已有哪些片段，只 upsert 新增的片段、delete 消失的片段
+
+用法:
+    from pymilvus import MilvusClient, model as milvus_model
+    from rag_chunker import iter_chunks
+    from rag_index import EmbeddingCache, IncrementalIndexer
+
+    indexer = IncrementalIndexer(MilvusClient(uri="./milvus_demo.db"), "my_mfd_rag_collection",
+                                 milvus_model.DefaultEmbeddingFunction(), EmbeddingCache("embedding_cache.db"))
+    print(indexer.sync(iter_chunks("mfd.md")))
+
+片段以流的方式分批处理，内存里只保留一批片段和已见过的 id。
+"""
+import sys
+import sqlite3
+import hashlib
+import threading
+import argparse
+
+import numpy as np
+
+from rag_chunker import iter_chunks, batched
+
+DEFAULT_CACHE_PATH = "embedding_cache.db"
+
+
+def chunk_hash(text):
+    """片段内容的 sha256 十六进制串"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(digest):
+    """由内容哈希导出 Milvus 的 int64 主键(取前8字节，保证非负)"""
+    return int(digest[:16], 16) & 0x7FFFFFFFFFFFFFFF
+
+
+def model_key(embedding_model):
+    """缓存中区分不同 embedding 模型的名字"""
+    return getattr(embedding_model, "model_name", None) or type(embedding_model).__name__
+
+
+class EmbeddingCache:
+    """
+    持久化的 embedding 缓存，同时记录每个 collection 已索引的片段
+
+    向量按 float32 原始字节存在 SQLite 里，读写都是批量的。
+    索引记录每改动一次，该 collection 的版本号加一，其他进程(如 rag_query_cache)据此判断检索结果是否过期。
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        # run_pipeline 的 embedding / 插入线程和 CachedRetriever 会在不同线程里使用同一个连接，
+        # 事务是整个连接共享的，所以每次读写都持有 lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, hash)
+            );
+            CREATE TABLE IF NOT EXISTS indexed (
+                collection TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (collection, id)
+            );
+            CREATE TABLE IF NOT EXISTS versions (
+                collection TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            );
+        """)
+
+    def get_many(self, model, hashes):
+        """返回 {hash: np.ndarray}，只包含命中的部分"""
+        found = {}
+        hashes = list(hashes)
+        with self.lock:
+            for start in range(0, len(hashes), 500):  # SQLite 对参数个数有上限
+                batch = hashes[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch])
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, vectors):
+        """vectors 为 {hash: 向量}"""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(model, digest, np.asarray(vector, dtype=np.float32).tobytes())
+                 for digest, vector in vectors.items()])
+
+    def indexed(self, collection):
+        """该 collection 已索引的 {id: hash}"""
+        with self.lock:
+            rows = self.conn.execute("SELECT id, hash FROM indexed WHERE collection = ?", (collection,))
+            return dict(rows)
+
+    def mark_indexed(self, collection, added, deleted):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM indexed WHERE collection = ? AND id = ?",
+                                  [(collection, i) for i in deleted])
+            self.conn.executemany("INSERT OR REPLACE INTO indexed (collection, id, hash) VALUES (?, ?, ?)",
+                                  [(collection, i, digest) for i, digest in added.items()])
+            self._bump(collection)
+
+    def forget(self, collection):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM indexed WHERE collection = ?", (collection,))
+            self._bump(collection)
+
+    def version(self, collection):
+        """该 collection 索引记录的版本号，从未改动过为 0"""
+        with self.lock:
+            row = self.conn.execute("SELECT version FROM versions WHERE collection = ?", (collection,)).fetchone()
+        return row[0] if row else 0
+
+    def _bump(self, collection):
+        # 与索引记录的改动在同一个事务里
+        self.conn.execute("INSERT OR IGNORE INTO versions (collection, version) VALUES (?, 0)", (collection,))
+        self.conn.execute("UPDATE versions SET version = version + 1 WHERE collection = ?", (collection,))
+
+    def close(self):
+        self.conn.close()
+
+
+def embed_documents(embedding_model, texts, cache, model=None, stats=None):
+    """
+    带缓存的 encode_documents
+
+    只有缓存里没有的片段才会交给模型，且一次调用完成。返回与 texts 同序的向量列表。
+    传入 stats 字典时，把交给模型计算的片段数累加到 stats["embedded"]。
+    """
+    model = model or model_key(embedding_model)
+    hashes = [chunk_hash(text) for text in texts]
+    vectors = cache.get_many(model, set(hashes))
+    missing = {}
+    for digest, text in zip(hashes, texts):
+        if digest not in vectors:
+            missing.setdefault(digest, text)
+    if missing:
+        encoded = embedding_model.encode_documents(list(missing.values()))
+        new_vectors = {digest: np.asarray(vector, dtype=np.float32)
+                       for digest, vector in zip(missing, encoded)}
+        cache.put_many(model, new_vectors)
+        vectors.update(new_vectors)
+        if stats is not None:
+            stats["embedded"] = stats.get("embedded", 0) + len(missing)
+    return [vectors[digest] for digest in hashes]
+
+
+class IncrementalIndexer:
+    """
+    让 collection 的内容与给定的片段集合保持一致，只改动变化的部分
+
+    参数:
+        client: MilvusClient 或接口相同的对象
+        collection_name (str): collection 名
+        embedding_model: 有 encode_documents 方法的模型
+        cache (EmbeddingCache): embedding 缓存与索引记录
+        metric_type (str): 新建 collection 时的距离度量
+        batch_size (int): 每次 embedding / upsert 的片段数
+    """
+
+    def __init__(self, client, collection_name, embedding_model, cache,
+                 metric_type="IP", batch_size=256):
+        self.client = client
+        self.collection_name = collection_name
+        self.embedding_model = embedding_model
+        self.cache = cache
+        self.model = model_key(embedding_model)
+        self.metric_type = metric_type
+        self.batch_size = batch_size
+
+    def ensure_collection(self, dimension):
+        if self.client.has_collection(self.collection_name):
+            if self.cache.indexed(self.collection_name):
+                return
+            # 没有索引记录(例如由笔记本按 0..n 编号建立)，无法增量，重建一次
+            self.client.drop_collection(self.collection_name)
+        self.cache.forget(self.collection_name)
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            dimension=dimension,
+            metric_type=self.metric_type,
+            consistency_level="Strong",
+        )
+
+    def sync(self, chunks):
+        """
+        同步片段，返回统计 {"added", "deleted", "unchanged", "embedded"}
+
+        chunks 可以是字符串或 rag_chunker.Chunk 的任意可迭代对象，按 batch_size 分批流式处理。
+        embedded 是实际交给模型计算的片段数，其余的来自缓存。
+        """
+        existing = self.cache.indexed(self.collection_name)
+        if not self.client.has_collection(self.collection_name):
+            existing = {}
+        seen = set()
+        stats = {"added": 0, "deleted": 0, "unchanged": 0, "embedded": 0}
+        ready = False
+
+        for batch in batched(chunks, self.batch_size):
+            new = {}
+            for chunk in batch:
+                text = getattr(chunk, "text", chunk)
+                if not text.strip():
+                    continue
+                digest = chunk_hash(text)
+                i = chunk_id(digest)
+                if i in seen:
+                    continue
+                seen.add(i)
+                if i in existing:
+                    stats["unchanged"] += 1
+                else:
+                    new[i] = (digest, text)
+            if not new:
+                continue
+
+            ids = list(new)
+            texts = [new[i][1] for i in ids]
+            vectors = embed_documents(self.embedding_model, texts, self.cache, self.model, stats)
+            if not ready:
+                self.ensure_collection(len(vectors[0]))
+                ready = True
+            self.client.upsert(
+                collection_name=self.collection_name,
+                data=[{"id": i, "vector": vector, "text": text}
+                      for i, vector, text in zip(ids, vectors, texts)])
+            self.cache.mark_indexed(self.collection_name, {i: new[i][0] for i in ids}, [])
+            stats["added"] += len(ids)
+
+        to_delete = [i for i in existing if i not in seen]
+        if to_delete and self.client.has_collection(self.collection_name):
+            for ids in batched(to_delete, self.batch_size):
+                self.client.delete(collection_name=self.collection_name, ids=ids)
+                self.cache.mark_indexed(self.collection_name, {}, ids)
+            stats["deleted"] = len(to_delete)
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="增量更新 Milvus RAG collection")
+    parser.add_argument("pattern", help="要索引的文件 glob，例如 mfd.md")
+    parser.add_argument("--uri", default="./milvus_demo.db", help="MilvusClient 的 uri")
+    parser.add_argument("--collection", default="my_mfd_rag_collection", help="collection 名")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="embedding 缓存文件")
+    parser.add_argument("--chunk-size", type=int, default=800, help="每个片段的字符数上限")
+    parser.add_argument("--overlap", type=int, default=100, help="相邻片段的重叠字符数")
+    args = parser.parse_args(argv)
+
+    from pymilvus import MilvusClient, model as milvus_model
+
+    cache = EmbeddingCache(args.cache)
+    indexer = IncrementalIndexer(MilvusClient(uri=args.uri), args.collection,
+                                 milvus_model.DefaultEmbeddingFunction(), cache)
+    stats = indexer.sync(iter_chunks(args.pattern, args.chunk_size, args.overlap))
+    cache.close()
+    print(f"added: {stats['added']}, deleted: {stats['deleted']}, "
+          f"unchanged: {stats['unchanged']}, embedded: {stats['embedded']}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+分块 → embedding → 插入 的三段流水线
+
+笔记本先把整个语料 embedding 完，再用 tqdm 循环拼出 data 列表，最后一次 insert 全部数据，
+三个步骤完全串行。这里把它们放进三个阶段，之间用有界队列连接:
+
+    分块线程 --(embed_queue)--> N 个 embedding 线程 --(insert_queue)--> 插入线程
+
+    - 第 N+1 批在 embedding 的同时，第 N 批在插入
+    - 队列有上限，某个阶段慢了，上游会阻塞等待，内存不会堆积
+    - 每个阶段统计处理的片段数、忙碌时间和吞吐量(片段/秒)，并定期打印进度
+    - 主键由内容哈希导出(与 rag_index 相同)，内容相同的片段只 embedding 和写入一次，
+      写入用 upsert，重复运行不会产生重复行
+    - 传入 EmbeddingCache 时复用其中已有的向量、保存新算出的向量，并写入索引记录，
+      之后可以接着用 IncrementalIndexer.sync 增量更新
+
+embedding 模型(ONNX / torch)在计算时会释放 GIL，因此用线程就能并行。
+
+用法:
+    from rag_chunker import iter_chunks
+    from rag_pipeline import run_pipeline
+    stats = run_pipeline(iter_chunks("mfd.md"), embedding_model, milvus_client, "my_mfd_rag_collection")
+"""
+import sys
+import time
+import queue
+import argparse
+import threading
+
+from rag_chunker import iter_chunks, batched
+from rag_index import DEFAULT_CACHE_PATH, EmbeddingCache, chunk_hash, chunk_id, embed_documents, model_key
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_INSERT_BATCH_SIZE = 512
+DEFAULT_EMBED_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 4
+PROGRESS_INTERVAL = 2.0  # 秒
+
+_DONE = object()  # 队列结束标记
+
+
+class StageStats:
+    """一个阶段的计数和计时"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy = 0.0  # 真正在干活(不含等队列)的秒数
+        self.lock = threading.Lock()
+
+    def add(self, items, seconds):
+        with self.lock:
+            self.items += items
+            self.batches += 1
+            self.busy += seconds
+
+    def summary(self, elapsed):
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy, 3),
+            "items_per_sec": self.items / elapsed if elapsed > 0 else 0.0,
+            "busy_items_per_sec": self.items / self.busy if self.busy > 0 else 0.0,
+        }
+
+
+def _put(q, item, stop):
+    # 队列满时阻塞，但出错后能及时退出
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _DONE
+
+
+def print_progress(stats, elapsed):
+    parts = [f"{s.name}: {s.items} ({s.items / elapsed:.0f}/s)" for s in stats]
+    print(f"[{elapsed:6.1f}s] " + " | ".join(parts), flush=True)
+
+
+def run_pipeline(chunks, embedding_model, client, collection_name,
+                 batch_size=DEFAULT_BATCH_SIZE, insert_batch_size=DEFAULT_INSERT_BATCH_SIZE,
+                 embed_workers=DEFAULT_EMBED_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 metric_type="IP", on_progress=print_progress, progress_interval=PROGRESS_INTERVAL,
+                 cache=None):
+    """
+    把片段流 embedding 后批量插入 collection
+
+    参数:
+        chunks (iterable): 字符串或 rag_chunker.Chunk
+        embedding_model: 有 encode_documents 方法的模型
+        client: MilvusClient 或接口相同的对象；collection 不存在时按第一批向量的维度创建
+        collection_name (str): collection 名
+        batch_size (int): 每次 encode_documents 的片段数
+        insert_batch_size (int): 每次 insert 的行数
+        embed_workers (int): embedding 线程数
+        queue_size (int): 每个队列最多缓存的批数
+        metric_type (str): 新建 collection 时的距离度量
+        on_progress (callable): 定期调用 on_progress(阶段统计列表, 已用秒数)，None 表示不打印
+        cache (EmbeddingCache): 不为 None 时，embedding 先查缓存，每批写入后把 {id: 内容哈希} 记入它的索引记录
+
+    返回:
+        dict: {阶段名: 统计}，另有 "elapsed" 总耗时和 "embedded"(实际交给模型计算的片段数，
+        其余来自缓存)。chunk 阶段只统计去重后的片段。
+
+    异常:
+        任一阶段抛出的异常会停止整条流水线，并在调用线程中重新抛出
+    """
+    chunk_stats, embed_stats, insert_stats = StageStats("chunk"), StageStats("embed"), StageStats("insert")
+    stages = [chunk_stats, embed_stats, insert_stats]
+    embed_queue = queue.Queue(maxsize=queue_size)
+    insert_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    model = model_key(embedding_model)
+    embedded = [0]
+    embedded_lock = threading.Lock()
+
+    def guarded(target):
+        def run():
+            try:
+                target()
+            except BaseException as e:  # 交给调用线程重新抛出
+                errors.append(e)
+                stop.set()
+        return run
+
+    def produce():
+        iterator = iter(batched(chunks, batch_size))
+        seen = set()  # 相同内容得到相同的 id，只处理第一次出现的
+        while True:
+            start = time.perf_counter()
+            batch = next(iterator, None)
+            if batch is None:
+                break
+            rows = []
+            for chunk in batch:
+                text = getattr(chunk, "text", chunk)
+                if not text.strip():
+                    continue
+                digest = chunk_hash(text)
+                i = chunk_id(digest)
+                if i not in seen:
+                    seen.add(i)
+                    rows.append((i, digest, text))
+            chunk_stats.add(len(rows), time.perf_counter() - start)
+            if rows and not _put(embed_queue, rows, stop):
+                return
+        for _ in range(embed_workers):
+            _put(embed_queue, _DONE, stop)
+
+    def embed():
+        while True:
+            rows = _get(embed_queue, stop)
+            if rows is _DONE:
+                break
+            start = time.perf_counter()
+            texts = [text for _, _, text in rows]
+            if cache is None:
+                vectors = embedding_model.encode_documents(texts)
+                computed = len(texts)
+            else:
+                counts = {}
+                vectors = embed_documents(embedding_model, texts, cache, model, counts)
+                computed = counts.get("embedded", 0)
+            embed_stats.add(len(rows), time.perf_counter() - start)
+            with embedded_lock:
+                embedded[0] += computed
+            if not _put(insert_queue, (rows, vectors), stop):
+                return
+        _put(insert_queue, _DONE, stop)
+
+    def insert():
+        finished = 0
+        rows = []
+        ready = False
+        while finished < embed_workers:
+            item = _get(insert_queue, stop)
+            if item is _DONE:
+                if stop.is_set():
+                    return
+                finished += 1
+            else:
+                batch, vectors = item
+                rows.extend((i, digest, text, vector) for (i, digest, text), vector in zip(batch, vectors))
+            while len(rows) >= insert_batch_size or (rows and finished == embed_workers):
+                batch, rows = rows[:insert_batch_size], rows[insert_batch_size:]
+                start = time.perf_counter()
+                if not ready:
+                    if not client.has_collection(collection_name):
+                        client.create_collection(collection_name=collection_name,
+                                                 dimension=len(batch[0][3]),
+                                                 metric_type=metric_type, consistency_level="Strong")
+                    ready = True
+                client.upsert(collection_name=collection_name,
+                              data=[{"id": i, "vector": vector, "text": text} for i, _, text, vector in batch])
+                if cache is not None:
+                    cache.mark_indexed(collection_name, {i: digest for i, digest, _, _ in batch}, [])
+                insert_stats.add(len(batch), time.perf_counter() - start)
+
+    threads = [threading.Thread(target=guarded(produce), name="rag-chunk")]
+    threads += [threading.Thread(target=guarded(embed), name=f"rag-embed-{i}") for i in range(embed_workers)]
+    threads.append(threading.Thread(target=guarded(insert), name="rag-insert"))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    last_report = started
+    try:
+        while any(thread.is_alive() for thread in threads):
+            threads[-1].join(0.1)
+            now = time.perf_counter()
+            if on_progress and now - last_report >= progress_interval:
+                on_progress(stages, now - started)
+                last_report = now
+    except KeyboardInterrupt:
+        stop.set()
+        raise
+    finally:
+        stop.set()  # 插入线程结束后，让可能还在等队列的线程退出
+        for thread in threads:
+            thread.join()
+
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise errors[0]
+    if on_progress:
+        on_progress(stages, elapsed)
+    result = {s.name: s.summary(elapsed) for s in stages}
+    result["elapsed"] = elapsed
+    result["embedded"] = embedded[0]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="流水线方式把 markdown 文件导入 Milvus")
+    parser.add_argument("pattern", help="文件 glob，例如 mfd.md")
+    parser.add_argument("--uri", default="./milvus_demo.db", help="MilvusClient 的 uri")
+    parser.add_argument("--collection", default="my_mfd_rag_collection", help="collection 名")
+    parser.add_argument("--drop", action="store_true", help="先删除已有的 collection")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="记录已索引片段的缓存文件，与 rag_index 共用")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="每批 embedding 的片段数")
+    parser.add_argument("--insert-batch-size", type=int, default=DEFAULT_INSERT_BATCH_SIZE, help="每次插入的行数")
+    parser.add_argument("--workers", type=int, default=DEFAULT_EMBED_WORKERS, help="embedding 线程数")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="阶段之间最多缓存的批数")
+    args = parser.parse_args(argv)
+
+    from pymilvus import MilvusClient, model as milvus_model
+
+    client = MilvusClient(uri=args.uri)
+    cache = EmbeddingCache(args.cache)
+    if args.drop:
+        if client.has_collection(args.collection):
+            client.drop_collection(args.collection)
+        cache.forget(args.collection)
+    try:
+        stats = run_pipeline(iter_chunks(args.pattern), milvus_model.DefaultEmbeddingFunction(), client,
+                             args.collection, args.batch_size, args.insert_batch_size, args.workers,
+                             args.queue_size, cache=cache)
+    finally:
+        cache.close()
+    for name in ("chunk", "embed", "insert"):
+        s = stats[name]
+        print(f"{name:<8}{s['items']:>8} chunks  {s['items_per_sec']:>10.1f}/s  busy {s['busy_seconds']:.2f}s")
+    print(f"embedded: {stats['embedded']}, from cache: {stats['embed']['items'] - stats['embedded']}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+检索侧的缓存: 问题的 embedding 和 top-k 检索结果
+
+笔记本里每个问题都要 encode_queries([question]) 再 milvus_client.search 一次，
+而线上的大部分问题是重复的或只差空格、大小写、标点。这个模块在检索前加两层缓存:
+
+    1. 查询向量缓存，键为 (模型名, 规范化后的问题)，与 collection 内容无关
+    2. 检索结果缓存，键为 (collection 版本, 规范化后的问题, limit, output_fields)
+
+两层都是有容量上限的 LRU，条目超过 ttl 秒后过期。
+
+collection 版本由两部分组成，任一部分变化后旧版本的检索结果不再命中，之后按 LRU 被淘汰:
+    - 持久化的版本号: rag_index / rag_pipeline 每次写索引记录时，在 EmbeddingCache 的
+      SQLite 文件里给 collection 的版本号加一。把同一个缓存文件交给 CachedRetriever，
+      另一个进程(例如命令行)重新索引后，正在服务的检索器下一次查询就能发现
+    - 进程内的版本号: VersionedClient 包装 MilvusClient(或 LocalVectorClient)，
+      每次通过它 insert / upsert / delete / create / drop 时加一，适合不经过索引记录的直接修改
+两者都没有覆盖到的修改(例如笔记本直接 drop 后重建)只能等 ttl 过期或调用 invalidate()。
+
+用法:
+    from rag_index import EmbeddingCache
+    from rag_query_cache import VersionedClient, CachedRetriever
+    milvus_client = VersionedClient(MilvusClient(uri="./milvus_demo.db"))
+    retriever = CachedRetriever(embedding_model, milvus_client, "my_mfd_rag_collection",
+                                cache=EmbeddingCache("embedding_cache.db"))
+    search_res = retriever.search(question)  # 与 milvus_client.search(...) 的返回结构相同
+    print(retriever.stats())
+"""
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from rag_index import model_key
+
+DEFAULT_MAXSIZE = 1024
+DEFAULT_TTL = 600.0  # 秒
+
+_SPACES = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = "?？!！.。,，;；:： "
+
+# 会改变 collection 内容的 MilvusClient 方法
+_MUTATIONS = ("insert", "upsert", "delete", "create_collection", "drop_collection")
+
+
+def normalize_question(question):
+    """
+    规范化问题作为缓存键: 全角转半角、统一大小写、合并空白、去掉结尾的标点
+
+    例如 " 离婚冷静期是多久？" 与 "离婚冷静期是多久?" 得到相同的键。
+    """
+    question = unicodedata.normalize("NFKC", question)
+    question = _SPACES.sub(" ", question).strip().casefold()
+    return question.rstrip(_TRAILING_PUNCTUATION)
+
+
+class TTLCache:
+    """
+    线程安全的 LRU 缓存，条目超过 ttl 秒过期
+
+    参数:
+        maxsize (int): 最多保留的条目数，0 表示不缓存
+        ttl (float): 条目的存活秒数，None 表示不过期
+        clock (callable): 返回当前秒数，测试时可以替换
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.data = OrderedDict()  # key -> (过期时间, 值)
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > self.clock():
+                    self.data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self.data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires = self.clock() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            self.data[key] = (expires, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class VersionedClient:
+    """
+    包装 MilvusClient，为每个 collection 维护一个修改版本号
+
+    除 version() 外，所有属性和方法都转发给被包装的 client。
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def version(self, collection_name):
+        return self.versions.get(collection_name, 0)
+
+    def bump(self, collection_name):
+        with self.lock:
+            self.versions[collection_name] = self.versions.get(collection_name, 0) + 1
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name not in _MUTATIONS:
+            return attr
+
+        def mutate(*args, **kwargs):
+            collection_name = kwargs.get("collection_name", args[0] if args else None)
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                # 调用失败也可能已经改了一部分数据，保守地让缓存失效
+                self.bump(collection_name)
+        return mutate
+
+
+class CachedRetriever:
+    """
+    带缓存的 encode_queries + search
+
+    参数:
+        embedding_model: 有 encode_queries 方法的模型
+        client: VersionedClient 或普通 client(没有进程内版本号)
+        collection_name (str): collection 名
+        cache (EmbeddingCache): 与索引程序共用的缓存文件，用于读取持久化的版本号；
+            为 None 且 client 不是 VersionedClient 时只能靠 ttl 和 invalidate() 失效
+        limit (int): 默认返回的结果数
+        output_fields (list): 默认返回的字段
+        search_params (dict): 传给 client.search 的检索参数
+        maxsize (int): 每层缓存的条目上限
+        ttl (float): 条目的存活秒数
+    """
+
+    def __init__(self, embedding_model, client, collection_name, limit=3, output_fields=("text",),
+                 search_params=None, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, clock=time.monotonic,
+                 cache=None):
+        self.embedding_model = embedding_model
+        self.client = client
+        self.collection_name = collection_name
+        self.cache = cache
+        self.limit = limit
+        self.output_fields = tuple(output_fields)
+        self.search_params = search_params or {"metric_type": "IP", "params": {}}
+        self.model = model_key(embedding_model)
+        self.embeddings = TTLCache(maxsize, ttl, clock)
+        self.results = TTLCache(maxsize, ttl, clock)
+
+    def version(self):
+        """(进程内版本号, 持久化版本号)"""
+        version = getattr(self.client, "version", None)
+        local = version(self.collection_name) if version else 0
+        stored = self.cache.version(self.collection_name) if self.cache is not None else 0
+        return local, stored
+
+    def encode(self, questions):
+        """返回与 questions 同序的查询向量，缓存里没有的一次交给模型计算"""
+        keys = [(self.model, normalize_question(q)) for q in questions]
+        vectors = [self.embeddings.get(key) for key in keys]
+        missing = {}
+        for key, question, vector in zip(keys, questions, vectors):
+            if vector is None:
+                missing.setdefault(key, question)
+        if missing:
+            encoded = self.embedding_model.encode_queries(list(missing.values()))
+            for key, vector in zip(missing, encoded):
+                self.embeddings.put(key, vector)
+                missing[key] = vector
+            vectors = [missing[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def search_many(self, questions, limit=None, output_fields=None):
+        """
+        检索多个问题，返回每个问题的结果列表(与 client.search 的返回结构相同)
+
+        未命中的问题合成一次 encode_queries 和一次 search。返回的结果与缓存共享，不要原地修改。
+        """
+        limit = limit or self.limit
+        output_fields = tuple(output_fields or self.output_fields)
+        version = self.version()
+        keys = [(version, normalize_question(q), limit, output_fields) for q in questions]
+        results = [self.results.get(key) for key in keys]
+        missing = {}
+        for key, question, hits in zip(keys, questions, results):
+            if hits is None:
+                missing.setdefault(key, question)
+        if missing:
+            found = self.client.search(
+                collection_name=self.collection_name,
+                data=self.encode(list(missing.values())),
+                limit=limit,
+                search_params=self.search_params,
+                output_fields=list(output_fields),
+            )
+            # 检索期间 collection 被修改时，结果属于哪个版本不确定，不写入缓存
+            cacheable = self.version() == version
+            for key, hits in zip(missing, found):
+                if cacheable:
+                    self.results.put(key, hits)
+                missing[key] = hits
+            results = [missing[key] if hits is None else hits for key, hits in zip(keys, results)]
+        return results
+
+    def search(self, question, limit=None, output_fields=None):
+        """检索单个问题，返回值可以直接替换笔记本里的 search_res"""
+        return self.search_many([question], limit, output_fields)
+
+    def invalidate(self):
+        """丢弃所有检索结果(查询向量与 collection 无关，保留)"""
+        self.results.clear()
+
+    def stats(self):
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
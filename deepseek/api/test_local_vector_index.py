@@ -0,0 +1,120 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import local_vector_index
+from local_vector_index import LocalVectorClient
+
+DIM = 16
+
+
+def brute_force(vectors, queries, metric, limit):
+    """逐个计算距离再排序，作为检索结果的参照"""
+    if metric == "COSINE":
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    results = []
+    for query in queries:
+        if metric == "L2":
+            distances = [float(np.sum((query - v) ** 2)) for v in vectors]
+            order = np.argsort(distances, kind="stable")
+        else:
+            distances = [float(np.dot(query, v)) for v in vectors]
+            order = np.argsort([-d for d in distances], kind="stable")
+        results.append([(int(i), distances[i]) for i in order[:limit]])
+    return results
+
+
+class TestLocalVectorClient(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.uri = os.path.join(self.tmp.name, "milvus_demo.db")
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fill(self, client, metric, n=300):
+        vectors = self.rng.standard_normal((n, DIM)).astype(np.float32)
+        client.create_collection("c", dimension=DIM, metric_type=metric)
+        client.insert("c", [{"id": i, "vector": v, "text": "片段%d" % i} for i, v in enumerate(vectors)])
+        return vectors
+
+    def assert_matches(self, client, vectors, metric, limit=10):
+        queries = self.rng.standard_normal((5, DIM)).astype(np.float32)
+        found = client.search("c", queries, limit=limit, output_fields=["text"],
+                              search_params={"metric_type": metric, "params": {}})
+        for hits, expected in zip(found, brute_force(vectors, queries, metric, limit)):
+            self.assertEqual([hit["id"] for hit in hits], [i for i, _ in expected])
+            np.testing.assert_allclose([hit["distance"] for hit in hits], [d for _, d in expected],
+                                       rtol=1e-4, atol=1e-4)
+            self.assertEqual([hit["entity"]["text"] for hit in hits], ["片段%d" % i for i, _ in expected])
+
+    def test_top_k_matches_brute_force(self):
+        """测试三种度量的 top-k 与逐个计算的结果一致，重新打开后也一致"""
+        for metric in ("IP", "L2", "COSINE"):
+            with self.subTest(metric=metric):
+                client = LocalVectorClient(self.uri)
+                vectors = self.fill(client, metric)
+                self.assert_matches(client, vectors, metric)
+                self.assert_matches(LocalVectorClient(self.uri), vectors, metric)
+                self.assert_matches(client, vectors, metric, limit=1000)
+                client.drop_collection("c")
+                self.assertFalse(os.listdir(os.path.dirname(client._path("c"))))
+
+    def test_upsert_and_delete(self):
+        """测试覆盖和删除后，检索结果和字段仍与剩下的行对应"""
+        client = LocalVectorClient(self.uri)
+        vectors = self.fill(client, "IP", n=50)
+        replaced = self.rng.standard_normal((10, DIM)).astype(np.float32)
+        client.upsert("c", [{"id": i, "vector": v, "text": "片段%d" % i} for i, v in enumerate(replaced)])
+        vectors[:10] = replaced
+        self.assertEqual(client.delete("c", ids=[3, 20, 49, 999]), {"delete_count": 3})
+        keep = [i for i in range(50) if i not in (3, 20, 49)]
+        reopened = LocalVectorClient(self.uri)
+        self.assertEqual(reopened.get_collection_stats("c"), {"row_count": 47})
+        queries = self.rng.standard_normal((3, DIM)).astype(np.float32)
+        for c in (client, reopened):
+            for hits, expected in zip(c.search("c", queries, limit=5, output_fields=["text"]),
+                                      brute_force(vectors[keep], queries, "IP", 5)):
+                self.assertEqual([hit["id"] for hit in hits], [keep[i] for i, _ in expected])
+                self.assertEqual([hit["entity"]["text"] for hit in hits],
+                                 ["片段%d" % keep[i] for i, _ in expected])
+
+    def test_writes_are_proportional_to_batch(self):
+        """测试每批写入只追加这一批的字段，元数据大小不随行数增长"""
+        client = LocalVectorClient(self.uri)
+        client.create_collection("c", dimension=DIM)
+        base = client._path("c")
+        sizes = []
+        for start in range(0, 2000, 100):
+            client.insert("c", [{"id": i, "vector": self.rng.standard_normal(DIM), "text": "x" * 100}
+                                for i in range(start, start + 100)])
+            sizes.append((os.path.getsize(base + ".fields.jsonl"), os.path.getsize(base + ".json")))
+        growth = {b - a for (a, _), (b, _) in zip(sizes, sizes[1:])}
+        self.assertEqual(len(growth), 1)
+        self.assertLess(max(meta for _, meta in sizes), 200)
+
+    def test_compaction_keeps_fields(self):
+        """测试反复覆盖后 fields.jsonl 会被压缩，字段内容不变"""
+        client = LocalVectorClient(self.uri)
+        client.create_collection("c", dimension=DIM)
+        base = client._path("c")
+        old_limit = local_vector_index.COMPACT_MIN_BYTES
+        local_vector_index.COMPACT_MIN_BYTES = 0
+        try:
+            for generation in range(5):
+                client.upsert("c", [{"id": i, "vector": np.eye(DIM)[i % DIM], "text": "%d-%d" % (generation, i)}
+                                    for i in range(40)])
+        finally:
+            local_vector_index.COMPACT_MIN_BYTES = old_limit
+        self.assertLessEqual(os.path.getsize(base + ".fields.jsonl"), 2 * 40 * len(b'{"text": "4-00"}\n'))
+        for c in (client, LocalVectorClient(self.uri)):
+            hits = c.search("c", np.eye(DIM)[:1], limit=3, output_fields=["text"])[0]
+            self.assertEqual(sorted(hit["entity"]["text"] for hit in hits), ["4-0", "4-16", "4-32"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import threading
+import unittest
+from rag_chunker import Chunk, chunk_lines, iter_blocks, iter_chunks, split_long, batched
+
+def run_with_timeout(test, function, seconds=5):
+    """在线程里执行，超时则判定失败，避免死循环卡住整个测试"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function()), daemon=True)
+    thread.start()
+    thread.join(seconds)
+    test.assertFalse(thread.is_alive(), "分块没有在限定时间内结束")
+    return result[0]
+
+class TestBlocks(unittest.TestCase):
+    def test_heading_path(self):
+        """测试标题路径按级别嵌套，同级标题替换前一个"""
+        lines = ["# 民法典", "## 物权编", "正文一", "## 合同编", "### 第一章", "正文二"]
+        blocks = list(iter_blocks(lines, max_chars=1000))
+        self.assertEqual(blocks, [
+            ("heading", "民法典"),
+            ("heading", "民法典 > 物权编"),
+            ("text", "正文一"),
+            ("heading", "民法典 > 合同编"),
+            ("heading", "民法典 > 合同编 > 第一章"),
+            ("text", "正文二"),
+        ])
+
+    def test_hash_inside_fence_is_not_heading(self):
+        """测试代码块里的 # 不当作标题，代码块内的空行也不断开段落"""
+        lines = ["# 标题", "```python", "# 注释", "", "x = 1", "```", "", "~~~", "# 也是代码", "~~~"]
+        blocks = list(iter_blocks(lines, max_chars=1000))
+        self.assertEqual([kind for kind, _ in blocks], ["heading", "text", "text"])
+        self.assertEqual(blocks[1][1], "```python\n# 注释\n\nx = 1\n```")
+        self.assertIn("# 也是代码", blocks[2][1])
+
+    def test_paragraphs_split_on_blank_lines(self):
+        blocks = list(iter_blocks(["第一段", "续行", "", "第二段"], max_chars=1000))
+        self.assertEqual(blocks, [("text", "第一段\n续行"), ("text", "第二段")])
+
+class TestSplitLong(unittest.TestCase):
+    def test_pieces_fit_budget(self):
+        """测试超长段落先按行、再按字符切开，且不丢内容"""
+        text = "短行\n" + "长" * 25 + "\n尾"
+        pieces = list(split_long(text, 10))
+        self.assertTrue(all(0 < len(piece) <= 10 for piece in pieces))
+        self.assertEqual("".join(pieces), text.replace("\n", ""))
+
+    def test_rejects_empty_budget(self):
+        with self.assertRaises(ValueError):
+            list(split_long("abc", 0))
+
+class TestChunkLines(unittest.TestCase):
+    def test_chunks_stay_within_budget(self):
+        """测试片段(含标题路径)长度不超过 chunk_size"""
+        lines = ["# 总则", "## 第一章"]
+        for i in range(40):
+            lines += ["第%d条 " % i + "规定" * (i % 7 + 1) * 5, ""]
+        chunks = list(chunk_lines(lines, "law.md", chunk_size=120, overlap=20))
+        self.assertGreater(len(chunks), 5)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk.text), 120)
+            self.assertTrue(chunk.text.startswith("总则 > 第一章\n\n"))
+            self.assertEqual(chunk.source, "law.md")
+            self.assertEqual(chunk.heading, "总则 > 第一章")
+
+    def test_overlap_repeats_previous_tail(self):
+        """测试同一节内相邻片段的开头重复上一片段的结尾"""
+        lines = []
+        for i in range(30):
+            lines += ["段落%02d" % i, ""]
+        chunks = [chunk.text for chunk in chunk_lines(lines, chunk_size=40, overlap=10)]
+        self.assertGreater(len(chunks), 3)
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertEqual(current.split("\n\n")[0], previous.split("\n\n")[-1])
+
+    def test_no_overlap_across_headings(self):
+        lines = ["# 甲", "甲的内容", "# 乙", "乙的内容"]
+        chunks = list(chunk_lines(lines, chunk_size=100, overlap=10))
+        self.assertEqual(chunks, [Chunk("甲\n\n甲的内容", "", "甲"), Chunk("乙\n\n乙的内容", "", "乙")])
+
+    def test_overlap_must_be_less_than_half(self):
+        with self.assertRaises(ValueError):
+            list(chunk_lines(["x"], chunk_size=100, overlap=50))
+
+    def test_tiny_budget_terminates(self):
+        """测试长标题或 overlap 接近上限时不会死循环"""
+        cases = [
+            (["# " + "h" * 60, "x" * 200], 100, 49),
+            (["abcdefghij"], 6, 2),
+            (["# " + "标题" * 40, "正文" * 100], 50, 24),
+        ]
+        for lines, chunk_size, overlap in cases:
+            with self.subTest(chunk_size=chunk_size, overlap=overlap):
+                chunks = run_with_timeout(self, lambda: list(chunk_lines(lines, chunk_size=chunk_size, overlap=overlap)))
+                body = "".join(lines[-1:])
+                self.assertTrue(chunks)
+                self.assertTrue(all(chunk.text.strip() for chunk in chunks))
+                self.assertEqual(chunks[-1].text[-1], body[-1])
+
+    def test_custom_length_function(self):
+        """测试按自定义计量(例如 token 数)控制片段大小"""
+        words = lambda text: len(text.split())
+        lines = [" ".join("w%d" % i for i in range(j, j + 5)) for j in range(0, 100, 5)]
+        chunks = list(chunk_lines(lines, chunk_size=12, overlap=0, length_function=words))
+        self.assertTrue(all(words(chunk.text) <= 12 for chunk in chunks))
+
+class TestIterChunks(unittest.TestCase):
+    def test_reads_files_by_glob(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ("a.md", "b.md", "c.txt"):
+                with open(os.path.join(tmp, name), "w", encoding="utf-8") as f:
+                    f.write("# %s\n\n内容\n" % name)
+            chunks = list(iter_chunks(os.path.join(tmp, "*.md")))
+        self.assertEqual(sorted(os.path.basename(chunk.source) for chunk in chunks), ["a.md", "b.md"])
+
+    def test_batched(self):
+        self.assertEqual(list(batched(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(batched([], 3)), [])
+
+if __name__ == "__main__":
+    unittest.main()
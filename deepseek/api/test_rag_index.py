@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+from rag_chunker import iter_chunks
+from rag_index import EmbeddingCache, IncrementalIndexer, chunk_hash, chunk_id
+from test_rag_query_cache import DIM, FakeClient, FakeModel
+
+PARAGRAPHS = {
+    "a.md": ["第一条 平等", "第二条 自愿", "第三条 公平"],
+    "b.md": ["第四条 诚信", "第五条 守法"],
+    "c.md": ["第六条 绿色"],
+}
+
+
+class TestIncrementalIndexer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.client = FakeClient()
+        self.cache = EmbeddingCache(os.path.join(self.tmp.name, "embedding_cache.db"))
+        for name, paragraphs in PARAGRAPHS.items():
+            self.write(name, paragraphs)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def write(self, name, paragraphs):
+        with open(os.path.join(self.tmp.name, name), "w", encoding="utf-8") as f:
+            f.write("# %s\n\n%s\n" % (name, "\n\n".join(paragraphs)))
+
+    def chunks(self):
+        # overlap=0 且片段很小，每个段落单独成为一个片段
+        return list(iter_chunks(os.path.join(self.tmp.name, "*.md"), chunk_size=16, overlap=0))
+
+    def sync(self):
+        self.model = FakeModel()
+        self.client.calls.clear()
+        indexer = IncrementalIndexer(self.client, "c", self.model, self.cache, batch_size=2)
+        return indexer.sync(self.chunks())
+
+    def assert_in_sync(self):
+        expected = {chunk_id(chunk_hash(chunk.text)): chunk_hash(chunk.text) for chunk in self.chunks()}
+        self.assertEqual(sorted(self.client.ids("c")), sorted(expected))
+        self.assertEqual(self.cache.indexed("c"), expected)
+
+    def test_resync_touches_only_changed_chunks(self):
+        """测试改一个文件、删一个文件后，只 embedding 和 upsert 新片段，只删除消失的片段"""
+        self.assertEqual(self.sync(), {"added": 6, "deleted": 0, "unchanged": 0, "embedded": 6})
+        self.assert_in_sync()
+
+        self.assertEqual(self.sync(), {"added": 0, "deleted": 0, "unchanged": 6, "embedded": 0})
+        self.assertEqual(self.model.documents, [])
+        self.assertEqual(self.client.calls, [])
+
+        self.write("a.md", ["第一条 平等", "第二条 自由", "第三条 公平"])
+        os.remove(os.path.join(self.tmp.name, "c.md"))
+        self.assertEqual(self.sync(), {"added": 1, "deleted": 2, "unchanged": 4, "embedded": 1})
+        self.assertEqual(self.model.documents, ["a.md\n\n第二条 自由"])
+        self.assertEqual(self.client.calls, [("upsert", 1), ("delete", 2)])
+        self.assert_in_sync()
+
+    def test_reverted_chunk_reuses_cached_embedding(self):
+        """测试改回原来的内容时向量来自缓存，不再交给模型"""
+        self.sync()
+        self.write("b.md", ["第四条 诚信", "第五条 法治"])
+        self.assertEqual(self.sync()["embedded"], 1)
+        self.write("b.md", PARAGRAPHS["b.md"])
+        self.assertEqual(self.sync(), {"added": 1, "deleted": 1, "unchanged": 5, "embedded": 0})
+        self.assertEqual(self.model.documents, [])
+        self.assert_in_sync()
+
+    def test_notebook_collection_is_rebuilt_once(self):
+        """测试笔记本按 0..n 编号建立的 collection 在第一次同步时被删除重建"""
+        self.client.create_collection("c", dimension=DIM)
+        self.client.insert("c", [{"id": i, "vector": FakeModel().vector(str(i)), "text": str(i)} for i in range(3)])
+        self.assertEqual(self.sync()["added"], 6)
+        self.assertEqual(self.client.calls[:2], [("drop_collection", 0), ("create_collection", 0)])
+        self.assert_in_sync()
+
+        self.sync()
+        self.assertNotIn(("drop_collection", 0), self.client.calls)
+        self.assert_in_sync()
+
+
+if __name__ == "__main__":
+    unittest.main()
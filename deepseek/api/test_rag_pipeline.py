@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+from rag_index import EmbeddingCache, IncrementalIndexer, chunk_hash, chunk_id
+from rag_pipeline import run_pipeline
+from test_rag_query_cache import FakeClient, FakeModel
+
+TEXTS = ["第%d条" % (i % 25) for i in range(100)] + ["  ", "附则"]
+
+
+class FailingModel(FakeModel):
+    def encode_documents(self, texts):
+        raise RuntimeError("模型出错")
+
+
+class TestRunPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.client = FakeClient()
+        self.cache = EmbeddingCache(os.path.join(self.tmp.name, "embedding_cache.db"))
+        self.unique = sorted(set(text for text in TEXTS if text.strip()))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def run_pipeline(self, model, texts=TEXTS, **kwargs):
+        kwargs.setdefault("cache", self.cache)
+        return run_pipeline(texts, model, self.client, "c", batch_size=7, insert_batch_size=5,
+                            embed_workers=3, queue_size=2, on_progress=None, **kwargs)
+
+    def test_repeated_texts_are_embedded_once(self):
+        """测试内容相同的片段只 embedding 和写入一次，空白片段被跳过"""
+        model = FakeModel()
+        stats = self.run_pipeline(model, cache=None)
+        self.assertEqual(sorted(model.documents), self.unique)
+        self.assertEqual(sorted(self.client.ids("c")), sorted(chunk_id(chunk_hash(t)) for t in self.unique))
+        self.assertEqual((stats["chunk"]["items"], stats["embed"]["items"], stats["insert"]["items"]),
+                         (26, 26, 26))
+        self.assertEqual(stats["embedded"], 26)
+        self.assertNotIn("insert", [name for name, _ in self.client.calls])
+
+    def test_rerun_reuses_cache_and_records_index(self):
+        """测试重复运行不产生重复行，向量来自缓存，索引记录完整"""
+        self.run_pipeline(FakeModel())
+        model = FakeModel()
+        stats = self.run_pipeline(model)
+        ids = self.client.ids("c")
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), 26)
+        self.assertEqual(model.documents, [])
+        self.assertEqual(stats["embedded"], 0)
+        expected = {chunk_id(chunk_hash(t)): chunk_hash(t) for t in self.unique}
+        self.assertEqual(self.cache.indexed("c"), expected)
+
+        # 之后的增量同步认得这些记录，不会删除重建
+        self.client.calls.clear()
+        stats = IncrementalIndexer(self.client, "c", FakeModel(), self.cache).sync(self.unique + ["新增"])
+        self.assertEqual(stats, {"added": 1, "deleted": 0, "unchanged": 26, "embedded": 1})
+        self.assertNotIn(("drop_collection", 0), self.client.calls)
+
+    def test_worker_exception_reaches_caller(self):
+        """测试任一阶段出错时流水线停止，异常在调用线程中重新抛出"""
+        with self.assertRaisesRegex(RuntimeError, "模型出错"):
+            self.run_pipeline(FailingModel(), texts=TEXTS * 20)
+
+        def failing_upsert(collection_name, data):
+            raise ConnectionError("写入失败")
+
+        self.client.upsert = failing_upsert
+        with self.assertRaisesRegex(ConnectionError, "写入失败"):
+            self.run_pipeline(FakeModel(), texts=TEXTS * 20)
+
+        def failing_chunks():
+            yield "第一条"
+            raise ValueError("读取失败")
+
+        with self.assertRaisesRegex(ValueError, "读取失败"):
+            self.run_pipeline(FakeModel(), texts=failing_chunks())
+
+
+if __name__ == "__main__":
+    unittest.main()
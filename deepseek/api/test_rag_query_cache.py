@@ -0,0 +1,236 @@
+import os
+import zlib
+import tempfile
+import unittest
+
+import numpy as np
+
+from rag_index import EmbeddingCache, IncrementalIndexer
+from rag_query_cache import CachedRetriever, TTLCache, VersionedClient, normalize_question
+
+DIM = 8
+
+
+class FakeModel:
+    """按文本生成固定单位向量的模型，记录每次交给它的文本"""
+    model_name = "fake"
+
+    def __init__(self):
+        self.calls = []
+        self.documents = []
+
+    def vector(self, text):
+        vector = np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(DIM)
+        return vector / np.linalg.norm(vector)
+
+    def encode_documents(self, texts):
+        self.documents.extend(texts)
+        return [self.vector(text) for text in texts]
+
+    def encode_queries(self, texts):
+        self.calls.append(list(texts))
+        return [self.vector(text) for text in texts]
+
+
+class FakeClient:
+    """
+    内存里的 MilvusClient，只实现用到的方法
+
+    与 Milvus 一样，insert 不检查主键是否重复，upsert 才按主键覆盖。
+    """
+
+    def __init__(self):
+        self.collections = {}  # 名字 -> 行列表
+        self.calls = []  # (方法名, 行数)
+        self.searches = 0
+
+    def ids(self, collection_name):
+        return [row["id"] for row in self.collections[collection_name]]
+
+    def has_collection(self, collection_name):
+        return collection_name in self.collections
+
+    def create_collection(self, collection_name, dimension, **kwargs):
+        self.calls.append(("create_collection", 0))
+        self.collections[collection_name] = []
+
+    def drop_collection(self, collection_name):
+        self.calls.append(("drop_collection", 0))
+        self.collections.pop(collection_name, None)
+
+    def insert(self, collection_name, data):
+        self.calls.append(("insert", len(data)))
+        self.collections[collection_name].extend(data)
+
+    def upsert(self, collection_name, data):
+        self.calls.append(("upsert", len(data)))
+        ids = {row["id"] for row in data}
+        rows = self.collections[collection_name]
+        rows[:] = [row for row in rows if row["id"] not in ids] + list(data)
+
+    def delete(self, collection_name, ids):
+        self.calls.append(("delete", len(ids)))
+        ids = set(ids)
+        rows = self.collections[collection_name]
+        rows[:] = [row for row in rows if row["id"] not in ids]
+
+    def search(self, collection_name, data, limit, output_fields, search_params=None):
+        self.searches += 1
+        rows = self.collections[collection_name]
+        results = []
+        for query in data:
+            scored = sorted(rows, key=lambda row: -float(np.dot(query, row["vector"])))[:limit]
+            results.append([{"id": row["id"], "distance": float(np.dot(query, row["vector"])),
+                             "entity": {name: row[name] for name in output_fields}} for row in scored])
+        return results
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestNormalizeQuestion(unittest.TestCase):
+    def test_equivalent_questions(self):
+        self.assertEqual(normalize_question(" 离婚冷静期  是多久？"), normalize_question("离婚冷静期 是多久?"))
+        self.assertEqual(normalize_question("ＡＢＣ"), normalize_question("abc"))
+        self.assertNotEqual(normalize_question("甲"), normalize_question("乙"))
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=None)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)  # a 变为最近使用
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+        stats = cache.stats()
+        self.assertEqual((stats["size"], stats["evictions"], stats["hits"], stats["misses"]), (2, 1, 3, 1))
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+        cache.put("a", 1)
+        clock.now = 4.9
+        self.assertEqual(cache.get("a"), 1)
+        clock.now = 5.0
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_zero_maxsize_disables_cache(self):
+        cache = TTLCache(maxsize=0)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+
+class TestCachedRetriever(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "embedding_cache.db")
+        self.caches = []
+        self.client = FakeClient()
+        self.sync(["民法典第一条", "民法典第二条", "民法典第三条"])
+
+    def tearDown(self):
+        for cache in self.caches:
+            cache.close()
+        self.tmp.cleanup()
+
+    def open_cache(self):
+        # 每次打开新的连接，相当于另一个进程
+        cache = EmbeddingCache(self.cache_path)
+        self.caches.append(cache)
+        return cache
+
+    def sync(self, texts, client=None):
+        IncrementalIndexer(client or self.client, "c", FakeModel(), self.open_cache()).sync(texts)
+
+    def retriever(self, client=None, **kwargs):
+        self.model = FakeModel()
+        kwargs.setdefault("cache", self.open_cache())
+        return CachedRetriever(self.model, client or self.client, "c", limit=2, **kwargs)
+
+    def texts(self, hits):
+        return [hit["entity"]["text"] for hit in hits]
+
+    def test_repeated_questions_hit_cache(self):
+        """测试只差空格和标点的问题命中缓存，不再 encode 和 search"""
+        retriever = self.retriever()
+        first = retriever.search("第一条是什么？")
+        self.assertEqual(retriever.search(" 第一条是什么? "), first)
+        self.assertEqual(len(self.model.calls), 1)
+        self.assertEqual(self.client.searches, 1)
+        self.assertEqual(retriever.stats()["results"]["hits"], 1)
+
+    def test_search_many_batches_misses(self):
+        """测试未命中的问题合成一次 encode_queries 和一次 search，重复的问题只算一次"""
+        retriever = self.retriever()
+        retriever.search("甲")
+        results = retriever.search_many(["甲", "乙", "丙", "乙？"])
+        self.assertEqual(self.model.calls, [["甲"], ["乙", "丙"]])
+        self.assertEqual(self.client.searches, 2)
+        self.assertEqual(results[1], results[3])
+        self.assertEqual(len(results), 4)
+
+    def test_reindex_by_another_process_invalidates_results(self):
+        """测试其他进程用自己的 client 和缓存连接重新索引后，旧结果不再命中"""
+        retriever = self.retriever()
+        before = self.texts(retriever.search("民法典第四条")[0])
+        self.assertNotIn("民法典第四条", before)
+        self.sync(["民法典第一条", "民法典第四条"])
+        after = self.texts(retriever.search("民法典第四条")[0])
+        self.assertEqual(after[0], "民法典第四条")
+        self.assertEqual(self.client.searches, 2)
+        self.assertEqual(len(self.model.calls), 1)  # 查询向量与 collection 无关，仍然命中
+
+    def test_without_persisted_version_results_are_stale_until_ttl(self):
+        """测试没有持久化版本号时，只能等 ttl 过期"""
+        clock = FakeClock()
+        retriever = self.retriever(cache=None, ttl=60, clock=clock)
+        retriever.search("民法典第四条")
+        self.sync(["民法典第一条", "民法典第四条"])
+        self.assertNotIn("民法典第四条", self.texts(retriever.search("民法典第四条")[0]))
+        clock.now = 60
+        self.assertEqual(self.texts(retriever.search("民法典第四条")[0])[0], "民法典第四条")
+
+    def test_versioned_client_invalidates_direct_writes(self):
+        """测试通过 VersionedClient 直接修改 collection 后，旧结果不再命中"""
+        client = VersionedClient(self.client)
+        retriever = self.retriever(client=client)
+        retriever.search("新条文")
+        client.upsert(collection_name="c", data=[{"id": 1, "vector": FakeModel().vector("新条文"), "text": "新条文"}])
+        self.assertEqual(self.texts(retriever.search("新条文")[0])[0], "新条文")
+        self.assertEqual(client.version("c"), 1)
+
+    def test_invalidate(self):
+        retriever = self.retriever()
+        retriever.search("甲")
+        retriever.invalidate()
+        retriever.search("甲")
+        self.assertEqual(self.client.searches, 2)
+        self.assertEqual(len(self.model.calls), 1)
+
+    def test_results_changed_during_search_are_not_cached(self):
+        """测试检索期间版本变化时结果不写入缓存"""
+        client = VersionedClient(self.client)
+        retriever = self.retriever(client=client)
+        search = self.client.search
+
+        def search_then_write(**kwargs):
+            result = search(**kwargs)
+            client.bump("c")
+            return result
+
+        self.client.search = search_then_write
+        retriever.search("甲")
+        self.assertEqual(len(retriever.results), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
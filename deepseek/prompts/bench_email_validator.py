@@ -0,0 +1,225 @@
+import re
+import sys
+import time
+import random
+import string
+import argparse
+
+from email_validator import (EMAIL_PATTERN, MAX_EMAIL_LENGTH, MAX_LOCAL_LENGTH, EmailValidator,
+                             is_valid_email, validate_array)
+
+# 电子邮件校验器的基准测试和模糊测试语料
+#
+# 语料由固定种子生成，包含四类地址：
+#   valid        - 随机生成的合法地址
+#   invalid      - 对合法地址做随机破坏(删@、加@、插入空格/非法字符/连续的点等)
+#   pathological - 专门让正则回溯的字符串，能通过结构预检，长度不超过 MAX_EMAIL_LENGTH，一定会执行正则
+#   oversized    - 几千到几万字符的脏数据，应当在预检阶段就被拒绝
+#
+# 每个引擎输出 地址/秒 和单次调用的 p50/p99/max 延迟(微秒)，
+# 另外对 pathological 按长度翻倍测最坏耗时，耗时随长度的增长倍数
+# 接近2说明是线性的，接近4说明是二次回溯。
+
+LOCAL_CHARS = string.ascii_letters + string.digits + "._%+-"
+DOMAIN_CHARS = string.ascii_lowercase + string.digits + "-"
+BAD_CHARS = " _@,;:<>()[]\\\"'\t"
+
+
+def random_valid(rng):
+    local = "".join(rng.choice(LOCAL_CHARS) for _ in range(rng.randint(1, 20))).strip(".")
+    local = local.replace("..", ".") or "user"
+    labels = ["".join(rng.choice(DOMAIN_CHARS) for _ in range(rng.randint(1, 12)))
+              for _ in range(rng.randint(1, 3))]
+    tld = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 6)))
+    return f"{local}@{'.'.join(labels)}.{tld}"
+
+
+def random_invalid(rng):
+    email = random_valid(rng)
+    i = rng.randrange(len(email) + 1)
+    kind = rng.randrange(6)
+    if kind == 0:
+        return email.replace("@", "")
+    if kind == 1:
+        return email[:i] + "@" + email[i:]
+    if kind == 2:
+        return email[:i] + rng.choice(BAD_CHARS) + email[i:]
+    if kind == 3:
+        return email[:i] + ".." + email[i:]
+    if kind == 4:
+        return email.rsplit(".", 1)[0] + "." + rng.choice(string.ascii_lowercase)
+    return email.split("@")[0]
+
+
+def pathological(length):
+    # 恰好一个@、@前不超过 MAX_LOCAL_LENGTH、没有连续的点，总长为 length，结构预检拦不住；
+    # 每个字符串都几乎能匹配，直到最后几个字符才失败，迫使正则尝试域名部分的所有切分
+    if not 12 <= length <= MAX_EMAIL_LENGTH:
+        raise ValueError(f"length 必须在 12 到 {MAX_EMAIL_LENGTH} 之间")
+    domain = length - 2  # "a@" 之后的长度
+    local = ("a." * length)[:min(MAX_LOCAL_LENGTH, length // 2)]
+    rest = length - len(local) - 1  # 长用户名之后@右边的长度
+    return [
+        "a@" + "a" * domain,                            # 没有点
+        "a@" + ("a." * length)[:domain - 1] + "1",      # 顶级域名是数字
+        "a@" + ("a-" * length)[:domain - 2] + ".c",     # 顶级域名只有1个字符
+        "a@" + ("a.-" * length)[:domain - 1] + "!",     # 结尾非法字符
+        local + "@" + "a" * rest,                       # 用户名很长，域名没有点
+        local + "@" + "a" * (rest - 4) + ".com",        # 合法，但很长
+    ]
+
+
+def oversized(length):
+    # 超过 MAX_EMAIL_LENGTH 的脏数据，不论内容都应在预检阶段被拒绝
+    half = max(1, length // 2)
+    return [
+        "a" * length,                                  # 没有@
+        "a@" + "a." * half + "1",                      # 顶级域名是数字
+        "a@" + "." * length + "com",                   # 一长串点
+        "a" * half + "@" + "a" * half + "!",           # 结尾非法字符
+        "a." * half + "@example.com",                  # 结构合法，但太长
+    ]
+
+
+def generate_corpus(count, seed=0, duplicates=0.0, pathological_lengths=(16, 64, 250),
+                    oversized_lengths=(1024, 4096)):
+    """
+    生成 (类别, 地址) 列表，相同参数总是得到相同的语料
+    
+    duplicates 是重复地址所占的比例，真实的邮件列表里同一地址常常出现多次
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count // 2):
+        corpus.append(("valid", random_valid(rng)))
+    for _ in range(count - count // 2):
+        corpus.append(("invalid", random_invalid(rng)))
+    rng.shuffle(corpus)
+    repeated = int(len(corpus) * duplicates)
+    for i in range(repeated):
+        corpus[i] = corpus[rng.randrange(repeated, len(corpus))]
+    for length in pathological_lengths:
+        corpus.extend(("pathological", email) for email in pathological(length))
+    for length in oversized_lengths:
+        corpus.extend(("oversized", email) for email in oversized(length))
+    rng.shuffle(corpus)
+    return corpus
+
+
+def baseline(email_string):
+    # 优化前的实现: 每次调用把正则字符串交给 re.fullmatch，没有预检
+    return bool(re.fullmatch(EMAIL_PATTERN, email_string))
+
+
+def percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(name, latencies_ns):
+    latencies = sorted(latencies_ns)
+    total = sum(latencies) or 1
+    rate = len(latencies) * 1e9 / total
+    p50, p99 = (percentile(latencies, q) / 1000 for q in (50, 99))
+    worst = latencies[-1] / 1000
+    print(f"{name:<32}{rate:>14,.0f}{p50:>10.2f}{p99:>10.2f}{worst:>12.2f}")
+
+
+def time_calls(check, emails):
+    latencies = []
+    clock = time.perf_counter_ns
+    for email in emails:
+        start = clock()
+        check(email)
+        latencies.append(clock() - start)
+    return latencies
+
+
+def bench_engines(emails, repeat):
+    engines = {
+        "baseline re.fullmatch": baseline,
+        "EmailValidator(no cache)": EmailValidator(cache_size=0),
+        "EmailValidator(cached)": EmailValidator(),
+        "is_valid_email": is_valid_email,
+    }
+    print(f"{'engine':<32}{'addr/sec':>14}{'p50 us':>10}{'p99 us':>10}{'max us':>12}")
+    for name, check in engines.items():
+        summarize(name, time_calls(check, emails * repeat))
+
+    try:
+        start = time.perf_counter_ns()
+        for _ in range(repeat):
+            validate_array(emails)
+        elapsed = time.perf_counter_ns() - start
+        print(f"{'validate_array':<32}{len(emails) * repeat * 1e9 / elapsed:>14,.0f}")
+    except ImportError:
+        print(f"{'validate_array':<32}{'skipped (no numpy)':>14}")
+
+
+def bench_scaling(lengths):
+    # 同一类病态输入长度翻倍时最坏耗时的变化
+    engines = {"baseline re.fullmatch": baseline, "EmailValidator": EmailValidator(cache_size=0)}
+    print(f"\n{'engine':<32}{'length':>10}{'worst us':>14}{'growth':>10}")
+    for name, check in engines.items():
+        previous = None
+        for length in lengths:
+            # 每个输入取多次中最快的一次去掉抖动，再取最慢的输入
+            worst = max(min(time_calls(check, [email] * 5)) for email in pathological(length))
+            growth = f"{worst / previous:.1f}x" if previous else "-"
+            print(f"{name:<32}{length:>10}{worst / 1000:>14.2f}{growth:>10}")
+            previous = worst
+
+
+def check_worst_case(lengths, limit_us=1000.0):
+    # 病态输入(会执行正则)单次调用的最坏耗时不能超过 limit_us 微秒；计时只放在这里，不放进单元测试
+    slow = []
+    for length in lengths:
+        for email in pathological(length):
+            worst = max(time_calls(is_valid_email, [email] * 5)) / 1000
+            if worst > limit_us:
+                slow.append((email, worst))
+    print(f"\npathological inputs over {limit_us:.0f} us: {len(slow)}")
+    return slow
+
+
+def check_agreement(corpus):
+    # 新引擎必须与基线给出相同结论，预检规则额外拒绝的地址除外
+    validator = EmailValidator(cache_size=0)
+    mismatches = [email for _, email in corpus
+                  if validator(email) != (baseline(email) and EmailValidator.precheck(email))]
+    print(f"\nagreement with baseline: {len(corpus) - len(mismatches)}/{len(corpus)}")
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="电子邮件校验器的基准测试")
+    parser.add_argument("--count", type=int, default=100000, help="随机生成的地址数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个引擎跑几遍语料")
+    parser.add_argument("--seed", type=int, default=0, help="语料的随机种子")
+    parser.add_argument("--duplicates", type=float, default=0.3, help="重复地址所占比例")
+    parser.add_argument("--lengths", default="16,32,64,128,250",
+                        help=f"病态输入的长度，逗号分隔，12 到 {MAX_EMAIL_LENGTH} 之间")
+    parser.add_argument("--limit-us", type=float, default=1000.0, help="病态输入单次调用允许的最长耗时(微秒)")
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.count, args.seed, args.duplicates)
+    emails = [email for _, email in corpus]
+    counts = {}
+    for category, _ in corpus:
+        counts[category] = counts.get(category, 0) + 1
+    print(f"corpus: {len(corpus)} addresses {counts}\n")
+
+    bench_engines(emails, args.repeat)
+    lengths = [int(n) for n in args.lengths.split(",") if n]
+    bench_scaling(lengths)
+    slow = check_worst_case(sorted(set(lengths) | {MAX_EMAIL_LENGTH}), args.limit_us)
+    for email, worst in slow[:10]:
+        print(f"  slow: {email[:40]!r}... {worst:.1f} us")
+    mismatches = check_agreement(corpus)
+    for email in mismatches[:10]:
+        print(f"  mismatch: {email!r}")
+    return 1 if mismatches or slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
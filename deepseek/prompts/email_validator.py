@@ -1,4 +1,82 @@
 import re
+import csv
+import sys
+import argparse
+from collections import deque
+from functools import lru_cache
+from itertools import islice, repeat
+from operator import contains
+from multiprocessing import Pool
+
+try:
+    import numpy as np
+except ImportError:  # 只有 validate_array 需要 numpy
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+DEFAULT_CHUNK_SIZE = 10000  # 每个进程任务包含的地址数
+EMAIL_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+MAX_EMAIL_LENGTH = 254  # RFC 5321: 整个地址最多254个字符
+MAX_LOCAL_LENGTH = 64   # RFC 5321: @前的用户名最多64个字符
+DEFAULT_CACHE_SIZE = 65536
+
+class EmailValidator:
+    """
+    预编译的电子邮件校验器
+    
+    校验分三步，越靠前越便宜：
+        1. 结构预检: 恰好一个@、长度不超限、没有连续的点，不满足直接判为无效
+        2. LRU缓存: 重复出现的地址直接返回上次的结果
+        3. 预编译正则: 只有通过预检且未命中缓存的地址才会执行
+    
+    参数:
+        pattern (str): 正则表达式，默认使用 EMAIL_PATTERN
+        cache_size (int): 缓存的地址数上限，0表示不缓存
+    """
+    
+    def __init__(self, pattern=EMAIL_PATTERN, cache_size=DEFAULT_CACHE_SIZE):
+        self.regex = re.compile(pattern)
+        self._match = self._regex_match
+        if cache_size:
+            self._match = lru_cache(maxsize=cache_size)(self._regex_match)
+    
+    def _regex_match(self, email_string):
+        return self.regex.fullmatch(email_string) is not None
+    
+    @staticmethod
+    def precheck(email_string):
+        """结构预检，返回False表示一定无效，True表示还需要正则确认"""
+        if not 0 < len(email_string) <= MAX_EMAIL_LENGTH:
+            return False
+        if email_string.count("@") != 1 or ".." in email_string:
+            return False
+        return email_string.index("@") <= MAX_LOCAL_LENGTH
+    
+    def is_valid(self, email_string):
+        """与 is_valid_email 相同"""
+        if not isinstance(email_string, str):
+            raise TypeError("输入必须是字符串类型，但收到 {}".format(type(email_string).__name__))
+        # 与 precheck 相同，内联以省掉一次函数调用
+        if (len(email_string) > MAX_EMAIL_LENGTH or email_string.count("@") != 1
+                or ".." in email_string or email_string.index("@") > MAX_LOCAL_LENGTH):
+            return False
+        return self._match(email_string)
+    
+    __call__ = is_valid
+    
+    def cache_info(self):
+        """缓存命中统计，未启用缓存时返回None"""
+        return self._match.cache_info() if hasattr(self._match, "cache_info") else None
+    
+    def clear_cache(self):
+        if hasattr(self._match, "cache_clear"):
+            self._match.cache_clear()
+
+_default_validator = EmailValidator()
 
 def is_valid_email(email_string):
     """
@@ -17,25 +95,212 @@ def is_valid_email(email_string):
         这个正则表达式基于RFC 5322标准简化版本，覆盖大多数常见电子邮件格式：
         - 用户名部分允许: 字母、数字、. _ % + -
         - 域名部分允许: 字母、数字、. -
-        - 必须包含@符号
+        - 必须包含@符号，且只能有一个
         - 顶级域名至少2个字符
+        - 不允许连续的点，地址最长254个字符，用户名最长64个字符
         - 不支持国际化域名(IDN)中的非ASCII字符
         参考: https://emailregex.com/
     """
-    if not isinstance(email_string, str):
-        raise TypeError("输入必须是字符串类型，但收到 {}".format(type(email_string).__name__))
+    # 使用模块级的预编译校验器(预检 + LRU缓存 + fullmatch)
+    return _default_validator.is_valid(email_string)
+
+def validate_array(emails, validator=None):
+    """
+    按列校验一组地址，返回布尔掩码
+    
+    结构预检(长度、@个数、位置、连续的点)用 numpy.char 对整列一次完成，
+    只有通过预检的地址去重后才逐个执行正则。
+    
+    参数:
+        emails (array-like|pandas.Series): 地址数组，非字符串元素(如None、NaN)视为无效
+        validator (EmailValidator): 可选，默认使用模块级校验器
+        
+    返回:
+        numpy.ndarray[bool]: 与输入形状相同的掩码；输入为 pandas.Series 时返回同索引的 Series
+        
+    异常:
+        ImportError: 如果没有安装numpy
+    """
+    if np is None:
+        raise ImportError("validate_array 需要安装 numpy")
+    validator = validator or _default_validator
+    series = emails if pd is not None and isinstance(emails, pd.Series) else None
+    values = emails.to_numpy() if series is not None else emails
+    if not (isinstance(values, np.ndarray) and values.dtype.kind == "U"):
+        values = np.asarray(values, dtype=object)
+    shape = values.shape
+    values = values.ravel()
+    
+    # 定长字符串数组的宽度由最长的元素决定，超长的地址先剔除，
+    # 否则一个几万字符的脏数据会让整列的内存和耗时放大几百倍
+    if values.dtype.kind == "U":
+        usable = np.char.str_len(values) <= MAX_EMAIL_LENGTH
+        text = values
+        if values.itemsize > 4 * MAX_EMAIL_LENGTH:
+            text = np.where(usable, values, "").astype("U%d" % MAX_EMAIL_LENGTH)
+    else:
+        # map 在C层循环，比生成器快得多；isinstance 让 np.str_ 等 str 子类也算字符串
+        usable = np.fromiter(map(isinstance, values, repeat(str)), dtype=bool, count=values.size)
+        lengths = np.zeros(values.size, dtype=np.intp)
+        lengths[usable] = np.fromiter(map(len, values[usable]), dtype=np.intp, count=int(usable.sum()))
+        usable &= lengths <= MAX_EMAIL_LENGTH
+        # 转成定长字符串时结尾的 \0 会被丢掉，正则本来就不接受 \0，先排除
+        usable[usable] = ~np.fromiter(map(contains, values[usable], repeat("\0")), dtype=bool,
+                                      count=int(usable.sum()))
+        text = np.where(usable, values, "").astype(str)
+    
+    lengths = np.char.str_len(text)
+    at_pos = np.char.find(text, "@")
+    mask = (usable & (lengths > 0) & (lengths <= MAX_EMAIL_LENGTH)
+            & (at_pos >= 0) & (at_pos <= MAX_LOCAL_LENGTH)
+            & (np.char.count(text, "@") == 1)
+            & (np.char.find(text, "..") < 0))
+    
+    # 通过预检的地址去重后再跑正则
+    survivors = np.flatnonzero(mask)
+    if survivors.size:
+        unique, inverse = np.unique(text[survivors], return_inverse=True)
+        matched = np.fromiter(map(validator._match, unique.tolist()), dtype=bool, count=unique.size)
+        mask[survivors] = matched[inverse]
+    
+    if series is not None:
+        return pd.Series(mask, index=series.index, name=series.name)
+    return mask.reshape(shape)
+
+def _validate_chunk(chunk):
+    """在工作进程中校验一批地址，返回与输入等长的布尔列表"""
+    return [is_valid_email(email) for email in chunk]
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def validate_many(emails, workers=1, chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    批量校验电子邮件地址，按输入顺序逐个产出结果
+    
+    参数:
+        emails (iterable[str]): 地址序列，可以是生成器，不会一次性读入内存
+        workers (int): 进程数，1表示在当前进程内校验
+        chunksize (int): 每次分发给工作进程的地址数
+        
+    返回:
+        generator: 依次产出 (email, bool) 元组
+        
+    异常:
+        TypeError: 如果某个元素不是字符串类型
+    """
+    for chunk, results in _validate_chunks(emails, workers, chunksize):
+        yield from zip(chunk, results)
+
+def _validate_chunks(emails, workers, chunksize):
+    if workers <= 1:
+        for chunk in _chunks(emails, chunksize):
+            yield chunk, _validate_chunk(chunk)
+        return
+    
+    # 最多同时挂起 2*workers 个分块，按提交顺序取回结果，内存占用与总行数无关
+    with Pool(workers) as pool:
+        pending = deque()
+        for chunk in _chunks(emails, chunksize):
+            pending.append((chunk, pool.apply_async(_validate_chunk, (chunk,))))
+            if len(pending) >= 2 * workers:
+                chunk, result = pending.popleft()
+                yield chunk, result.get()
+        while pending:
+            chunk, result = pending.popleft()
+            yield chunk, result.get()
+
+def read_emails(path, column=None, encoding="utf-8"):
+    """
+    从文件中流式读取地址
+    
+    参数:
+        path (str): 文件路径
+        column (str|int|None): None表示每行一个地址；字符串表示CSV表头中的列名；
+            整数表示CSV列下标(此时不跳过表头)
+        encoding (str): 文件编码
+        
+    返回:
+        generator: 依次产出地址字符串，跳过空行
+    """
+    with open(path, newline="", encoding=encoding) as f:
+        if column is None:
+            for line in f:
+                email = line.rstrip("\r\n")
+                if email:
+                    yield email
+            return
+        
+        reader = csv.reader(f)
+        if isinstance(column, str):
+            header = next(reader, [])
+            if column not in header:
+                raise ValueError("CSV中没有名为 {} 的列".format(column))
+            column = header.index(column)
+        for row in reader:
+            if len(row) > column and row[column]:
+                yield row[column]
+
+def validate_file(path, column=None, workers=1, chunksize=DEFAULT_CHUNK_SIZE, on_result=None):
+    """
+    校验文件中的全部地址并返回统计结果
+    
+    参数:
+        path (str): 文件路径，格式见 read_emails
+        column (str|int|None): CSV列名或下标，None表示每行一个地址
+        workers (int): 进程数
+        chunksize (int): 每次分发给工作进程的地址数
+        on_result (callable): 可选，对每个结果调用 on_result(email, valid)
+        
+    返回:
+        dict: {"total": 总数, "valid": 有效数, "invalid": 无效数}
+    """
+    summary = {"total": 0, "valid": 0, "invalid": 0}
+    for email, valid in validate_many(read_emails(path, column), workers, chunksize):
+        summary["total"] += 1
+        summary["valid" if valid else "invalid"] += 1
+        if on_result is not None:
+            on_result(email, valid)
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="校验电子邮件地址")
+    parser.add_argument("email", nargs="?", help="要校验的单个地址")
+    parser.add_argument("-f", "--file", help="批量校验的文件，每行一个地址或CSV")
+    parser.add_argument("-c", "--column", help="CSV列名，或列下标(数字)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="进程数")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNK_SIZE, help="每个进程任务的地址数")
+    parser.add_argument("--invalid-output", help="把无效地址写入该文件")
+    args = parser.parse_args(argv)
+    
+    if args.file is None:
+        if args.email is None:
+            parser.print_usage()
+            return 1
+        print(f"'{args.email}' is {'valid' if is_valid_email(args.email) else 'invalid'}")
+        return 0
     
-    # 健壮的电子邮件正则表达式
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    column = args.column
+    if column is not None and column.isdigit():
+        column = int(column)
+    invalid_file = open(args.invalid_output, "w", encoding="utf-8") if args.invalid_output else None
     
-    # 使用fullmatch确保整个字符串匹配
-    return bool(re.fullmatch(pattern, email_string))
+    def on_result(email, valid):
+        if not valid and invalid_file is not None:
+            invalid_file.write(email + "\n")
+    
+    try:
+        summary = validate_file(args.file, column, args.workers, args.chunksize, on_result)
+    finally:
+        if invalid_file is not None:
+            invalid_file.close()
+    print(f"total: {summary['total']}, valid: {summary['valid']}, invalid: {summary['invalid']}")
+    return 0
 
 if __name__ == "__main__":
-    # 简单命令行测试
-    import sys
-    if len(sys.argv) > 1:
-        email = sys.argv[1]
-        print(f"'{email}' is {'valid' if is_valid_email(email) else 'invalid'}")
-    else:
-        print("Usage: python email_validator.py <email>")
+    sys.exit(main())
@@ -1,5 +1,9 @@
+import os
+import tempfile
 import unittest
-from email_validator import is_valid_email
+from email_validator import is_valid_email, validate_many, read_emails, validate_file, EmailValidator, validate_array
+import email_validator
+from bench_email_validator import generate_corpus, pathological, oversized, baseline
 
 class TestIsValidEmail(unittest.TestCase):
     def test_valid_emails(self):
@@ -63,5 +67,196 @@ class TestIsValidEmail(unittest.TestCase):
             with self.subTest(email=email):
                 self.assertFalse(is_valid_email(email), f"应该无效(含空格): {email}")
 
+class TestEmailValidator(unittest.TestCase):
+    def test_precheck_rejects_broken_structure(self):
+        """测试结构预检直接拒绝的地址"""
+        rejected = [
+            "",                                 # 空字符串
+            "user@@example.com",                # 两个@
+            "a@b@example.com",                  # 多个@
+            "first..last@example.com",          # 用户名中连续的点
+            "user@domain..com",                 # 域名中连续的点
+            "a" * 65 + "@example.com",          # 用户名超过64个字符
+            "user@" + "a" * 250 + ".com",       # 地址超过254个字符
+        ]
+        for email in rejected:
+            with self.subTest(email=email):
+                self.assertFalse(EmailValidator.precheck(email))
+                self.assertFalse(is_valid_email(email))
+    
+    def test_length_limits_are_inclusive(self):
+        """测试恰好达到长度上限的地址仍然有效"""
+        local = "a" * 64
+        self.assertTrue(is_valid_email(local + "@example.com"))
+        domain = "b" * (254 - len(local) - 1 - 4) + ".com"
+        self.assertTrue(is_valid_email(local + "@" + domain))
+    
+    def test_cache_hits_for_repeated_addresses(self):
+        """测试重复地址命中缓存，且预检失败的地址不进入缓存"""
+        validator = EmailValidator(cache_size=8)
+        for _ in range(3):
+            self.assertTrue(validator("simple@example.com"))
+            self.assertFalse(validator("plainaddress"))
+        info = validator.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (2, 1, 1))
+        validator.clear_cache()
+        self.assertEqual(validator.cache_info().currsize, 0)
+    
+    def test_without_cache(self):
+        """测试关闭缓存时结果不变"""
+        validator = EmailValidator(cache_size=0)
+        self.assertIsNone(validator.cache_info())
+        self.assertTrue(validator.is_valid("user+tag@example.org"))
+        self.assertFalse(validator.is_valid("user@domain_com"))
+        with self.assertRaises(TypeError):
+            validator.is_valid(None)
+
+class TestFuzzCorpus(unittest.TestCase):
+    def counting_validator(self):
+        """返回 (校验器, 记录正则调用的列表)"""
+        validator = EmailValidator()
+        calls = []
+        regex = validator.regex
+        
+        class CountingRegex:
+            def fullmatch(self, email_string):
+                calls.append(email_string)
+                return regex.fullmatch(email_string)
+        
+        validator.regex = CountingRegex()
+        return validator, calls
+    
+    def test_oversized_inputs_skip_regex(self):
+        """测试超长输入在预检阶段就被拒绝，不会交给正则和缓存"""
+        validator, calls = self.counting_validator()
+        before = validator.cache_info()
+        for length in (1024, 65536):
+            for email in oversized(length):
+                with self.subTest(length=length, email=email[:20]):
+                    self.assertGreater(len(email), email_validator.MAX_EMAIL_LENGTH)
+                    self.assertFalse(validator(email))
+        self.assertEqual(calls, [])
+        self.assertEqual(validator.cache_info(), before)
+        self.assertTrue(validator("simple@example.com"))
+        self.assertEqual(calls, ["simple@example.com"])
+    
+    def test_pathological_inputs_reach_regex(self):
+        """测试病态输入能通过预检、真正交给正则(耗时见 bench_email_validator.py)"""
+        validator, calls = self.counting_validator()
+        emails = [email for length in (12, 64, email_validator.MAX_EMAIL_LENGTH) for email in pathological(length)]
+        for email in emails:
+            with self.subTest(email=email[:20]):
+                self.assertLessEqual(len(email), email_validator.MAX_EMAIL_LENGTH)
+                self.assertEqual(validator(email), baseline(email))
+        self.assertEqual(calls, emails)
+        with self.assertRaises(ValueError):
+            pathological(email_validator.MAX_EMAIL_LENGTH + 1)
+    
+    def test_agrees_with_original_regex(self):
+        """测试生成的语料上与原始正则结论一致(预检额外拒绝的除外)"""
+        for category, email in generate_corpus(2000, seed=1, duplicates=0.3):
+            with self.subTest(category=category, email=email[:40]):
+                expected = baseline(email) and EmailValidator.precheck(email)
+                self.assertEqual(is_valid_email(email), expected)
+                if category == "valid":
+                    self.assertTrue(expected)
+
+@unittest.skipIf(email_validator.np is None, "需要安装numpy")
+class TestValidateArray(unittest.TestCase):
+    EMAILS = [
+        "simple@example.com", "firstname.lastname@example.com", "user@sub.domain.co.uk",
+        "plainaddress", "@missingusername.com", "user@.com", "user@domain..com",
+        "user@domain_com", " user@example.com", "user@@example.com", "",
+        "a" * 65 + "@example.com", "simple@example.com",
+    ]
+    
+    def test_matches_is_valid_email(self):
+        """测试整列校验与逐个校验结果一致"""
+        mask = validate_array(self.EMAILS)
+        self.assertEqual(mask.dtype, bool)
+        self.assertEqual(mask.tolist(), [is_valid_email(email) for email in self.EMAILS])
+    
+    def test_numpy_string_elements(self):
+        """测试 np.str_ 等 str 子类元素与 is_valid_email 结论一致"""
+        np = email_validator.np
+        values = list(np.array(["simple@example.com", "plainaddress"]))
+        self.assertIsInstance(values[0], np.str_)
+        self.assertEqual(validate_array(values).tolist(), [True, False])
+        self.assertEqual(validate_array(values + [None]).tolist(), [True, False, False])
+        self.assertEqual([is_valid_email(v) for v in values], [True, False])
+    
+    def test_nul_characters(self):
+        """测试含 \\0 的地址(包括结尾的 \\0)与 is_valid_email 结论一致"""
+        values = ["a@b.com\0", "a@b.com\0\0", "a\0@b.com", "ok@example.com"]
+        self.assertEqual(validate_array(values).tolist(), [is_valid_email(v) for v in values])
+        self.assertEqual(validate_array(values).tolist(), [False, False, False, True])
+    
+    def test_keeps_input_shape(self):
+        """测试二维输入返回同形状的掩码"""
+        values = [["simple@example.com", "plainaddress"], [None, "user@.com"], ["x@y.org", "a@b.co"]]
+        mask = validate_array(values)
+        self.assertEqual(mask.shape, (3, 2))
+        self.assertEqual(mask.tolist(), [[is_valid_email(v) if isinstance(v, str) else False for v in row]
+                                         for row in values])
+        self.assertEqual(validate_array(email_validator.np.array(values[::2])).shape, (2, 2))
+    
+    def test_non_strings_are_invalid(self):
+        """测试列中的None和数字被判为无效而不是抛出异常"""
+        mask = validate_array(["simple@example.com", None, 123, float("nan"), "user@.com"])
+        self.assertEqual(mask.tolist(), [True, False, False, False, False])
+    
+    @unittest.skipIf(email_validator.pd is None, "需要安装pandas")
+    def test_pandas_series_keeps_index(self):
+        """测试输入pandas.Series时返回同索引的布尔Series"""
+        pd = email_validator.pd
+        column = pd.Series(["simple@example.com", None, "plainaddress"], index=[10, 20, 30], name="email")
+        result = validate_array(column)
+        self.assertEqual(result.index.tolist(), [10, 20, 30])
+        self.assertEqual(result.tolist(), [True, False, False])
+
+class TestBatchValidation(unittest.TestCase):
+    EMAILS = ["simple@example.com", "plainaddress", "user+tag@example.org", "user@.com"] * 50
+    
+    def write_file(self, content):
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+    
+    def test_validate_many_keeps_order(self):
+        """测试批量校验按输入顺序返回，且与逐个校验结果一致"""
+        expected = [(email, is_valid_email(email)) for email in self.EMAILS]
+        self.assertEqual(list(validate_many(iter(self.EMAILS), chunksize=7)), expected)
+    
+    def test_validate_many_with_processes(self):
+        """测试多进程校验结果与单进程一致"""
+        expected = list(validate_many(self.EMAILS))
+        self.assertEqual(list(validate_many(self.EMAILS, workers=2, chunksize=16)), expected)
+    
+    def test_validate_many_rejects_non_strings(self):
+        """测试批量校验中的非字符串元素抛出TypeError"""
+        with self.assertRaises(TypeError):
+            list(validate_many(["simple@example.com", None]))
+    
+    def test_read_lines_and_csv_column(self):
+        """测试按行读取和按CSV列读取，空行与空单元格被跳过"""
+        lines = self.write_file("simple@example.com\r\n\nplainaddress\n")
+        self.assertEqual(list(read_emails(lines)), ["simple@example.com", "plainaddress"])
+        
+        table = self.write_file("name,email\nA,simple@example.com\nB,\"user@.com\"\nC,\n")
+        self.assertEqual(list(read_emails(table, column="email")), ["simple@example.com", "user@.com"])
+        self.assertEqual(list(read_emails(table, column=0)), ["name", "A", "B", "C"])
+        with self.assertRaises(ValueError):
+            list(read_emails(table, column="missing"))
+    
+    def test_validate_file_summary(self):
+        """测试文件校验的统计结果与回调"""
+        path = self.write_file("\n".join(self.EMAILS) + "\n")
+        invalid = []
+        summary = validate_file(path, on_result=lambda email, valid: valid or invalid.append(email))
+        self.assertEqual(summary, {"total": 200, "valid": 100, "invalid": 100})
+        self.assertEqual(set(invalid), {"plainaddress", "user@.com"})
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -1,12 +1,15 @@
 import pygame
+import os
 import sys
+import time
 import random
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from pygame.locals import *
-
-# Initialize pygame
-pygame.init()
-pygame.mixer.init()
+from gomoku_book import OpeningBook
+from replay import GomokuRecorder, new_replay_path
 
 # Game constants
 BOARD_SIZE = 15
@@ -15,6 +18,12 @@ PIECE_RADIUS = 18
 MARGIN = 40
 WINDOW_SIZE = BOARD_SIZE * GRID_SIZE + 2 * MARGIN
 FPS = 60
+AI_TIME_LIMIT = 2.0  # Seconds the AI may think per move
+AI_MOVE_DELAY = 0.5  # Minimum seconds before the AI's stone appears
+AI_MOVE_EVENT = pygame.USEREVENT + 1
+OPENING_BOOK = "opening_book.npy"  # Built with gomoku_book.py; optional
+RECORD_REPLAYS = True  # One replay per game in replays/, see replay_player.py
+GAME_MODES = ("human_vs_human", "human_vs_ai")
 
 # Colors
 BLACK = (0, 0, 0)
@@ -25,11 +34,6 @@ RED = (255, 0, 0)
 GRAY = (200, 200, 200)
 HIGHLIGHT = (255, 215, 0)
 
-# Create game window
-screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
-pygame.display.set_caption('Gomoku')
-clock = pygame.time.Clock()
-
 # Sound effects (placeholder)
 def play_sound(sound_type):
     pass
@@ -102,22 +106,655 @@ class GameState:
             if count >= 5:
                 return True
         return False
+    
+    def copy(self):
+        # Independent state with the same move history
+        new_state = type(self)()
+        for row, col in self.moves:
+            new_state.make_move(row, col)
+        return new_state
+    
+    def is_winning_move(self, row, col, player):
+        # Would placing `player` at the empty cell (row, col) make five?
+        self.board[row][col] = player
+        try:
+            return self.check_win(row, col)
+        finally:
+            self.board[row][col] = 0
+
+# Line-indexed bitboards: every cell belongs to one row, column, diagonal and
+# anti-diagonal line. Each line is stored per player as an int bitmask so that
+# make_move/undo_move flip four bits and check_win tests four small ints.
+_NUM_DIAGS = 2 * BOARD_SIZE - 1
+_LINE_OFFSETS = (0, BOARD_SIZE, 2 * BOARD_SIZE, 2 * BOARD_SIZE + _NUM_DIAGS)
+_NUM_LINES = 2 * BOARD_SIZE + 2 * _NUM_DIAGS
+
+def _five_window(pos, length):
+    # Bit mask of run start positions whose five-cell window covers pos
+    lo = max(0, pos - 4)
+    hi = min(pos, length - 5)
+    if hi < lo:
+        return 0
+    return ((1 << (hi - lo + 1)) - 1) << lo
+
+def _build_cell_lines():
+    cells = []
+    for row in range(BOARD_SIZE):
+        for col in range(BOARD_SIZE):
+            diag = row - col + BOARD_SIZE - 1
+            anti = row + col
+            diag_len = BOARD_SIZE - abs(row - col)
+            anti_len = BOARD_SIZE - abs(anti - (BOARD_SIZE - 1))
+            diag_pos = min(row, col)
+            anti_pos = min(row, BOARD_SIZE - 1 - col)
+            cells.append((
+                (_LINE_OFFSETS[0] + row, 1 << col, _five_window(col, BOARD_SIZE)),
+                (_LINE_OFFSETS[1] + col, 1 << row, _five_window(row, BOARD_SIZE)),
+                (_LINE_OFFSETS[2] + diag, 1 << diag_pos, _five_window(diag_pos, diag_len)),
+                (_LINE_OFFSETS[3] + anti, 1 << anti_pos, _five_window(anti_pos, anti_len)),
+            ))
+    return tuple(cells)
+
+_CELL_LINES = _build_cell_lines()
+# The same (line, bit) pairs flattened, so make/undo can update all four lines
+# without a loop
+_CELL_BITS = tuple(tuple(x for idx, bit, _ in cell for x in (idx, bit)) for cell in _CELL_LINES)
+
+class BitboardGameState(GameState):
+    """GameState with incremental five-in-a-row detection on per-line bitmasks.
+
+    `board` is still kept in sync for drawing and the AI, but it is only ever
+    written: occupancy comes from the flat `cells` bytearray and the mover from
+    `current_player`, so the hot path never indexes the ndarray.
+    """
+    def reset(self):
+        super().reset()
+        self.flat_board = self.board.reshape(-1)  # View of board
+        self.cells = bytearray(BOARD_SIZE * BOARD_SIZE)
+        # Index 0 is unused so lines can be addressed by player number
+        self.lines = [None, [0] * _NUM_LINES, [0] * _NUM_LINES]
+    
+    def make_move(self, row, col):
+        cell = row * BOARD_SIZE + col
+        if self.game_over or self.cells[cell]:
+            return False
+        
+        player = self.current_player
+        lines = self.lines[player]
+        a, a_bit, b, b_bit, c, c_bit, d, d_bit = _CELL_BITS[cell]
+        lines[a] |= a_bit
+        lines[b] |= b_bit
+        lines[c] |= c_bit
+        lines[d] |= d_bit
+        self.cells[cell] = player
+        self.flat_board[cell] = player
+        self.last_move = (row, col)
+        self.moves.append((row, col))
+        
+        if self._forms_five(lines, _CELL_LINES[cell], 0):
+            self.game_over = True
+            self.winner = player
+        elif len(self.moves) == BOARD_SIZE * BOARD_SIZE:
+            self.game_over = True  # Draw
+        
+        self.current_player = 3 - player
+        return True
+    
+    def undo_move(self):
+        if not self.moves:
+            return False
+        
+        row, col = self.moves.pop()
+        cell = row * BOARD_SIZE + col
+        player = 3 - self.current_player  # The side that made the move
+        lines = self.lines[player]
+        a, a_bit, b, b_bit, c, c_bit, d, d_bit = _CELL_BITS[cell]
+        lines[a] ^= a_bit  # The bits are known to be set
+        lines[b] ^= b_bit
+        lines[c] ^= c_bit
+        lines[d] ^= d_bit
+        self.cells[cell] = 0
+        self.flat_board[cell] = 0
+        self.current_player = player
+        self.game_over = False
+        self.winner = None
+        self.last_move = self.moves[-1] if self.moves else None
+        return True
+    
+    def check_win(self, row, col):
+        cell = row * BOARD_SIZE + col
+        player = self.cells[cell]
+        if player == 0:
+            return False
+        return self._forms_five(self.lines[player], _CELL_LINES[cell], 0)
+    
+    def is_winning_move(self, row, col, player):
+        return self._forms_five(self.lines[player], _CELL_LINES[row * BOARD_SIZE + col], 1)
+    
+    @staticmethod
+    def _forms_five(lines, cell_lines, place):
+        for idx, bit, window in cell_lines:
+            m = lines[idx] | (bit if place else 0)
+            if m & (m >> 1) & (m >> 2) & (m >> 3) & (m >> 4) & window:
+                return True
+        return False
+
+# Alpha-beta search
+# Score of a five-cell window holding k stones of one player and none of the
+# other. The evaluation is the sum over all windows, kept incrementally.
+WINDOW_SCORES = (0, 1, 10, 100, 1000, 100000)
+WIN_SCORE = 10000000
+INF = WIN_SCORE + 1
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+MAX_ITERATIVE_DEPTH = 20
+TIME_CHECK_MASK = 15  # Poll the clock when nodes & mask == 0, every 16 nodes
+
+def _window_value(own, opp):
+    if opp == 0:
+        return WINDOW_SCORES[own]
+    if own == 0:
+        return -WINDOW_SCORES[opp]
+    return 0
+
+# Gain for the mover when a stone lands in a window holding (own, opp) stones
+_WINDOW_DELTA = tuple(
+    tuple(_window_value(own + 1, opp) - _window_value(own, opp) if own + opp < 5 else 0
+          for opp in range(6))
+    for own in range(6)
+)
+# (line index, window start) for every five-cell window through each cell
+_CELL_WINDOWS = tuple(
+    tuple((idx, start) for idx, _, window in cell for start in range(window.bit_length())
+          if window >> start & 1)
+    for cell in _CELL_LINES
+)
+# Candidate moves are empty cells within this distance of an existing stone
+_NEIGHBOURHOOD = tuple(
+    tuple(r * BOARD_SIZE + c
+          for r in range(max(0, row - 2), min(BOARD_SIZE, row + 3))
+          for c in range(max(0, col - 2), min(BOARD_SIZE, col + 3)))
+    for row in range(BOARD_SIZE) for col in range(BOARD_SIZE)
+)
+
+_zobrist_rng = random.Random(20250630)
+ZOBRIST = (
+    None,
+    tuple(_zobrist_rng.getrandbits(64) for _ in range(BOARD_SIZE * BOARD_SIZE)),
+    tuple(_zobrist_rng.getrandbits(64) for _ in range(BOARD_SIZE * BOARD_SIZE)),
+)
+
+class TranspositionTable:
+    """Fixed-size hash table of search results indexed by Zobrist key.
+
+    A slot is overwritten when it is empty, holds the same position, was
+    written by an earlier search, or was searched less deeply.
+    """
+    def __init__(self, size=1 << 18):
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+    
+    def new_search(self):
+        self.generation += 1
+    
+    def clear(self):
+        self.slots = [None] * self.size
+    
+    def probe(self, key):
+        entry = self.slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+    
+    def store(self, key, depth, value, flag, move):
+        index = key % self.size
+        old = self.slots[index]
+        if (old is None or old[0] == key or old[5] != self.generation
+                or depth >= old[1]):
+            self.slots[index] = (key, depth, value, flag, move, self.generation)
+
+class SearchTimeout(Exception):
+    pass
+
+class SearchEngine:
+    """Negamax with alpha-beta pruning over a private copy of the game state."""
+    def __init__(self, max_depth=4, max_candidates=10, tt_size=1 << 18):
+        self.max_depth = max_depth
+        self.max_candidates = max_candidates
+        self.tt = TranspositionTable(tt_size)
+        self.nodes = 0
+        self.deadline = None
+        self.stop_event = None
+        self.stats = {}
+    
+    def search(self, game_state, time_limit=None, stop_event=None):
+        # Fixed-depth search, or iterative deepening within time_limit seconds.
+        # Setting stop_event abandons the search as soon as it is noticed.
+        if game_state.game_over:
+            return None
+        pos = self._setup(game_state)
+        self.tt.new_search()
+        self.nodes = 0
+        self.stop_event = stop_event
+        start = time.perf_counter()
+        
+        if time_limit is None:
+            self.deadline = None
+            try:
+                move, value = self._search_root(pos, self.max_depth)
+            except SearchTimeout:
+                return None
+            self._record_stats(start, self.max_depth, value, pos)
+            return move
+        
+        self.deadline = start + time_limit
+        move, value, depth = None, 0, 0
+        for iteration_depth in range(1, MAX_ITERATIVE_DEPTH + 1):
+            # Start from the previous principal variation's first move
+            first = None if move is None else move[0] * BOARD_SIZE + move[1]
+            try:
+                result = self._search_root(pos, iteration_depth, first)
+            except SearchTimeout:
+                break
+            move, value = result
+            depth = iteration_depth
+            if move is None or abs(value) >= WIN_SCORE - MAX_ITERATIVE_DEPTH:
+                break  # Forced result found, deeper search changes nothing
+            if time.perf_counter() >= self.deadline:
+                break
+        
+        # Even depth 1 timed out: fall back to the best-ordered move
+        if move is None and depth == 0:
+            move = divmod(self._ordered_moves(pos)[0], BOARD_SIZE)
+        self._record_stats(start, depth, value, pos)
+        return move
+    
+    def principal_variation(self, pos, max_length=MAX_ITERATIVE_DEPTH):
+        # Follow best moves stored in the transposition table
+        pv = []
+        while len(pv) < max_length and not pos.game_over:
+            entry = self.tt.probe(self.hash)
+            if entry is None or entry[4] is None or pos.board.flat[entry[4]] != 0:
+                break
+            pv.append(divmod(entry[4], BOARD_SIZE))
+            self._play(pos, entry[4])
+        for _ in pv:
+            self._unplay(pos)
+        return pv
+    
+    def _record_stats(self, start, depth, value, pos):
+        elapsed = time.perf_counter() - start
+        self.stats = {
+            "depth": depth,
+            "nodes": self.nodes,
+            "time": elapsed,
+            "nps": self.nodes / elapsed if elapsed > 0 else 0.0,
+            "score": value,
+            "pv": self.principal_variation(pos, depth),
+        }
+    
+    def _setup(self, game_state):
+        pos = BitboardGameState()
+        self.hash = 0
+        self.score = 0  # From black's point of view
+        self.history = []
+        for row, col in game_state.moves:
+            self._play(pos, row * BOARD_SIZE + col)
+        return pos
+    
+    def _move_gain(self, lines, player, cell):
+        own = lines[player]
+        opp = lines[3 - player]
+        gain = 0
+        for idx, start in _CELL_WINDOWS[cell]:
+            gain += _WINDOW_DELTA[(own[idx] >> start & 31).bit_count()][(opp[idx] >> start & 31).bit_count()]
+        return gain
+    
+    def _play(self, pos, cell):
+        player = pos.current_player
+        gain = self._move_gain(pos.lines, player, cell)
+        if player == 2:
+            gain = -gain
+        pos.make_move(*divmod(cell, BOARD_SIZE))
+        self.hash ^= ZOBRIST[player][cell]
+        self.score += gain
+        self.history.append((cell, player, gain))
+        return pos.winner is not None
+    
+    def _unplay(self, pos):
+        cell, player, gain = self.history.pop()
+        pos.undo_move()
+        self.hash ^= ZOBRIST[player][cell]
+        self.score -= gain
+    
+    def _evaluate(self, pos):
+        return self.score if pos.current_player == 1 else -self.score
+    
+    def _candidates(self, pos):
+        if not pos.moves:
+            return [(BOARD_SIZE // 2) * BOARD_SIZE + BOARD_SIZE // 2]
+        board = pos.board.ravel()
+        seen = set()
+        for row, col in pos.moves:
+            seen.update(_NEIGHBOURHOOD[row * BOARD_SIZE + col])
+        return [cell for cell in seen if board[cell] == 0]
+    
+    def _ordered_moves(self, pos, first=None):
+        # Rank by attack plus defence value of each cell, best first
+        player = pos.current_player
+        lines = pos.lines
+        scored = []
+        for cell in self._candidates(pos):
+            if cell == first:
+                continue
+            value = self._move_gain(lines, player, cell) + self._move_gain(lines, 3 - player, cell)
+            scored.append((value, cell))
+        scored.sort(reverse=True)
+        moves = [cell for _, cell in scored[:self.max_candidates]]
+        if first is not None:
+            moves.insert(0, first)
+        return moves
+    
+    def _search_root(self, pos, depth, first=None):
+        alpha, beta = -INF, INF
+        best_move, best_value = None, -INF
+        for cell in self._ordered_moves(pos, first):
+            won = self._play(pos, cell)
+            try:
+                value = WIN_SCORE if won else -self._negamax(pos, depth - 1, -beta, -alpha, 1)
+            finally:
+                self._unplay(pos)  # Also on timeout, so pos is intact for the PV
+            if value > best_value:
+                best_move, best_value = cell, value
+            alpha = max(alpha, value)
+        self.tt.store(self.hash, depth, best_value, EXACT, best_move)
+        if best_move is None:
+            return None, 0
+        return divmod(best_move, BOARD_SIZE), best_value
+    
+    def _should_stop(self):
+        if self.stop_event is not None and self.stop_event.is_set():
+            return True
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+    
+    def _negamax(self, pos, depth, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & TIME_CHECK_MASK and self._should_stop():
+            raise SearchTimeout()
+        if pos.game_over:
+            return 0  # Draw by full board; wins are scored by the parent
+        if depth == 0:
+            return self._evaluate(pos)
+        
+        alpha_orig = alpha
+        tt_move = None
+        entry = self.tt.probe(self.hash)
+        if entry is not None:
+            _, entry_depth, value, flag, tt_move, _ = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER_BOUND:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+        
+        best_move, best_value = None, -INF
+        for cell in self._ordered_moves(pos, tt_move):
+            won = self._play(pos, cell)
+            try:
+                value = WIN_SCORE - ply if won else -self._negamax(pos, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                self._unplay(pos)
+            if value > best_value:
+                best_move, best_value = cell, value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+        
+        if best_value <= alpha_orig:
+            flag = UPPER_BOUND
+        elif best_value >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.tt.store(self.hash, depth, best_value, flag, best_move)
+        return best_value
+
+# Threat-space search
+# Each line's cells by bit position, so a window bit can be mapped back to a cell
+_LINE_CELLS = [[] for _ in range(_NUM_LINES)]
+for _cell, _lines in enumerate(_CELL_LINES):
+    for _idx, _bit, _ in _lines:
+        _pos = _bit.bit_length() - 1
+        _LINE_CELLS[_idx].extend([None] * (_pos + 1 - len(_LINE_CELLS[_idx])))
+        _LINE_CELLS[_idx][_pos] = _cell
+_LINE_CELLS = tuple(tuple(cells) for cells in _LINE_CELLS)
+THREAT_TIME_SHARE = 0.25  # Part of a move's time budget spent on VCF/VCT
+
+class ThreatSolver:
+    """VCF/VCT solver: the attacker only plays fours (VCF) or fours and open
+    threes (VCT), so the tree is far narrower than full-width search.
+
+    Results are cached per position: a proven win is valid at any depth, a
+    failure only up to the depth it was searched to.
+    """
+    def __init__(self, vcf_depth=12, vct_depth=6, max_nodes=20000, cache_size=1 << 16):
+        self.vcf_depth = vcf_depth
+        self.vct_depth = vct_depth
+        self.max_nodes = max_nodes
+        self.cache_size = cache_size
+        self.proven = {}
+        self.nodes = 0
+        self.node_limit = max_nodes
+        self.deadline = None
+        self.stop_event = None
+        self.stats = {}
+    
+    def find_win(self, game_state, time_limit=None, stop_event=None):
+        # Forced win for the side to move as (row, col), VCF first, else None
+        if game_state.game_over:
+            return None
+        start = time.perf_counter()
+        self.deadline = None if time_limit is None else start + time_limit
+        self.stop_event = stop_event
+        self.nodes = 0
+        pos = BitboardGameState()
+        self.hash = 0
+        for row, col in game_state.moves:
+            self._play(pos, row * BOARD_SIZE + col)
+        
+        move, kind = None, None
+        for threes, max_depth in ((False, self.vcf_depth), (True, self.vct_depth)):
+            # Each phase gets its own node budget; running out of time ends both
+            self.node_limit = self.nodes + self.max_nodes
+            try:
+                # Deepen gradually so short wins are found before the budget runs out
+                for depth in range(1, max_depth + 1):
+                    move = self._attack(pos, depth, threes)
+                    if move is not None:
+                        break
+            except SearchTimeout:
+                if self._out_of_time():
+                    break
+                continue
+            if move is not None:
+                kind = "vct" if threes else "vcf"
+                break
+        
+        self.stats = {"nodes": self.nodes, "time": time.perf_counter() - start, "result": kind}
+        return None if move is None else divmod(move, BOARD_SIZE)
+    
+    def _play(self, pos, cell):
+        self.hash ^= ZOBRIST[pos.current_player][cell]
+        pos.make_move(*divmod(cell, BOARD_SIZE))
+    
+    def _unplay(self, pos):
+        row, col = pos.moves[-1]
+        pos.undo_move()
+        self.hash ^= ZOBRIST[pos.current_player][row * BOARD_SIZE + col]
+    
+    def _out_of_time(self):
+        if self.stop_event is not None and self.stop_event.is_set():
+            return True
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+    
+    def _tick(self):
+        self.nodes += 1
+        if self.nodes > self.node_limit:
+            raise SearchTimeout()
+        if not self.nodes & TIME_CHECK_MASK and self._out_of_time():
+            raise SearchTimeout()
+    
+    @staticmethod
+    def _window_cells(lines, player, own_count, line_ids=range(_NUM_LINES)):
+        # Empty cells of windows holding own_count stones of player and none of the opponent
+        own, opp = lines[player], lines[3 - player]
+        cells = {}
+        for idx in line_ids:
+            m = own[idx]
+            if m.bit_count() < own_count:
+                continue
+            o = opp[idx]
+            line_cells = _LINE_CELLS[idx]
+            for start in range(len(line_cells) - 4):
+                w = m >> start & 31
+                if w.bit_count() != own_count or o >> start & 31:
+                    continue
+                empty = ~w & 31
+                while empty:
+                    low = empty & -empty
+                    cell = line_cells[start + low.bit_length() - 1]
+                    cells[cell] = cells.get(cell, 0) + 1
+                    empty ^= low
+        return cells
+    
+    def _five_cells(self, lines, player):
+        return self._window_cells(lines, player, 4)
+    
+    def _four_cells(self, lines, player):
+        # Cells that make a four, those completing several windows first
+        cells = self._window_cells(lines, player, 3)
+        return sorted(cells, key=cells.get, reverse=True)
+    
+    def _open_three_cells(self, lines, player):
+        # A three is open when two windows on its line could each become a four
+        own, opp = lines[player], lines[3 - player]
+        result = []
+        for cell in self._window_cells(lines, player, 2):
+            for idx, bit, window in _CELL_LINES[cell]:
+                m = own[idx] | bit
+                o = opp[idx]
+                count = 0
+                for start in range(window.bit_length()):
+                    if window >> start & 1 and (m >> start & 31).bit_count() == 3 and not o >> start & 31:
+                        count += 1
+                if count >= 2:
+                    result.append(cell)
+                    break
+        return result
+    
+    def _attack(self, pos, depth, threes):
+        self._tick()
+        attacker = pos.current_player
+        lines = pos.lines
+        wins = self._five_cells(lines, attacker)
+        if wins:
+            return next(iter(wins))
+        if depth == 0 or pos.game_over:
+            return None
+        
+        key = (self.hash, threes)
+        cached = self.proven.get(key)
+        if cached is not None and (cached[1] is not None or cached[0] >= depth):
+            return cached[1]
+        
+        result = None
+        threats = self._five_cells(lines, 3 - attacker)
+        if len(threats) <= 1:
+            candidates = self._four_cells(lines, attacker)
+            if threes and not threats:
+                fours = set(candidates)
+                candidates += [cell for cell in self._open_three_cells(lines, attacker) if cell not in fours]
+            if threats:
+                # The only playable threats are the ones that also block
+                candidates = [cell for cell in candidates if cell in threats]
+            for cell in candidates:
+                self._play(pos, cell)
+                try:
+                    won = self._defend(pos, depth - 1, threes, cell)
+                finally:
+                    self._unplay(pos)  # Also when the budget runs out mid-tree
+                if won:
+                    result = cell
+                    break
+        
+        if len(self.proven) >= self.cache_size:
+            del self.proven[next(iter(self.proven))]  # Evict the oldest entry
+        self.proven[key] = (depth, result)
+        return result
+    
+    def _defend(self, pos, depth, threes, last):
+        # True when every defender reply still loses to a further attack
+        self._tick()
+        defender = pos.current_player
+        attacker = 3 - defender
+        lines = pos.lines
+        if self._five_cells(lines, defender):
+            return False  # Defender completes five first
+        fives = self._five_cells(lines, attacker)
+        if len(fives) >= 2:
+            return True
+        if fives:
+            replies = list(fives)
+        else:
+            # Answer an open three by blocking its windows or by a counter four
+            through_last = [idx for idx, _, _ in _CELL_LINES[last]]
+            replies = list(self._window_cells(lines, attacker, 3, through_last))
+            replies += [cell for cell in self._four_cells(lines, defender) if cell not in replies]
+            if not replies:
+                return False
+        
+        for cell in replies:
+            self._play(pos, cell)
+            try:
+                won = self._attack(pos, depth, threes) is not None
+            finally:
+                self._unplay(pos)
+            if not won:
+                return False
+        return True
 
 # Simple AI
 class SimpleAI:
-    def __init__(self, difficulty=1):
-        self.difficulty = difficulty  # 1-easy, 2-medium, 3-hard
+    def __init__(self, difficulty=1, book=None):
+        self.difficulty = difficulty  # 1-easy, 2-medium, 3-hard, 4-search
+        self.engine = SearchEngine() if difficulty >= 4 else None
+        self.solver = ThreatSolver() if difficulty >= 4 else None
+        self.book = book  # OpeningBook consulted before any other logic
     
-    def make_move(self, game_state):
+    def make_move(self, game_state, time_limit=None, stop_event=None):
+        # time_limit (seconds) and stop_event bound the search level; the
+        # others are instant
         if game_state.game_over:
             return None
         
+        if self.book is not None:
+            move = self.book.lookup(game_state)
+            if move is not None:
+                return move
+        
         if self.difficulty == 1:
             return self.random_move(game_state)
         elif self.difficulty == 2:
             return self.defensive_move(game_state)
-        else:
+        elif self.difficulty == 3:
             return self.offensive_move(game_state)
+        else:
+            return self.search_move(game_state, time_limit, stop_event)
     
     def random_move(self, game_state):
         empty_positions = [(i, j) for i in range(BOARD_SIZE) for j in range(BOARD_SIZE) 
@@ -129,13 +766,9 @@ class SimpleAI:
         opponent = 3 - game_state.current_player
         for i in range(BOARD_SIZE):
             for j in range(BOARD_SIZE):
-                if game_state.board[i][j] == 0:
-                    # Simulate opponent's move
-                    game_state.board[i][j] = opponent
-                    if game_state.check_win(i, j):
-                        game_state.board[i][j] = 0  # Revert
-                        return (i, j)
-                    game_state.board[i][j] = 0  # Revert
+                # Simulate opponent's move
+                if game_state.board[i][j] == 0 and game_state.is_winning_move(i, j, opponent):
+                    return (i, j)
         
         # No urgent defense needed, random move
         return self.random_move(game_state)
@@ -145,13 +778,9 @@ class SimpleAI:
         player = game_state.current_player
         for i in range(BOARD_SIZE):
             for j in range(BOARD_SIZE):
-                if game_state.board[i][j] == 0:
-                    # Simulate own move
-                    game_state.board[i][j] = player
-                    if game_state.check_win(i, j):
-                        game_state.board[i][j] = 0  # Revert
-                        return (i, j)
-                    game_state.board[i][j] = 0  # Revert
+                # Simulate own move
+                if game_state.board[i][j] == 0 and game_state.is_winning_move(i, j, player):
+                    return (i, j)
         
         # Try defense
         move = self.defensive_move(game_state)
@@ -160,25 +789,109 @@ class SimpleAI:
         
         # Otherwise random move
         return self.random_move(game_state)
+    
+    def search_move(self, game_state, time_limit=None, stop_event=None):
+        # Look for a forced win first, then run the full alpha-beta search;
+        # throughput is left in self.solver.stats and self.engine.stats
+        started = time.perf_counter()
+        threat_limit = None if time_limit is None else time_limit * THREAT_TIME_SHARE
+        move = self.solver.find_win(game_state, threat_limit, stop_event)
+        if move is not None:
+            return move
+        if time_limit is not None:
+            time_limit = max(0.0, time_limit - (time.perf_counter() - started))
+        return self.engine.search(game_state, time_limit, stop_event)
 
 # Main game class
 class GomokuGame:
     def __init__(self):
-        self.state = GameState()
-        self.ai = SimpleAI(difficulty=2)
+        # pygame is only initialized here so GameState/SimpleAI stay usable headless
+        pygame.init()
+        pygame.mixer.init()
+        self.screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
+        pygame.display.set_caption('Gomoku')
+        self.clock = pygame.time.Clock()
+        self.state = BitboardGameState()
+        book = OpeningBook(OPENING_BOOK) if os.path.exists(OPENING_BOOK) else None
+        self.ai = SimpleAI(difficulty=2, book=book)
         self.game_mode = "human_vs_human"  # "human_vs_human", "human_vs_ai"
         self.running = True
         self.animating = False
         self.animation_pos = None
         self.animation_progress = 0
         self.font = pygame.font.SysFont('Arial', 24)
+        self.build_surfaces()
+        # A single worker keeps the engine (and its TT) used by one search at a time
+        self.ai_executor = ThreadPoolExecutor(max_workers=1)
+        self.ai_future = None
+        self.ai_stop = None
+        self.ai_request = 0
+        self.ai_error = None  # Set when the last search failed and a fallback move was played
+        self.record_replays = RECORD_REPLAYS
+        self.recorder = None
     
     def reset_game(self):
+        self.cancel_ai()
+        self.stop_recording()
         self.state.reset()
         self.animating = False
+        self.ai_error = None
+    
+    def record(self, move):
+        # move is (row, col), or None for an undo; the file is opened on the first action
+        if not self.record_replays:
+            return
+        if self.recorder is None:
+            self.recorder = GomokuRecorder(new_replay_path("gomoku"), BOARD_SIZE,
+                                           GAME_MODES.index(self.game_mode), self.ai.difficulty)
+        if move is None:
+            self.recorder.undo()
+        else:
+            self.recorder.move(*move)
+    
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+    
+    def request_ai_move(self):
+        # Search on a snapshot in the worker; the result comes back as AI_MOVE_EVENT
+        self.cancel_ai()
+        self.ai_request += 1
+        self.ai_error = None
+        self.ai_stop = threading.Event()
+        self.ai_future = self.ai_executor.submit(
+            self.think, self.state.copy(), self.ai_request, self.ai_stop)
+    
+    def think(self, snapshot, request, stop_event):
+        started = time.perf_counter()
+        error = None
+        try:
+            move = self.ai.make_move(snapshot, time_limit=AI_TIME_LIMIT, stop_event=stop_event)
+        except Exception as e:
+            # The main loop reports it and plays a fallback move
+            traceback.print_exc()
+            move, error = None, e
+        remaining = AI_MOVE_DELAY - (time.perf_counter() - started)
+        if remaining > 0 and error is None:
+            stop_event.wait(remaining)
+        if not stop_event.is_set():
+            pygame.event.post(pygame.event.Event(AI_MOVE_EVENT, move=move, request=request,
+                                                 moves=len(snapshot.moves), error=error))
+    
+    def cancel_ai(self):
+        if self.ai_future is not None:
+            self.ai_stop.set()
+            self.ai_future.cancel()
+            self.ai_future = None
+        self.ai_request += 1  # Drop results that were already posted
+    
+    def ai_thinking(self):
+        # Stays true after the worker has posted its move until handle_ai_move plays it
+        return self.ai_future is not None
     
     def handle_click(self, pos):
-        if self.animating or self.state.game_over:
+        if self.animating or self.state.game_over or self.ai_thinking():
             return
         
         x, y = pos
@@ -188,6 +901,7 @@ class GomokuGame:
             
             if 0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE:
                 if self.state.make_move(row, col):
+                    self.record((row, col))
                     play_sound("place")
                     self.animating = True
                     self.animation_pos = (row, col)
@@ -195,26 +909,27 @@ class GomokuGame:
                     
                     # AI turn
                     if self.game_mode == "human_vs_ai" and not self.state.game_over and self.state.current_player == 2:
-                        ai_move = self.ai.make_move(self.state)
-                        if ai_move:
-                            pygame.time.set_timer(AI_MOVE_EVENT, 500)  # 0.5s delay
+                        self.request_ai_move()
     
     def undo_move(self):
+        self.cancel_ai()
         if self.state.undo_move():
+            self.record(None)
             play_sound("undo")
     
-    def draw_board(self):
-        # Draw board background
-        screen.fill(BOARD_COLOR)
+    def build_surfaces(self):
+        # Empty board, drawn once; cells are restored from it when stones change
+        self.board_surface = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
+        self.board_surface.fill(BOARD_COLOR)
         
         # Draw grid lines
         for i in range(BOARD_SIZE):
             # Horizontal lines
-            pygame.draw.line(screen, LINE_COLOR, 
+            pygame.draw.line(self.board_surface, LINE_COLOR, 
                             (MARGIN, MARGIN + i * GRID_SIZE), 
                             (WINDOW_SIZE - MARGIN, MARGIN + i * GRID_SIZE), 2)
             # Vertical lines
-            pygame.draw.line(screen, LINE_COLOR, 
+            pygame.draw.line(self.board_surface, LINE_COLOR, 
                             (MARGIN + i * GRID_SIZE, MARGIN), 
                             (MARGIN + i * GRID_SIZE, WINDOW_SIZE - MARGIN), 2)
         
@@ -222,23 +937,57 @@ class GomokuGame:
         star_points = [(3, 3), (3, 11), (7, 7), (11, 3), (11, 11)]
         for row, col in star_points:
             center = (MARGIN + col * GRID_SIZE, MARGIN + row * GRID_SIZE)
-            pygame.draw.circle(screen, BLACK, center, 5)
-        
-        # Draw pieces
-        for row in range(BOARD_SIZE):
-            for col in range(BOARD_SIZE):
-                center = (MARGIN + col * GRID_SIZE, MARGIN + row * GRID_SIZE)
-                if self.state.board[row][col] == 1:  # Black
-                    pygame.draw.circle(screen, BLACK, center, PIECE_RADIUS)
-                elif self.state.board[row][col] == 2:  # White
-                    pygame.draw.circle(screen, WHITE, center, PIECE_RADIUS)
-                    pygame.draw.circle(screen, BLACK, center, PIECE_RADIUS, 1)
+            pygame.draw.circle(self.board_surface, BLACK, center, 5)
+        
+        # Stone sprites, indexed by player
+        self.stone_sprites = [None]
+        for color in (BLACK, WHITE):
+            sprite = pygame.Surface((PIECE_RADIUS*2, PIECE_RADIUS*2), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, color, (PIECE_RADIUS, PIECE_RADIUS), PIECE_RADIUS)
+            if color == WHITE:
+                pygame.draw.circle(sprite, BLACK, (PIECE_RADIUS, PIECE_RADIUS), PIECE_RADIUS, 1)
+            self.stone_sprites.append(sprite)
+        
+        # Board plus placed stones; everything else is drawn over it per frame
+        self.stone_layer = self.board_surface.copy()
+        self.drawn_board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=int)
+        self.overlay_keys = {}
+        self.overlay_rects = {}
+        self.text_cache = {}
+        self.full_redraw = True
+    
+    def cell_rect(self, row, col):
+        center = (MARGIN + col * GRID_SIZE, MARGIN + row * GRID_SIZE)
+        return pygame.Rect(center[0] - GRID_SIZE // 2, center[1] - GRID_SIZE // 2, GRID_SIZE, GRID_SIZE)
+    
+    def render_text(self, text):
+        if text not in self.text_cache:
+            self.text_cache[text] = self.font.render(text, True, BLACK)
+        return self.text_cache[text]
+    
+    def sync_stones(self, dirty):
+        # Repaint only the cells whose stone differs from what is on the layer
+        for row, col in np.argwhere(self.state.board != self.drawn_board):
+            rect = self.cell_rect(row, col)
+            self.stone_layer.blit(self.board_surface, rect, rect)
+            player = self.state.board[row, col]
+            if player:
+                self.stone_layer.blit(self.stone_sprites[player], (
+                    MARGIN + col * GRID_SIZE - PIECE_RADIUS, MARGIN + row * GRID_SIZE - PIECE_RADIUS))
+            self.drawn_board[row, col] = player
+            dirty.append(rect)
+    
+    def overlays(self):
+        # (name, key, rect, draw) for everything drawn over the stone layer;
+        # an overlay is repainted when its key changes or its area is dirty
+        items = []
         
         # Draw last move marker
         if self.state.last_move:
             row, col = self.state.last_move
             center = (MARGIN + col * GRID_SIZE, MARGIN + row * GRID_SIZE)
-            pygame.draw.circle(screen, RED, center, 5)
+            items.append(("marker", center, pygame.Rect(center[0] - 6, center[1] - 6, 12, 12),
+                          lambda: pygame.draw.circle(self.screen, RED, center, 5)))
         
         # Draw animated piece
         if self.animating and self.animation_pos:
@@ -254,15 +1003,20 @@ class GomokuGame:
             alpha = int(255 * progress)
             
             player = self.state.board[row][col]
-            if player == 1:  # Black
-                s = pygame.Surface((PIECE_RADIUS*2, PIECE_RADIUS*2), pygame.SRCALPHA)
-                pygame.draw.circle(s, (*BLACK, alpha), (PIECE_RADIUS, PIECE_RADIUS), PIECE_RADIUS)
-                screen.blit(s, (animated_center[0] - PIECE_RADIUS, animated_center[1] - PIECE_RADIUS))
-            elif player == 2:  # White
+            top_left = (animated_center[0] - PIECE_RADIUS, animated_center[1] - PIECE_RADIUS)
+            
+            def draw_animation():
                 s = pygame.Surface((PIECE_RADIUS*2, PIECE_RADIUS*2), pygame.SRCALPHA)
-                pygame.draw.circle(s, (*WHITE, alpha), (PIECE_RADIUS, PIECE_RADIUS), PIECE_RADIUS)
-                pygame.draw.circle(s, (*BLACK, alpha), (PIECE_RADIUS, PIECE_RADIUS), PIECE_RADIUS, 1)
-                screen.blit(s, (animated_center[0] - PIECE_RADIUS, animated_center[1] - PIECE_RADIUS))
+                if player == 1:  # Black
+                    pygame.draw.circle(s, (*BLACK, alpha), (PIECE_RADIUS, PIECE_RADIUS), PIECE_RADIUS)
+                elif player == 2:  # White
+                    pygame.draw.circle(s, (*WHITE, alpha), (PIECE_RADIUS, PIECE_RADIUS), PIECE_RADIUS)
+                    pygame.draw.circle(s, (*BLACK, alpha), (PIECE_RADIUS, PIECE_RADIUS), PIECE_RADIUS, 1)
+                self.screen.blit(s, top_left)
+            
+            items.append(("animation", (self.animation_pos, self.animation_progress),
+                          pygame.Rect(int(top_left[0]), int(top_left[1]), PIECE_RADIUS*2 + 1, PIECE_RADIUS*2 + 1),
+                          draw_animation))
             
             self.animation_progress += 1
             if progress >= 1.0:
@@ -279,34 +1033,83 @@ class GomokuGame:
                 status_text = "Draw!"
         else:
             status_text = "Current turn: " + ("Black" if self.state.current_player == 1 else "White")
+            if self.ai_thinking():
+                status_text += " (AI thinking...)"
+        if self.ai_error is not None:
+            status_text += " (AI error, fallback move played)"
         
-        text_surface = self.font.render(status_text, True, BLACK)
-        screen.blit(text_surface, (20, 10))
+        text_surface = self.render_text(status_text)
+        items.append(("status", status_text, text_surface.get_rect(topleft=(20, 10)),
+                      lambda: self.screen.blit(text_surface, (20, 10))))
         
         # Draw buttons
-        pygame.draw.rect(screen, GRAY, (WINDOW_SIZE - 120, 10, 110, 30))
-        reset_text = self.font.render("Restart", True, BLACK)
-        screen.blit(reset_text, (WINDOW_SIZE - 110, 15))
+        def draw_reset():
+            pygame.draw.rect(self.screen, GRAY, (WINDOW_SIZE - 120, 10, 110, 30))
+            self.screen.blit(self.render_text("Restart"), (WINDOW_SIZE - 110, 15))
+        items.append(("reset", True, pygame.Rect(WINDOW_SIZE - 120, 10, 110, 30), draw_reset))
         
         if len(self.state.moves) > 0:
-            pygame.draw.rect(screen, GRAY, (WINDOW_SIZE - 120, 50, 110, 30))
-            undo_text = self.font.render("Undo", True, BLACK)
-            screen.blit(undo_text, (WINDOW_SIZE - 110, 55))
-    
-    def handle_ai_move(self):
-        ai_move = self.ai.make_move(self.state)
-        if ai_move:
-            row, col = ai_move
-            if self.state.make_move(row, col):
-                play_sound("place")
-                self.animating = True
-                self.animation_pos = (row, col)
-                self.animation_progress = 0
+            def draw_undo():
+                pygame.draw.rect(self.screen, GRAY, (WINDOW_SIZE - 120, 50, 110, 30))
+                self.screen.blit(self.render_text("Undo"), (WINDOW_SIZE - 110, 55))
+            items.append(("undo", True, pygame.Rect(WINDOW_SIZE - 120, 50, 110, 30), draw_undo))
+        return items
     
-    def run(self):
-        global AI_MOVE_EVENT
-        AI_MOVE_EVENT = pygame.USEREVENT + 1
+    def draw_board(self):
+        # Returns the screen rects that changed; an idle frame draws nothing
+        dirty = []
+        self.sync_stones(dirty)
+        
+        items = self.overlays()
+        current = {name: (key, rect) for name, key, rect, _ in items}
+        for name, (key, rect) in current.items():
+            if self.overlay_keys.get(name) != key:
+                dirty.append(rect)
+                if name in self.overlay_rects:
+                    dirty.append(self.overlay_rects[name])
+        for name, rect in self.overlay_rects.items():
+            if name not in current:
+                dirty.append(rect)
+        self.overlay_keys = {name: key for name, (key, _) in current.items()}
+        self.overlay_rects = {name: rect for name, (_, rect) in current.items()}
+        
+        if self.full_redraw:
+            dirty = [self.screen.get_rect()]
+            self.full_redraw = False
+        if not dirty:
+            return dirty
         
+        for rect in dirty:
+            self.screen.blit(self.stone_layer, rect, rect)
+        for _, _, rect, draw in items:
+            if rect.collidelist(dirty) != -1:
+                draw()
+        return dirty
+    
+    def handle_ai_move(self, event):
+        if event.request != self.ai_request:
+            return  # Cancelled by restart/undo
+        self.ai_future = None
+        if event.moves != len(self.state.moves):
+            return  # The position changed after the snapshot; the move is for the wrong side
+        ai_move = event.move
+        if event.error is not None or ai_move is None or not self.state.make_move(*ai_move):
+            if self.state.game_over:
+                return
+            # Never leave White's turn to the human: report and play the cheap heuristic instead
+            self.ai_error = repr(event.error) if event.error is not None else f"illegal AI move {ai_move}"
+            print(f"AI move failed ({self.ai_error}), playing a fallback move", file=sys.stderr)
+            ai_move = self.ai.defensive_move(self.state)
+            if ai_move is None or not self.state.make_move(*ai_move):
+                return
+        row, col = ai_move
+        self.record((row, col))
+        play_sound("place")
+        self.animating = True
+        self.animation_pos = (row, col)
+        self.animation_progress = 0
+    
+    def run(self):
         while self.running:
             for event in pygame.event.get():
                 if event.type == QUIT:
@@ -322,8 +1125,7 @@ class GomokuGame:
                         else:
                             self.handle_click(event.pos)
                 elif event.type == AI_MOVE_EVENT:
-                    pygame.time.set_timer(AI_MOVE_EVENT, 0)  # Stop timer
-                    self.handle_ai_move()
+                    self.handle_ai_move(event)
                 elif event.type == KEYDOWN:
                     if event.key == K_r:  # R to restart
                         self.reset_game()
@@ -336,10 +1138,14 @@ class GomokuGame:
                         self.game_mode = "human_vs_ai"
                         self.reset_game()
             
-            self.draw_board()
-            pygame.display.flip()
-            clock.tick(FPS)
+            dirty = self.draw_board()
+            if dirty:
+                pygame.display.update(dirty)
+            self.clock.tick(FPS)
         
+        self.cancel_ai()
+        self.stop_recording()
+        self.ai_executor.shutdown(wait=False)
         pygame.quit()
         sys.exit()
 
@@ -0,0 +1,149 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from gomoko import BOARD_SIZE, GameState, BitboardGameState, SimpleAI
+
+# Reproducible micro-benchmarks for the Gomoku engine hot paths.
+# Every backend and AI level runs on the same seeded positions:
+#   empty    - no stones
+#   midgame  - 60 stones
+#   nearfull - 200 stones
+# and each line reports ops/sec plus p50/p90/p99/max latency per call.
+
+BACKENDS = {
+    "GameState": GameState,
+    "BitboardGameState": BitboardGameState,
+}
+POSITION_SIZES = {"empty": 0, "midgame": 60, "nearfull": 200}
+
+
+def build_position(num_stones, seed):
+    # Random move list with no five in a row, always the same for a seed
+    rng = random.Random(seed)
+    state = BitboardGameState()
+    cells = [(r, c) for r in range(BOARD_SIZE) for c in range(BOARD_SIZE)]
+    rng.shuffle(cells)
+    for row, col in cells:
+        if len(state.moves) == num_stones:
+            break
+        if not state.is_winning_move(row, col, state.current_player):
+            state.make_move(row, col)
+    return list(state.moves)
+
+
+def load(backend, moves):
+    state = backend()
+    for row, col in moves:
+        state.make_move(row, col)
+    return state
+
+
+def percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(name, latencies_ns):
+    latencies = sorted(latencies_ns)
+    total = sum(latencies) or 1
+    ops = len(latencies) * 1e9 / total
+    p50, p90, p99 = (percentile(latencies, q) / 1000 for q in (50, 90, 99))
+    worst = latencies[-1] / 1000
+    print(f"{name:<42}{ops:>14,.0f}{p50:>10.2f}{p90:>10.2f}{p99:>10.2f}{worst:>10.2f}")
+
+
+def bench_make_move(backend, moves, empty_cells, repeat):
+    state = load(backend, moves)
+    latencies = []
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        for row, col in empty_cells:
+            start = clock()
+            state.make_move(row, col)
+            latencies.append(clock() - start)
+            state.undo_move()
+    return latencies
+
+
+def bench_undo_move(backend, moves, empty_cells, repeat):
+    state = load(backend, moves)
+    latencies = []
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        for row, col in empty_cells:
+            state.make_move(row, col)
+            start = clock()
+            state.undo_move()
+            latencies.append(clock() - start)
+    return latencies
+
+
+def bench_check_win(backend, moves, repeat):
+    state = load(backend, moves)
+    latencies = []
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        for row, col in moves:
+            start = clock()
+            state.check_win(row, col)
+            latencies.append(clock() - start)
+    return latencies
+
+
+def bench_ai(backend, moves, difficulty, repeat, seed, time_limit):
+    state = load(backend, moves)
+    latencies = []
+    clock = time.perf_counter_ns
+    for i in range(repeat):
+        random.seed(seed + i)
+        ai = SimpleAI(difficulty)  # Fresh AI so search tables start cold
+        start = clock()
+        ai.make_move(state, time_limit=time_limit)
+        latencies.append(clock() - start)
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Gomoku engine hot paths")
+    parser.add_argument("--backends", default=",".join(BACKENDS),
+                        help="comma separated board backends to compare")
+    parser.add_argument("--levels", default="1,2,3,4", help="comma separated AI difficulties")
+    parser.add_argument("--positions", default=",".join(POSITION_SIZES),
+                        help="comma separated positions to run on")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over each position")
+    parser.add_argument("--ai-repeat", type=int, default=5, help="AI moves timed per position")
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds per search move")
+    parser.add_argument("--seed", type=int, default=1234, help="seed for positions and AIs")
+    args = parser.parse_args(argv)
+
+    backends = [(name, BACKENDS[name]) for name in args.backends.split(",")]
+    levels = [int(level) for level in args.levels.split(",") if level]
+    positions = {name: build_position(POSITION_SIZES[name], args.seed)
+                 for name in args.positions.split(",")}
+
+    print(f"{'benchmark':<42}{'ops/sec':>14}{'p50 us':>10}{'p90 us':>10}{'p99 us':>10}{'max us':>10}")
+    for pos_name, moves in positions.items():
+        occupied = set(moves)
+        empty_cells = [(r, c) for r in range(BOARD_SIZE) for c in range(BOARD_SIZE)
+                       if (r, c) not in occupied]
+        for backend_name, backend in backends:
+            prefix = f"{pos_name}/{backend_name}"
+            summarize(f"{prefix}/make_move",
+                      bench_make_move(backend, moves, empty_cells, args.repeat))
+            summarize(f"{prefix}/undo_move",
+                      bench_undo_move(backend, moves, empty_cells, args.repeat))
+            if moves:
+                summarize(f"{prefix}/check_win",
+                          bench_check_win(backend, moves, args.repeat))
+            for level in levels:
+                summarize(f"{prefix}/ai_level_{level}",
+                          bench_ai(backend, moves, level, args.ai_repeat, args.seed, args.time_limit))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import sys
+import json
+import argparse
+from functools import lru_cache
+
+import numpy as np
+
+# Opening book keyed by a symmetry-folded position hash.
+#
+# A position and its 7 rotations/reflections share one canonical key: the
+# smallest Zobrist hash over the 8 transformed boards. Book moves are stored
+# in that canonical frame and mapped back to the real board on lookup.
+#
+# On disk the book is a single .npy file of fixed-size records sorted by key,
+# loaded with mmap_mode="r" so startup costs nothing and a lookup is one
+# binary search over the mapped pages.
+
+BOOK_DTYPE = np.dtype([
+    ("key", "<u8"),
+    ("move", "<u2"),   # Flat cell index in the canonical frame
+    ("games", "<u4"),
+    ("wins", "<u4"),
+])
+ZOBRIST_SEED = 20250630
+
+
+@lru_cache(maxsize=None)
+def symmetries(size):
+    # perms[k][cell] is where cell lands under symmetry k; inverse maps back
+    n = size - 1
+    transforms = [
+        lambda r, c: (r, c), lambda r, c: (c, n - r),
+        lambda r, c: (n - r, n - c), lambda r, c: (n - c, r),
+        lambda r, c: (r, n - c), lambda r, c: (n - r, c),
+        lambda r, c: (c, r), lambda r, c: (n - c, n - r),
+    ]
+    perms = np.empty((8, size * size), dtype=np.intp)
+    for k, transform in enumerate(transforms):
+        for r in range(size):
+            for c in range(size):
+                tr, tc = transform(r, c)
+                perms[k, r * size + c] = tr * size + tc
+    inverse = np.argsort(perms, axis=1)
+    return perms, inverse
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(size):
+    rng = np.random.default_rng(ZOBRIST_SEED)
+    keys = rng.integers(0, np.iinfo(np.uint64).max, size=(3, size * size),
+                        dtype=np.uint64, endpoint=True)
+    keys[0] = 0  # Empty cells do not contribute
+    return keys
+
+
+def canonical_key(board):
+    """Return (key, k): the canonical hash and the symmetry that produced it."""
+    board = np.asarray(board)
+    size = board.shape[0]
+    perms, _ = symmetries(size)
+    flat = board.ravel()
+    occupied = np.flatnonzero(flat)
+    if occupied.size == 0:
+        return 0, 0
+    hashes = np.bitwise_xor.reduce(zobrist_keys(size)[flat[occupied], perms[:, occupied]], axis=1)
+    k = int(np.argmin(hashes))
+    return int(hashes[k]), k
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.entries = np.load(path, mmap_mode="r")
+        self.keys = self.entries["key"]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, game_state):
+        # Book move for this position as (row, col), or None when out of book
+        board = game_state.board
+        size = board.shape[0]
+        key, k = canonical_key(board)
+        index = int(np.searchsorted(self.keys, key))
+        if index >= len(self.keys) or self.keys[index] != key:
+            return None
+        _, inverse = symmetries(size)
+        cell = int(inverse[k, self.entries["move"][index]])
+        row, col = divmod(cell, size)
+        if board[row, col] != 0:
+            return None  # Hash collision
+        return (row, col)
+
+
+def build_book(games, size, max_ply, min_games):
+    # Aggregate (position, move) results and keep the best-scoring move per position
+    stats = {}
+    perms, _ = symmetries(size)
+    for game in games:
+        board = np.zeros((size, size), dtype=int)
+        for ply, cell in enumerate(game["moves"][:max_ply]):
+            player = 1 if ply % 2 == 0 else 2
+            key, k = canonical_key(board)
+            entry = stats.setdefault((key, int(perms[k, cell])), [0, 0])
+            entry[0] += 1
+            entry[1] += game["winner"] == player
+            board.flat[cell] = player
+
+    best = {}
+    for (key, move), (played, won) in stats.items():
+        if played < min_games:
+            continue
+        score = (won + 1) / (played + 2)
+        if key not in best or score > best[key][0]:
+            best[key] = (score, move, played, won)
+
+    book = np.zeros(len(best), dtype=BOOK_DTYPE)
+    for i, (key, (_, move, played, won)) in enumerate(sorted(best.items())):
+        book[i] = (key, move, played, won)
+    return book
+
+
+def read_games(paths):
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a Gomoku opening book from self-play games")
+    parser.add_argument("games", nargs="+", help="JSONL files written by gomoku_selfplay.py")
+    parser.add_argument("-o", "--output", default="opening_book.npy", help="book file to write")
+    parser.add_argument("--size", type=int, default=15, help="board size")
+    parser.add_argument("--max-ply", type=int, default=10, help="only book the first N moves")
+    parser.add_argument("--min-games", type=int, default=3, help="games a move needs to be booked")
+    args = parser.parse_args(argv)
+
+    book = build_book(read_games(args.games), args.size, args.max_ply, args.min_games)
+    np.save(args.output, book)
+    print(f"Wrote {len(book)} positions to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
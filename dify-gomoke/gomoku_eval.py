@@ -0,0 +1,157 @@
+import numpy as np
+from functools import lru_cache
+
+# Static pattern evaluation for Gomoku boards (0 empty, 1 black, 2 white).
+#
+# Every row, column and diagonal is gathered into one flat array with a wall
+# cell after each line, then classified with five-cell sliding windows. For
+# each player a window is "live" when it holds no opponent stone or wall, i.e.
+# it is still room to make five. A shape is the set of the player's stones in
+# a live window:
+#   - windows seeing the same stone set are one shape (so _XXXX_ is one four)
+#   - a set contained in a neighbouring live window's larger set is part of
+#     that bigger shape and not counted on its own (XXX inside XXXX)
+#   - a shape is open when two or more live windows contain all of its stones:
+#     _XXX__, _X_XX_ and __XX__ can become open fours/threes, while X.XXX,
+#     X..XX or a three with a wall two cells away cannot
+#   - closed fours completing at the same cell (XXXX.X) count once
+# Fives are runs of five or more stones. Window sums come from cumulative sums,
+# so all lines of all boards are classified with a handful of array operations.
+
+WALL = 3
+MAX_STONES = 5
+
+# Score of a shape by [stones][open]; index 0 is closed, 1 is open
+PATTERN_SCORES = np.array([
+    [0, 0],
+    [0, 0],
+    [10, 100],
+    [100, 1000],
+    [1000, 10000],
+    [100000, 100000],
+], dtype=np.int64)
+
+PATTERN_NAMES = {
+    (2, 0): "closed two", (2, 1): "open two",
+    (3, 0): "closed three", (3, 1): "open three",
+    (4, 0): "closed four", (4, 1): "open four",
+    (5, 0): "five",
+}
+
+
+@lru_cache(maxsize=None)
+def line_index(size):
+    # Flat board indices of every line, each followed by the wall index size*size
+    wall = size * size
+    lines = []
+    for r in range(size):
+        lines.append([r * size + c for c in range(size)])
+    for c in range(size):
+        lines.append([r * size + c for r in range(size)])
+    for d in range(-(size - 1), size):
+        lines.append([r * size + r - d for r in range(max(0, d), min(size, size + d))])
+    for s in range(2 * size - 1):
+        lines.append([r * size + s - r for r in range(max(0, s - size + 1), min(size, s + 1))])
+    flat = [wall]
+    for line in lines:
+        flat.extend(line)
+        flat.append(wall)
+    return np.array(flat, dtype=np.intp)
+
+
+def _window_sums(mask):
+    # Number of set cells in each five-cell window starting at 0..len-5
+    sums = np.concatenate(([0], np.cumsum(mask, dtype=np.int32)))
+    return sums[5:] - sums[:-5]
+
+
+def _shift(mask, offset):
+    # mask[j + offset] for every window start j, False past either end
+    count = mask.size - 4
+    out = np.zeros(count, dtype=bool)
+    lo, hi = max(0, -offset), min(count, mask.size - offset)
+    out[lo:hi] = mask[lo + offset:hi + offset]
+    return out
+
+
+def _classify(cells, own):
+    # (window starts, stones, open) of every shape of one player, plus five starts
+    live = _window_sums(~own & (cells != 0)) == 0
+    stones = _window_sums(own)
+    first, last = own[:-4], own[4:]
+    before, after = _shift(own, -1), _shift(own, 5)
+    live_before, live_after = np.insert(live[:-1], 0, False), np.append(live[1:], False)
+
+    fives = np.flatnonzero((stones == 5) & ~before)
+
+    # Part of a bigger shape: the neighbouring window adds a stone and drops none
+    inside = (live_after & after & ~first) | (live_before & before & ~last)
+    shape = live & (stones >= 2) & (stones <= 4)
+    # Same stone set as the previous window: the cells it drops and adds are empty
+    same = shape & np.insert(shape[:-1], 0, False) & ~before & ~last
+    starts = shape & ~same
+    group = np.cumsum(starts)[shape] - 1
+    num = int(starts.sum())
+    windows = np.bincount(group, minlength=num)
+    merged = np.bincount(group, weights=inside[shape], minlength=num) > 0
+    start_index = np.flatnonzero(starts)[~merged]
+    is_open = windows[~merged] >= 2
+
+    # Closed fours that complete at the same cell (XXXX.X) are one threat
+    closed_four = np.flatnonzero((stones[start_index] == 4) & ~is_open)
+    if closed_four.size > 1:
+        window_cells = start_index[closed_four, None] + np.arange(5)
+        gaps = window_cells[np.arange(closed_four.size), np.argmin(own[window_cells], axis=1)]
+        _, first_seen = np.unique(gaps, return_index=True)
+        drop = np.setdiff1d(closed_four, closed_four[first_seen])
+        start_index, is_open = np.delete(start_index, drop), np.delete(is_open, drop)
+    return start_index, stones[start_index], is_open.astype(np.intp), fives
+
+
+def count_patterns_batch(boards):
+    """Count shapes for many boards at once.
+
+    boards has shape (n, size, size). Returns an int array of shape
+    (n, 3, MAX_STONES + 1, 2) indexed by [board, player, stones, open];
+    player 0 is unused and fives are counted at [.., 5, 0].
+    """
+    boards = np.asarray(boards)
+    n, size = boards.shape[0], boards.shape[1]
+    flat = np.empty((n, size * size + 1), dtype=np.int8)
+    flat[:, :-1] = boards.reshape(n, -1)
+    flat[:, -1] = WALL
+    index = line_index(size)
+    cells = flat[:, index].ravel()  # Boards are separated by their wall cells
+    stride = index.size
+
+    per_player = (MAX_STONES + 1) * 2
+    per_board = 3 * per_player
+    keys = []
+    for player in (1, 2):
+        starts, stones, is_open, fives = _classify(cells, cells == player)
+        keys.append((starts // stride) * per_board + player * per_player + stones * 2 + is_open)
+        keys.append((fives // stride) * per_board + player * per_player + MAX_STONES * 2)
+    counts = np.bincount(np.concatenate(keys), minlength=n * per_board)
+    return counts.reshape(n, 3, MAX_STONES + 1, 2)
+
+
+def count_patterns(board):
+    return count_patterns_batch(np.asarray(board)[None])[0]
+
+
+def evaluate_batch(boards, player):
+    # Pattern score of player minus that of the opponent, one value per board
+    counts = count_patterns_batch(boards)
+    scores = (counts * PATTERN_SCORES).sum(axis=(2, 3))
+    return scores[:, player] - scores[:, 3 - player]
+
+
+def evaluate(board, player):
+    return int(evaluate_batch(np.asarray(board)[None], player)[0])
+
+
+def describe(board, player):
+    # Human-readable pattern counts, e.g. {"open three": 1, "closed four": 2}
+    counts = count_patterns(board)[player]
+    return {name: int(counts[stones, is_open])
+            for (stones, is_open), name in PATTERN_NAMES.items() if counts[stones, is_open]}
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from multiprocessing import Pool
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from gomoko import BOARD_SIZE, BitboardGameState, SimpleAI
+
+# Headless AI-vs-AI self-play across a process pool.
+# Each game is written as one JSON line:
+#   {"game": 0, "black": 4, "white": 2, "winner": 1, "moves": [112, 113, ...]}
+# where moves are flat cell indices (row * BOARD_SIZE + col) and winner is
+# 0 for a draw.
+
+_ais = {}  # Per-process AIs, so search engines keep their tables across games
+
+
+def get_ai(difficulty):
+    if difficulty not in _ais:
+        _ais[difficulty] = SimpleAI(difficulty)
+    return _ais[difficulty]
+
+
+def play_game(job):
+    game_id, black, white, seed, time_limit = job
+    random.seed(seed)
+    state = BitboardGameState()
+    players = {1: get_ai(black), 2: get_ai(white)}
+    while not state.game_over:
+        move = players[state.current_player].make_move(state, time_limit=time_limit)
+        if move is None:
+            break
+        if not state.make_move(*move):
+            raise RuntimeError(f"game {game_id}: level {players[state.current_player].difficulty} "
+                               f"played illegal move {move}")
+    return {
+        "game": game_id,
+        "black": black,
+        "white": white,
+        "winner": state.winner or 0,
+        "moves": [row * BOARD_SIZE + col for row, col in state.moves],
+    }
+
+
+def make_jobs(args):
+    for game_id in range(args.games):
+        black, white = args.black, args.white
+        if args.swap and game_id % 2 == 1:
+            black, white = white, black
+        yield (game_id, black, white, args.seed + game_id, args.time_limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Gomoku AI self-play games without a window")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--black", type=int, default=2, help="difficulty of the first player")
+    parser.add_argument("--white", type=int, default=2, help="difficulty of the second player")
+    parser.add_argument("--swap", action="store_true", help="alternate colours every game")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds per search move")
+    parser.add_argument("--seed", type=int, default=0, help="base random seed")
+    parser.add_argument("--output", default="selfplay.jsonl", help="JSONL file to write")
+    args = parser.parse_args(argv)
+
+    wins = {}
+    total_moves = 0
+    start = time.perf_counter()
+    with Pool(args.workers) as pool, open(args.output, "w") as f:
+        for result in pool.imap_unordered(play_game, make_jobs(args), chunksize=4):
+            f.write(json.dumps(result, separators=(",", ":")) + "\n")
+            winner = result["winner"]
+            if winner == 0:
+                key = "draw"
+            elif winner == 1:
+                key = f"black wins (level {result['black']})"
+            else:
+                key = f"white wins (level {result['white']})"
+            wins[key] = wins.get(key, 0) + 1
+            total_moves += len(result["moves"])
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.games} games in {elapsed:.1f}s ({args.games / elapsed:.1f} games/s), "
+          f"{total_moves / max(args.games, 1):.1f} moves/game")
+    for key in sorted(wins):
+        print(f"  {key}: {wins[key]}")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import os
+import time
+import struct
+from collections import namedtuple
+
+# Compact binary replays for Snake and Gomoku.
+#
+# A replay is a fixed header followed by a stream of unsigned LEB128 varints:
+#
+#   header: magic "RPLY", version u8, kind u8, seed u64, n u8, n param bytes
+#
+#   Snake  (params: width, height, wall_mode)
+#     One value per direction change: (ticks since last change << 3) | code,
+#     code 0-3 = up/down/left/right, applied before that update() call.
+#     code 4 ends the recording at that tick and is written whenever a game
+#     ends, by death or by leaving. A file without it was cut short (killed
+#     process, lost buffer) and plays back only up to its last input.
+#
+#   Gomoku (params: board size, mode, AI difficulty)
+#     One value per action: a move is zigzag(cell - previous cell) << 1 where
+#     cell is row * size + col and the first move is relative to the centre;
+#     an undo is the value 1. Every AI move is recorded, so the seed is 0.
+#
+# Most Snake turns and nearby Gomoku moves fit in a single byte, and the
+# Snake seed makes food placement reproducible.
+
+MAGIC = b"RPLY"
+VERSION = 1
+HEADER = struct.Struct("<4sBBQB")
+SNAKE = 1
+GOMOKU = 2
+REPLAY_DIR = "replays"
+
+# Same numbering as snake_sim.DIRECTIONS: up, down, left, right
+SNAKE_CODES = {(0, -1): 0, (0, 1): 1, (-1, 0): 2, (1, 0): 3}
+SNAKE_DIRECTIONS = {code: direction for direction, code in SNAKE_CODES.items()}
+SNAKE_END = 4
+GOMOKU_UNDO = 1
+
+Replay = namedtuple("Replay", ["kind", "seed", "params", "values"])
+
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varints(data):
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    return values  # A truncated trailing value is dropped
+
+
+def zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def unzigzag(z):
+    return z >> 1 if z % 2 == 0 else -(z + 1) // 2
+
+
+def new_replay_path(prefix, directory=REPLAY_DIR):
+    os.makedirs(directory, exist_ok=True)
+    # Names sort in recording order: local time plus the nanoseconds within that second
+    now = time.time_ns()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now // 1000000000))
+    return os.path.join(directory, f"{prefix}-{stamp}-{now % 1000000000:09d}.rpl")
+
+
+class ReplayWriter:
+    def __init__(self, path, kind, seed, params):
+        self.path = path
+        # Buffered, so appending a value is a memory copy rather than a syscall
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, kind, seed, len(params)) + bytes(params))
+        self.buffer = bytearray()
+
+    def write(self, value):
+        self.buffer.clear()
+        encode_varint(value, self.buffer)
+        self.file.write(self.buffer)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class SnakeRecorder:
+    def __init__(self, path, seed, width, height, wall_mode):
+        self.writer = ReplayWriter(path, SNAKE, seed, (width, height, int(wall_mode)))
+        self.ticks = 0
+        self.last_tick = 0
+        self.direction = (1, 0)  # SnakeGame.reset_game starts moving right
+
+    def tick(self, direction):
+        # Called once per update() with the direction the snake is about to move in
+        if direction != self.direction:
+            self.writer.write((self.ticks - self.last_tick) << 3 | SNAKE_CODES[direction])
+            self.direction = direction
+            self.last_tick = self.ticks
+        self.ticks += 1
+
+    def close(self):
+        if not self.writer.file.closed:
+            self.writer.write((self.ticks - self.last_tick) << 3 | SNAKE_END)
+            self.writer.close()
+
+
+class GomokuRecorder:
+    def __init__(self, path, size, mode, difficulty):
+        self.writer = ReplayWriter(path, GOMOKU, 0, (size, mode, difficulty))
+        self.size = size
+        self.last_cell = (size // 2) * size + size // 2
+
+    def move(self, row, col):
+        cell = row * self.size + col
+        self.writer.write(zigzag(cell - self.last_cell) << 1)
+        self.last_cell = cell
+
+    def undo(self):
+        self.writer.write(GOMOKU_UNDO)
+
+    def close(self):
+        self.writer.close()
+
+
+def read_replay(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, kind, seed, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} replay")
+    params = tuple(data[HEADER.size:HEADER.size + count])
+    return Replay(kind, seed, params, decode_varints(data[HEADER.size + count:]))
+
+
+def snake_inputs(replay):
+    # Yield (tick, direction); direction is None for the end-of-game marker
+    tick = 0
+    for value in replay.values:
+        tick += value >> 3
+        code = value & 7
+        yield tick, SNAKE_DIRECTIONS.get(code) if code != SNAKE_END else None
+
+
+def gomoku_actions(replay):
+    # Yield (row, col) for moves and None for undos
+    size = replay.params[0]
+    cell = (size // 2) * size + size // 2
+    for value in replay.values:
+        if value == GOMOKU_UNDO:
+            yield None
+        else:
+            cell += unzigzag(value >> 1)
+            yield divmod(cell, size)
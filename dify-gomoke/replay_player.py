@@ -0,0 +1,185 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+from pygame.locals import QUIT, KEYDOWN
+
+from replay import SNAKE, GOMOKU, SNAKE_END, read_replay, snake_inputs, gomoku_actions
+from tanchishe import SnakeGame, GRID_WIDTH, GRID_HEIGHT
+from gomoko import GomokuGame, BitboardGameState, GAME_MODES
+
+# Plays back replays written by tanchishe.py and gomoko.py.
+#
+#   python replay_player.py replays/            # headless, as fast as possible
+#   python replay_player.py game.rpl --render --speed 4
+#
+# Headless playback re-runs the games' own rules without a window, so a
+# directory of thousands of replays can be checked or mined in seconds.
+
+GOMOKU_MOVE_SECONDS = 0.5  # Time per move at --speed 1
+
+
+class HeadlessSnake(SnakeGame):
+    # SnakeGame's rules without a window, sounds, score saving or recording
+    def __init__(self):
+        self.settings = {"wall_mode": True}
+        self.rng = random.Random()
+        self.dirty_cells = set()
+        self.record_replays = False
+        self.recorder = None
+        self.score_recorded = True
+        self.high_score = 0
+        self.game_state = "MENU"
+        self.eat_sound = self.crash_sound = None
+
+    def play_sound(self, sound):
+        pass
+
+    def record_score(self):
+        pass
+
+
+def run_snake(game, replay, on_tick=None):
+    # Re-simulate a Snake replay on game; returns the number of updates run.
+    # A file without the end marker stops at its last input rather than
+    # running on, since an unsteered snake may never die in wrap mode.
+    width, height, wall_mode = replay.params
+    if (width, height) != (GRID_WIDTH, GRID_HEIGHT):
+        raise ValueError(f"replay grid {width}x{height} does not match {GRID_WIDTH}x{GRID_HEIGHT}")
+    game.settings["wall_mode"] = bool(wall_mode)
+    game.reset_game(seed=replay.seed)
+    game.score_recorded = True  # Replays never reach the leaderboard
+    game.game_state = "PLAYING"
+
+    inputs = snake_inputs(replay)
+    pending = next(inputs, None)
+    tick = 0
+    while game.game_state == "PLAYING":
+        while pending is not None and pending[0] == tick:
+            if pending[1] is None:
+                return tick  # Player left the game here
+            game.next_direction = pending[1]
+            pending = next(inputs, None)
+        if pending is None:
+            break  # Truncated replay
+        game.update()
+        tick += 1
+        if on_tick and on_tick(game) is False:
+            break
+    return tick
+
+
+def run_gomoku(state, replay, on_action=None):
+    for move in gomoku_actions(replay):
+        if move is None:
+            state.undo_move()
+        else:
+            state.make_move(*move)
+        if on_action and on_action(move) is False:
+            break
+    return state
+
+
+def wait_for_close():
+    while pygame.event.wait().type not in (QUIT, KEYDOWN):
+        pass
+
+
+def render_snake(replay, speed):
+    game = SnakeGame()
+    game.record_replays = False
+
+    def show(game):
+        game.draw()
+        if any(event.type == QUIT for event in pygame.event.get()):
+            return False
+        pygame.time.wait(int(game.tick_interval() / speed * 1000))
+
+    run_snake(game, replay, show)
+    game.draw()
+    wait_for_close()
+    pygame.quit()
+
+
+def render_gomoku(replay, speed):
+    game = GomokuGame()
+    game.record_replays = False
+    game.game_mode = GAME_MODES[replay.params[1]]
+
+    def show(move):
+        dirty = game.draw_board()
+        if dirty:
+            pygame.display.update(dirty)
+        if any(event.type == QUIT for event in pygame.event.get()):
+            return False
+        pygame.time.wait(int(GOMOKU_MOVE_SECONDS / speed * 1000))
+
+    run_gomoku(game.state, replay, show)
+    pygame.display.update(game.draw_board())
+    wait_for_close()
+    game.ai_executor.shutdown(wait=False)
+    pygame.quit()
+
+
+def summarize(path, replay, snake):
+    if replay.kind == SNAKE:
+        ticks = run_snake(snake, replay)
+        if snake.game_state == "GAME_OVER":
+            outcome = "died"
+        elif replay.values and replay.values[-1] & 7 == SNAKE_END:
+            outcome = "quit"
+        else:
+            outcome = "truncated"
+        return ticks, f"{path}: snake {outcome} after {ticks} ticks, score {snake.score}, length {len(snake.snake)}"
+    state = run_gomoku(BitboardGameState(), replay)
+    result = f"winner {state.winner}" if state.winner else "no winner"
+    return len(replay.values), f"{path}: gomoku {len(state.moves)} stones, {result}"
+
+
+def find_replays(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".rpl"):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play back Snake and Gomoku replays")
+    parser.add_argument("replays", nargs="+", help="replay files or directories of .rpl files")
+    parser.add_argument("--render", action="store_true", help="show the game in a window")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier when rendering")
+    parser.add_argument("--quiet", action="store_true", help="only print totals in headless mode")
+    args = parser.parse_args(argv)
+
+    paths = list(find_replays(args.replays))
+    if args.render:
+        for path in paths:
+            replay = read_replay(path)
+            if replay.kind == SNAKE:
+                render_snake(replay, args.speed)
+            elif replay.kind == GOMOKU:
+                render_gomoku(replay, args.speed)
+        return
+
+    snake = HeadlessSnake()
+    steps = 0
+    start = time.perf_counter()
+    for path in paths:
+        count, line = summarize(path, read_replay(path), snake)
+        steps += count
+        if not args.quiet:
+            print(line)
+    elapsed = time.perf_counter() - start
+    print(f"{len(paths)} replays, {steps} steps in {elapsed:.2f}s ({steps / max(elapsed, 1e-9):,.0f} steps/s)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from tanchishe import GRID_WIDTH, GRID_HEIGHT, UP, DOWN, LEFT, RIGHT
+
+# 无界面的批量贪吃蛇模拟器：用 NumPy 数组同步推进成千上万局互相独立的游戏。
+# 每调用一次 step() 相当于 SnakeGame.update 中蛇移动一格，规则与其保持一致：
+#   - 不能直接掉头(与 handle_input 相同，掉头指令被忽略)
+#   - wall_mode 为 True 时撞墙死亡，否则穿墙
+#   - 撞到自己(包括尚未移走的尾巴)死亡
+#   - 吃到食物得 10 分并变长，食物在空闲格子中均匀随机生成
+# 动作编号对应 DIRECTIONS 的下标: 0 上, 1 下, 2 左, 3 右
+
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+DX = np.array([d[0] for d in DIRECTIONS], dtype=np.int64)
+DY = np.array([d[1] for d in DIRECTIONS], dtype=np.int64)
+OPPOSITE = np.array([1, 0, 3, 2], dtype=np.int64)
+
+
+class SnakeSimulator:
+    def __init__(self, num_games, wall_mode=True, width=GRID_WIDTH, height=GRID_HEIGHT, seed=None):
+        self.num_games = num_games
+        self.wall_mode = wall_mode
+        self.width = width
+        self.height = height
+        self.num_cells = width * height
+        self.rng = np.random.default_rng(seed)
+
+        n, cells = num_games, self.num_cells
+        self.occupied = np.zeros((n, cells), dtype=bool)
+        # 蛇身环形缓冲区: body[i, head_ptr] 是蛇头, body[i, tail_ptr] 是蛇尾
+        self.body = np.zeros((n, cells), dtype=np.int64)
+        self.head_ptr = np.zeros(n, dtype=np.int64)
+        self.tail_ptr = np.zeros(n, dtype=np.int64)
+        self.head_x = np.zeros(n, dtype=np.int64)
+        self.head_y = np.zeros(n, dtype=np.int64)
+        self.direction = np.zeros(n, dtype=np.int64)
+        self.length = np.zeros(n, dtype=np.int64)
+        self.food = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.alive = np.zeros(n, dtype=bool)
+        self.reset()
+
+    def reset(self, mask=None):
+        # 重新开始被选中的游戏(默认全部)，初始状态与 SnakeGame.reset_game 相同
+        idx = np.arange(self.num_games) if mask is None else np.flatnonzero(mask)
+        if idx.size == 0:
+            return
+        start_x, start_y = self.width // 2, self.height // 2
+        start = start_y * self.width + start_x
+        self.occupied[idx] = False
+        self.occupied[idx, start] = True
+        self.body[idx, 0] = start
+        self.head_ptr[idx] = 0
+        self.tail_ptr[idx] = 0
+        self.head_x[idx] = start_x
+        self.head_y[idx] = start_y
+        self.direction[idx] = DIRECTIONS.index(RIGHT)
+        self.length[idx] = 1
+        self.score[idx] = 0
+        self.steps[idx] = 0
+        self.alive[idx] = True
+        self.food[idx] = self._spawn_food(idx)
+
+    def _spawn_food(self, idx):
+        # 给每个空闲格子一个随机数，取最大者即为均匀随机的空闲格子；没有空位时为 -1
+        keys = self.rng.random((idx.size, self.num_cells))
+        keys[self.occupied[idx]] = -1.0
+        food = keys.argmax(axis=1)
+        food[keys[np.arange(idx.size), food] < 0] = -1
+        return food
+
+    def step(self, actions):
+        """推进所有存活的游戏一步。
+
+        actions: 形状为 (num_games,) 的方向编号数组。
+        返回 (reward, done): 本步得分和本步死亡的布尔掩码。
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        alive = self.alive.copy()
+        reward = np.zeros(self.num_games, dtype=np.int64)
+
+        # 掉头指令无效，保持原方向
+        direction = np.where(actions == OPPOSITE[self.direction], self.direction, actions)
+        self.direction = np.where(alive, direction, self.direction)
+
+        new_x = self.head_x + DX[self.direction]
+        new_y = self.head_y + DY[self.direction]
+        if self.wall_mode:
+            crashed = (new_x < 0) | (new_x >= self.width) | (new_y < 0) | (new_y >= self.height)
+            new_x = np.clip(new_x, 0, self.width - 1)
+            new_y = np.clip(new_y, 0, self.height - 1)
+        else:
+            crashed = np.zeros(self.num_games, dtype=bool)
+            new_x %= self.width
+            new_y %= self.height
+        new_cell = new_y * self.width + new_x
+
+        rows = np.arange(self.num_games)
+        crashed |= self.occupied[rows, new_cell]
+        done = alive & crashed
+        moving = alive & ~crashed
+        self.alive &= ~done
+
+        # 移动蛇头
+        idx = np.flatnonzero(moving)
+        cell = new_cell[idx]
+        self.head_ptr[idx] = (self.head_ptr[idx] + 1) % self.num_cells
+        self.body[idx, self.head_ptr[idx]] = cell
+        self.occupied[idx, cell] = True
+        self.head_x[idx] = new_x[idx]
+        self.head_y[idx] = new_y[idx]
+        self.steps[idx] += 1
+
+        # 没吃到食物的蛇移走尾巴，吃到的变长并得分
+        ate = cell == self.food[idx]
+        grow, move = idx[ate], idx[~ate]
+        self.occupied[move, self.body[move, self.tail_ptr[move]]] = False
+        self.tail_ptr[move] = (self.tail_ptr[move] + 1) % self.num_cells
+        self.length[grow] += 1
+        self.score[grow] += 10
+        reward[grow] = 10
+        if grow.size:
+            self.food[grow] = self._spawn_food(grow)
+        return reward, done
+
+    def cells(self, game):
+        # 某一局蛇身的 (x, y) 列表，从蛇头到蛇尾，便于与 SnakeGame.snake 比较
+        ptrs = (self.head_ptr[game] - np.arange(self.length[game])) % self.num_cells
+        return [(int(c % self.width), int(c // self.width)) for c in self.body[game, ptrs]]
+
+
+def random_policy(sim):
+    return sim.rng.integers(0, len(DIRECTIONS), size=sim.num_games)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量运行无界面贪吃蛇模拟并统计吞吐量")
+    parser.add_argument("--games", type=int, default=4096, help="同时运行的游戏局数")
+    parser.add_argument("--steps", type=int, default=1000, help="推进的步数")
+    parser.add_argument("--no-wall", action="store_true", help="使用穿墙模式")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args(argv)
+
+    sim = SnakeSimulator(args.games, wall_mode=not args.no_wall, seed=args.seed)
+    finished, total_score = 0, 0
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        _, done = sim.step(random_policy(sim))
+        if done.any():
+            finished += int(done.sum())
+            total_score += int(sim.score[done].sum())
+            sim.reset(done)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.games * args.steps / elapsed:,.0f} game steps/s "
+          f"({args.games} games x {args.steps} steps in {elapsed:.2f}s)")
+    if finished:
+        print(f"{finished} games finished, average score {total_score / finished:.1f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import atexit
+import threading
+
+# 贪吃蛇的非阻塞持久化：游戏循环只在内存里改数据并调用 save()，
+# 真正的写盘由后台线程完成：
+#   - 合并写入: 在 delay 秒内的多次 save() 只写最后一次的快照
+#   - 原子替换: 先写同目录下的临时文件并 fsync，再 os.replace 覆盖正式文件，
+#     中途崩溃也不会留下半截 JSON
+#   - 网络盘卡顿只会拖慢后台线程，不会造成掉帧
+
+LEADERBOARD_SIZE = 10
+
+
+class JsonStore:
+    def __init__(self, path, delay=0.5):
+        self.path = path
+        self.delay = delay
+        self.pending = None      # 尚未写盘的最新快照(已序列化的字符串)
+        self.generation = 0      # 每次 save() 加一
+        self.written = 0         # 已落盘的 generation
+        self.closed = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._writer, name=f"store:{path}", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def load(self, default=None):
+        # 启动时同步读取一次；文件不存在或损坏时返回 default
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return default
+
+    def save(self, data):
+        # 在调用线程里序列化，得到不会再被游戏修改的快照；不做任何 IO
+        snapshot = json.dumps(data)
+        with self.cond:
+            self.pending = snapshot
+            self.generation += 1
+            self.cond.notify_all()
+
+    def flush(self, timeout=None):
+        # 等待目前为止的所有 save() 落盘，返回是否在超时前完成
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            target = self.generation
+            self.cond.notify_all()
+            while self.written < target and self.thread.is_alive():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+            return self.written >= target
+
+    def close(self, timeout=2.0):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join(timeout)
+
+    def _writer(self):
+        while True:
+            with self.cond:
+                while self.pending is None and not self.closed:
+                    self.cond.wait()
+                if self.pending is None:
+                    return
+                # 合并: 等到 delay 秒内不再有新的 save()，或者有人在 flush/close
+                while not self.closed:
+                    seen = self.generation
+                    self.cond.wait(self.delay)
+                    if self.generation == seen:
+                        break
+                snapshot, generation = self.pending, self.generation
+                self.pending = None
+            try:
+                self._write(snapshot)
+            except OSError as e:
+                print(f"保存 {self.path} 失败: {e}")
+            with self.cond:
+                self.written = generation
+                self.cond.notify_all()
+
+    def _write(self, snapshot):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        tmp_path = os.path.join(directory, f".{os.path.basename(self.path)}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class Leaderboard:
+    # 前 N 名成绩，保存格式兼容旧版 highscore.json 的 {"high_score": n}
+    def __init__(self, store, size=LEADERBOARD_SIZE):
+        self.store = store
+        self.size = size
+        data = store.load({}) or {}
+        entries = data.get('leaderboard')
+        if entries is None:
+            entries = [{'score': data['high_score'], 'time': 0}] if data.get('high_score') else []
+        self.entries = sorted(entries, key=lambda e: -e['score'])[:size]
+
+    @property
+    def best(self):
+        return self.entries[0]['score'] if self.entries else 0
+
+    def qualifies(self, score):
+        return score > 0 and (len(self.entries) < self.size or score > self.entries[-1]['score'])
+
+    def submit(self, score):
+        # 记录一局成绩，返回名次(从 1 开始)，未上榜返回 None
+        if not self.qualifies(score):
+            return None
+        rank = 0
+        while rank < len(self.entries) and self.entries[rank]['score'] >= score:
+            rank += 1
+        self.entries.insert(rank, {'score': score, 'time': int(time.time())})
+        del self.entries[self.size:]
+        self.store.save({'high_score': self.best, 'leaderboard': self.entries})
+        return rank + 1
@@ -2,13 +2,12 @@
 import pygame
 import random
 import sys
-import json
 import os
+import time
+from collections import deque
 from pygame.locals import *
-
-# 初始化pygame
-pygame.init()
-pygame.mixer.init()
+from snake_store import JsonStore, Leaderboard
+from replay import SnakeRecorder, new_replay_path
 
 # 常量定义
 SCREEN_WIDTH = 400
@@ -17,6 +16,8 @@ GRID_SIZE = 20
 GRID_WIDTH = SCREEN_WIDTH // GRID_SIZE
 GRID_HEIGHT = SCREEN_HEIGHT // GRID_SIZE
 FPS = 60
+MAX_CATCH_UP_TICKS = 5  # 卡顿后最多连续补算的逻辑步数
+RECORD_REPLAYS = True  # 每局写一个回放文件到 replays/，用 replay_player.py 播放
 
 # 颜色定义
 COLOR_BG = (51, 51, 51)        # 背景色
@@ -34,9 +35,11 @@ RIGHT = (1, 0)
 
 class SnakeGame:
     def __init__(self):
+        # 在这里才初始化pygame，这样只导入规则常量(如 snake_sim.py)时不会打开窗口
+        pygame.init()
+        pygame.mixer.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption('Snake Game')
-        self.clock = pygame.time.Clock()
         # 尝试使用支持中文的字体
         try:
             self.font_small = pygame.font.SysFont('PingFang SC', 14)
@@ -48,17 +51,36 @@ class SnakeGame:
             self.font_medium = pygame.font.SysFont(None, 18)
             self.font_large = pygame.font.SysFont(None, 24)
         
+        # 渲染缓存: 文字表面、按钮区域和半透明遮罩只创建一次
+        self.text_cache = {}
+        self.overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+        self.overlay.fill((0, 0, 0, 180))
+        self.buttons = {
+            "MENU": self.build_buttons(["Play Game", "Settings", "Help", "Exit"], 150),
+            "PAUSED": self.build_buttons(["Resume", "Restart", "Main Menu"], 180),
+            "GAME_OVER": self.build_buttons(["Play Again", "Main Menu"], 220),
+        }
+        self.field = None  # 背景+食物+蛇身的画布，只重画变化的格子
+        self.dirty_cells = set()
+        
         # 游戏状态
         self.game_state = "MENU"  # MENU, PLAYING, PAUSED, GAME_OVER
+        self.rng = random.Random()  # 食物位置只来自这个随机源，回放时用种子重现
+        self.record_replays = RECORD_REPLAYS
+        self.recorder = None
         self.direction = RIGHT
         self.next_direction = RIGHT
-        self.snake = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
+        self.init_snake()
         self.food = self.generate_food()
         self.score = 0
-        self.high_score = self.load_high_score()
+        # 最高分和设置都交给后台线程写盘，游戏循环里不做文件IO
+        self.leaderboard = Leaderboard(JsonStore('highscore.json'))
+        self.settings_store = JsonStore('settings.json')
+        self.high_score = self.leaderboard.best
+        self.last_rank = None
+        self.score_recorded = True  # 当前这局的成绩是否已提交
         self.speed_level = 1
-        self.speed = 10  # 初始速度
-        self.frame_count = 0
+        self.speed = 10  # 初始速度(每移动一格所需的帧数，按 FPS 换算成时间)
         
         # 游戏设置
         self.settings = {
@@ -93,53 +115,95 @@ class SnakeGame:
         if self.settings["sound_effects"] and sound:
             sound.play()
     
-    def load_high_score(self):
-        try:
-            with open('highscore.json', 'r') as f:
-                data = json.load(f)
-                return data.get('high_score', 0)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return 0
-    
-    def save_high_score(self):
-        with open('highscore.json', 'w') as f:
-            json.dump({'high_score': self.high_score}, f)
+    def record_score(self):
+        # 每局只提交一次成绩(结束、中途重开或退出时)，只有上榜才会触发一次异步写盘
+        if self.score_recorded:
+            return
+        self.score_recorded = True
+        self.last_rank = self.leaderboard.submit(self.score)
+        self.high_score = max(self.high_score, self.leaderboard.best)
     
     def load_settings(self):
-        try:
-            with open('settings.json', 'r') as f:
-                loaded_settings = json.load(f)
-                for key in self.settings:
-                    if key in loaded_settings:
-                        self.settings[key] = loaded_settings[key]
-        except (FileNotFoundError, json.JSONDecodeError):
-            pass
+        loaded_settings = self.settings_store.load({})
+        if isinstance(loaded_settings, dict):
+            for key in self.settings:
+                if key in loaded_settings:
+                    self.settings[key] = loaded_settings[key]
     
     def save_settings(self):
-        with open('settings.json', 'w') as f:
-            json.dump(self.settings, f)
+        self.settings_store.save(self.settings)
+    
+    def quit(self):
+        # 退出前等待后台线程把未写完的数据落盘
+        self.record_score()
+        self.stop_recording()
+        self.leaderboard.store.close()
+        self.settings_store.close()
+        pygame.quit()
+        sys.exit()
+    
+    def init_snake(self):
+        # 蛇身用双端队列，另用集合记录占用格子，空闲格子用列表+索引表维护
+        start = (GRID_WIDTH // 2, GRID_HEIGHT // 2)
+        self.snake = deque([start])
+        self.occupied = {start}
+        self.free_cells = [(x, y) for x in range(GRID_WIDTH) for y in range(GRID_HEIGHT) if (x, y) != start]
+        self.free_index = {cell: i for i, cell in enumerate(self.free_cells)}
+        self.field = None  # 整个画布需要重建
+    
+    def occupy(self, cell):
+        # O(1) 从空闲列表移除: 与末尾元素交换后弹出
+        self.occupied.add(cell)
+        self.dirty_cells.add(cell)
+        i = self.free_index.pop(cell)
+        last = self.free_cells.pop()
+        if last != cell:
+            self.free_cells[i] = last
+            self.free_index[last] = i
+    
+    def vacate(self, cell):
+        self.occupied.discard(cell)
+        self.dirty_cells.add(cell)
+        self.free_index[cell] = len(self.free_cells)
+        self.free_cells.append(cell)
     
     def generate_food(self):
-        while True:
-            food = (random.randint(0, GRID_WIDTH - 1), random.randint(0, GRID_HEIGHT - 1))
-            if food not in self.snake:
-                return food
+        # 直接从空闲格子中随机取一个，与蛇的长度无关
+        if not self.free_cells:
+            return None  # 蛇已占满整个网格
+        return self.rng.choice(self.free_cells)
     
-    def reset_game(self):
+    def reset_game(self, seed=None):
+        self.record_score()  # 暂停后重开或回主菜单再开的那一局
+        self.stop_recording()
+        if seed is None:
+            seed = random.getrandbits(63)
+        self.rng.seed(seed)
         self.direction = RIGHT
         self.next_direction = RIGHT
-        self.snake = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
+        self.init_snake()
         self.food = self.generate_food()
         self.score = 0
+        self.score_recorded = False
         self.speed_level = 1
         self.speed = 10
-        self.frame_count = 0
+        if self.record_replays:
+            self.recorder = SnakeRecorder(new_replay_path("snake"), seed, GRID_WIDTH, GRID_HEIGHT,
+                                          self.settings["wall_mode"])
     
-    def handle_input(self):
-        for event in pygame.event.get():
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+    
+    def handle_input(self, events=None):
+        # 返回是否收到了需要重绘的事件(鼠标移动除外)
+        redraw = False
+        for event in (pygame.event.get() if events is None else events):
+            if event.type != MOUSEMOTION:
+                redraw = True
             if event.type == QUIT:
-                pygame.quit()
-                sys.exit()
+                self.quit()
             
             elif event.type == MOUSEBUTTONDOWN:
                 if event.button == 1:  # 左键点击
@@ -185,81 +249,54 @@ class SnakeGame:
                     elif event.key == K_ESCAPE:
                         self.game_state = "MENU"
                         self.play_sound(self.button_sound)
+        return redraw
     
     def handle_mouse_click(self, mouse_pos):
         """处理鼠标点击事件"""
-        x, y = mouse_pos
+        clicked = None
+        for i, (text, rect) in enumerate(self.buttons.get(self.game_state, [])):
+            if rect.collidepoint(mouse_pos):
+                clicked = i
+                break
+        if clicked is None:
+            return
         
         if self.game_state == "MENU":
-            # 检查菜单按钮点击
-            button_y_positions = [150, 200, 250, 300]  # Play Game, Settings, Help, Exit
-            button_texts = ["Play Game", "Settings", "Help", "Exit"]
-            
-            for i, (pos_y, text) in enumerate(zip(button_y_positions, button_texts)):
-                text_surface = self.font_medium.render(text, True, COLOR_BUTTON)
-                text_rect = text_surface.get_rect(center=(SCREEN_WIDTH // 2, pos_y))
-                
-                if text_rect.collidepoint(x, y):
-                    if i == 0:  # Play Game
-                        self.game_state = "PLAYING"
-                        self.reset_game()
-                        self.play_sound(self.button_sound)
-                    elif i == 3:  # Exit
-                        pygame.quit()
-                        sys.exit()
-                    break
+            if clicked == 0:  # Play Game
+                self.game_state = "PLAYING"
+                self.reset_game()
+                self.play_sound(self.button_sound)
+            elif clicked == 3:  # Exit
+                self.quit()
         
         elif self.game_state == "PAUSED":
-            # 检查暂停菜单按钮点击
-            button_y_positions = [180, 230, 280]  # Resume, Restart, Main Menu
-            button_texts = ["Resume", "Restart", "Main Menu"]
-            
-            for i, (pos_y, text) in enumerate(zip(button_y_positions, button_texts)):
-                text_surface = self.font_medium.render(text, True, COLOR_BUTTON)
-                text_rect = text_surface.get_rect(center=(SCREEN_WIDTH // 2, pos_y))
-                
-                if text_rect.collidepoint(x, y):
-                    if i == 0:  # Resume
-                        self.game_state = "PLAYING"
-                        self.play_sound(self.button_sound)
-                    elif i == 1:  # Restart
-                        self.game_state = "PLAYING"
-                        self.reset_game()
-                        self.play_sound(self.button_sound)
-                    elif i == 2:  # Main Menu
-                        self.game_state = "MENU"
-                        self.play_sound(self.button_sound)
-                    break
+            if clicked == 0:  # Resume
+                self.game_state = "PLAYING"
+                self.play_sound(self.button_sound)
+            elif clicked == 1:  # Restart
+                self.game_state = "PLAYING"
+                self.reset_game()
+                self.play_sound(self.button_sound)
+            elif clicked == 2:  # Main Menu
+                self.game_state = "MENU"
+                self.play_sound(self.button_sound)
         
         elif self.game_state == "GAME_OVER":
-            # 检查游戏结束菜单按钮点击
-            button_y_positions = [220, 270]  # Play Again, Main Menu
-            button_texts = ["Play Again", "Main Menu"]
-            
-            for i, (pos_y, text) in enumerate(zip(button_y_positions, button_texts)):
-                text_surface = self.font_medium.render(text, True, COLOR_BUTTON)
-                text_rect = text_surface.get_rect(center=(SCREEN_WIDTH // 2, pos_y))
-                
-                if text_rect.collidepoint(x, y):
-                    if i == 0:  # Play Again
-                        self.game_state = "PLAYING"
-                        self.reset_game()
-                        self.play_sound(self.button_sound)
-                    elif i == 1:  # Main Menu
-                        self.game_state = "MENU"
-                        self.play_sound(self.button_sound)
-                    break
+            if clicked == 0:  # Play Again
+                self.game_state = "PLAYING"
+                self.reset_game()
+                self.play_sound(self.button_sound)
+            elif clicked == 1:  # Main Menu
+                self.game_state = "MENU"
+                self.play_sound(self.button_sound)
     
     def update(self):
         if self.game_state != "PLAYING":
             return
         
-        self.frame_count += 1
-        if self.frame_count < self.speed:
-            return
-        
-        self.frame_count = 0
         self.direction = self.next_direction
+        if self.recorder:
+            self.recorder.tick(self.direction)
         
         # 移动蛇
         head_x, head_y = self.snake[0]
@@ -276,66 +313,105 @@ class SnakeGame:
             # 穿墙模式
             new_head = (new_head[0] % GRID_WIDTH, new_head[1] % GRID_HEIGHT)
         
-        if new_head in self.snake:
+        if new_head in self.occupied:
             self.game_over()
             return
         
         # 检查是否吃到食物
         if new_head == self.food:
-            self.snake.insert(0, new_head)
+            self.snake.appendleft(new_head)
+            self.occupy(new_head)
             self.food = self.generate_food()
             self.score += 10
             self.play_sound(self.eat_sound)
             
-            # 更新最高分
+            # 更新最高分(只改显示，成绩在本局结束时才写盘)
             if self.score > self.high_score:
                 self.high_score = self.score
-                self.save_high_score()
             
             # 每10分提高速度
             if self.score % 100 == 0 and self.speed_level < 10:
                 self.speed_level += 1
                 self.speed = max(1, 10 - self.speed_level)
         else:
-            self.snake.insert(0, new_head)
-            self.snake.pop()
+            self.snake.appendleft(new_head)
+            self.occupy(new_head)
+            self.vacate(self.snake.pop())
     
     def game_over(self):
         self.game_state = "GAME_OVER"
+        self.record_score()
+        self.stop_recording()
         self.play_sound(self.crash_sound)
     
-    def draw(self):
-        self.screen.fill(COLOR_BG)
-        
+    def render_text(self, font, text, color):
+        # 按 (字体, 文本, 颜色) 缓存渲染结果，分数变化时才会产生新表面
+        key = (font, text, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) > 256:
+                self.text_cache.clear()
+            surface = self.text_cache[key] = font.render(text, True, color)
+        return surface
+    
+    def build_buttons(self, texts, top):
+        # 按钮区域与绘制位置一致，点击检测直接复用
+        buttons = []
+        for i, text in enumerate(texts):
+            surface = self.render_text(self.font_medium, text, COLOR_BUTTON)
+            rect = surface.get_rect(topleft=(SCREEN_WIDTH // 2 - surface.get_width() // 2, top + i * 50))
+            buttons.append((text, rect))
+        return buttons
+    
+    def draw_buttons(self):
+        for text, rect in self.buttons[self.game_state]:
+            self.screen.blit(self.render_text(self.font_medium, text, COLOR_BUTTON), rect)
+    
+    def build_field(self):
+        self.background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.background.fill(COLOR_BG)
         if self.settings["grid_display"]:
             for x in range(0, SCREEN_WIDTH, GRID_SIZE):
-                pygame.draw.line(self.screen, COLOR_GRID, (x, 0), (x, SCREEN_HEIGHT))
+                pygame.draw.line(self.background, COLOR_GRID, (x, 0), (x, SCREEN_HEIGHT))
             for y in range(0, SCREEN_HEIGHT, GRID_SIZE):
-                pygame.draw.line(self.screen, COLOR_GRID, (0, y), (SCREEN_WIDTH, y))
-        
-        # 绘制食物
-        food_rect = pygame.Rect(
-            self.food[0] * GRID_SIZE, 
-            self.food[1] * GRID_SIZE, 
-            GRID_SIZE, GRID_SIZE
-        )
-        pygame.draw.ellipse(self.screen, COLOR_FOOD, food_rect)
+                pygame.draw.line(self.background, COLOR_GRID, (0, y), (SCREEN_WIDTH, y))
+        self.field = self.background.copy()
+        self.field_grid = self.settings["grid_display"]
+        self.drawn_food = None
+        self.dirty_cells = set(self.occupied)
+    
+    def draw_cell(self, cell):
+        cell_rect = pygame.Rect(cell[0] * GRID_SIZE, cell[1] * GRID_SIZE, GRID_SIZE, GRID_SIZE)
+        self.field.blit(self.background, cell_rect, cell_rect)
+        if cell in self.occupied:
+            # 绘制蛇
+            pygame.draw.rect(self.field, COLOR_SNAKE, cell_rect)
+            pygame.draw.rect(self.field, COLOR_BG, cell_rect, 1)  # 边框
+        elif cell == self.food:
+            # 绘制食物
+            pygame.draw.ellipse(self.field, COLOR_FOOD, cell_rect)
+    
+    def draw(self):
+        if self.field is None or self.field_grid != self.settings["grid_display"]:
+            self.build_field()
         
-        # 绘制蛇
-        for segment in self.snake:
-            segment_rect = pygame.Rect(
-                segment[0] * GRID_SIZE, 
-                segment[1] * GRID_SIZE, 
-                GRID_SIZE, GRID_SIZE
-            )
-            pygame.draw.rect(self.screen, COLOR_SNAKE, segment_rect)
-            pygame.draw.rect(self.screen, COLOR_BG, segment_rect, 1)  # 边框
+        # 只重画蛇头、蛇尾和食物变化过的格子
+        if self.food != self.drawn_food:
+            if self.drawn_food is not None:
+                self.dirty_cells.add(self.drawn_food)
+            if self.food is not None:
+                self.dirty_cells.add(self.food)
+            self.drawn_food = self.food
+        for cell in self.dirty_cells:
+            self.draw_cell(cell)
+        self.dirty_cells.clear()
+        self.screen.blit(self.field, (0, 0))
         
         # 绘制游戏信息
-        score_text = self.font_small.render(f"Score: {self.score}", True, COLOR_TEXT)
-        high_score_text = self.font_small.render(f"High Score: {self.high_score}", True, COLOR_TEXT)
-        speed_text = self.font_small.render(f"Speed: {self.speed_level}", True, COLOR_TEXT)
-        pause_text = self.font_medium.render("Pause (SPACE)", True, COLOR_BUTTON)
+        score_text = self.render_text(self.font_small, f"Score: {self.score}", COLOR_TEXT)
+        high_score_text = self.render_text(self.font_small, f"High Score: {self.high_score}", COLOR_TEXT)
+        speed_text = self.render_text(self.font_small, f"Speed: {self.speed_level}", COLOR_TEXT)
+        pause_text = self.render_text(self.font_medium, "Pause (SPACE)", COLOR_BUTTON)
         
         self.screen.blit(high_score_text, (10, 10))
         self.screen.blit(score_text, (SCREEN_WIDTH - score_text.get_width() - 10, 10))
@@ -354,67 +430,90 @@ class SnakeGame:
     
     def draw_menu(self):
         # 半透明背景
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        self.screen.blit(overlay, (0, 0))
+        self.screen.blit(self.overlay, (0, 0))
         
         # 标题
-        title = self.font_large.render("SNAKE GAME", True, COLOR_TEXT)
+        title = self.render_text(self.font_large, "SNAKE GAME", COLOR_TEXT)
         self.screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 50))
         
         # 菜单选项
-        options = ["Play Game", "Settings", "Help", "Exit"]
-        for i, option in enumerate(options):
-            text = self.font_medium.render(option, True, COLOR_BUTTON)
-            self.screen.blit(text, (
-                SCREEN_WIDTH // 2 - text.get_width() // 2,
-                150 + i * 50
-            ))
+        self.draw_buttons()
     
     def draw_pause_menu(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        self.screen.blit(overlay, (0, 0))
+        self.screen.blit(self.overlay, (0, 0))
         
-        title = self.font_large.render("PAUSED", True, COLOR_TEXT)
+        title = self.render_text(self.font_large, "PAUSED", COLOR_TEXT)
         self.screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 100))
         
-        options = ["Resume", "Restart", "Main Menu"]
-        for i, option in enumerate(options):
-            text = self.font_medium.render(option, True, COLOR_BUTTON)
-            self.screen.blit(text, (
-                SCREEN_WIDTH // 2 - text.get_width() // 2,
-                180 + i * 50
-            ))
+        self.draw_buttons()
     
     def draw_game_over(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        self.screen.blit(overlay, (0, 0))
+        self.screen.blit(self.overlay, (0, 0))
         
-        title = self.font_large.render("GAME OVER", True, COLOR_TEXT)
+        title = self.render_text(self.font_large, "GAME OVER", COLOR_TEXT)
         self.screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 100))
         
-        score_text = self.font_medium.render(f"Your Score: {self.score}", True, COLOR_TEXT)
+        score_text = self.render_text(self.font_medium, f"Your Score: {self.score}", COLOR_TEXT)
         self.screen.blit(score_text, (
             SCREEN_WIDTH // 2 - score_text.get_width() // 2,
             160
         ))
         
-        options = ["Play Again", "Main Menu"]
-        for i, option in enumerate(options):
-            text = self.font_medium.render(option, True, COLOR_BUTTON)
-            self.screen.blit(text, (
-                SCREEN_WIDTH // 2 - text.get_width() // 2,
-                220 + i * 50
+        if self.last_rank:
+            rank_text = self.render_text(self.font_small, f"Leaderboard Rank: #{self.last_rank}", COLOR_TEXT)
+            self.screen.blit(rank_text, (
+                SCREEN_WIDTH // 2 - rank_text.get_width() // 2,
+                190
             ))
+        
+        self.draw_buttons()
+    
+    def tick_interval(self):
+        # 每次逻辑更新(蛇移动一格)的间隔秒数
+        return self.speed / FPS
+    
+    def wait_for_events(self, next_tick):
+        # 没有输入时休眠到下一个逻辑步；不在游戏中时一直等待输入
+        if self.game_state == "PLAYING":
+            wait_ms = int((next_tick - time.perf_counter()) * 1000)
+            events = []
+            if wait_ms > 0:
+                event = pygame.event.wait(wait_ms)
+                if event.type != NOEVENT:
+                    events.append(event)
+        else:
+            events = [pygame.event.wait()]
+        events.extend(pygame.event.get())
+        return events
     
     def run(self):
+        # 固定时间步长: 逻辑按速度等级推进，与渲染帧率无关；只在状态变化或有输入时重绘
+        next_tick = time.perf_counter()
+        dirty = True
         while True:
-            self.handle_input()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
+            if dirty:
+                self.draw()
+                dirty = False
+            
+            events = self.wait_for_events(next_tick)
+            was_playing = self.game_state == "PLAYING"
+            if self.handle_input(events):
+                dirty = True
+            if self.game_state != "PLAYING":
+                continue
+            
+            now = time.perf_counter()
+            if not was_playing:
+                next_tick = now + self.tick_interval()  # 刚开始或刚恢复，从现在起计时
+            ticks = 0
+            while now >= next_tick and self.game_state == "PLAYING":
+                self.update()
+                dirty = True
+                next_tick += self.tick_interval()
+                ticks += 1
+                if ticks >= MAX_CATCH_UP_TICKS:
+                    next_tick = now + self.tick_interval()
+                    break
 
 if __name__ == "__main__":
     game = SnakeGame()
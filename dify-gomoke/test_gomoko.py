@@ -0,0 +1,232 @@
+import io
+import os
+import random
+import contextlib
+import unittest
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+import gomoko
+from gomoko import (AI_MOVE_EVENT, BOARD_SIZE, GRID_SIZE, MARGIN, GameState, BitboardGameState, GomokuGame,
+                    SearchEngine, ThreatSolver)
+from gomoku_bench import build_position
+
+CELLS = [(r, c) for r in range(BOARD_SIZE) for c in range(BOARD_SIZE)]
+
+
+def assert_same_state(test, reference, state):
+    test.assertTrue(np.array_equal(reference.board, state.board))
+    test.assertEqual(reference.current_player, state.current_player)
+    test.assertEqual(reference.game_over, state.game_over)
+    test.assertEqual(reference.winner, state.winner)
+    test.assertEqual(reference.last_move, state.last_move)
+    test.assertEqual(reference.moves, state.moves)
+
+
+class TestBitboardGameState(unittest.TestCase):
+    def test_random_games_match_game_state(self):
+        """Random games with undos give the same state as the array backend"""
+        rng = random.Random(1)
+        for _ in range(100):
+            reference, state = GameState(), BitboardGameState()
+            for _ in range(rng.randint(1, 150)):
+                if reference.moves and rng.random() < 0.2:
+                    self.assertEqual(reference.undo_move(), state.undo_move())
+                else:
+                    row, col = rng.choice(CELLS)
+                    self.assertEqual(reference.make_move(row, col), state.make_move(row, col))
+                assert_same_state(self, reference, state)
+                if reference.game_over:
+                    break
+            for row, col in rng.sample(CELLS, 20):
+                if reference.board[row][col] == 0:
+                    for player in (1, 2):
+                        self.assertEqual(reference.is_winning_move(row, col, player),
+                                         state.is_winning_move(row, col, player))
+                else:
+                    self.assertEqual(reference.check_win(row, col), state.check_win(row, col))
+            while reference.moves:
+                reference.undo_move()
+                state.undo_move()
+            assert_same_state(self, reference, state)
+            self.assertEqual(state.lines, BitboardGameState().lines)
+
+    def test_five_in_each_direction(self):
+        """Five in a row on every line direction, including the board edges"""
+        lines = [
+            [(0, c) for c in range(5)],
+            [(r, BOARD_SIZE - 1) for r in range(5, 10)],
+            [(10 + i, 10 + i) for i in range(5)],
+            [(i, 4 - i) for i in range(5)],
+        ]
+        filler = [(7, c) for c in range(0, 14, 2)] + [(9, c) for c in range(0, 14, 2)]
+        for line in lines:
+            with self.subTest(line=line):
+                state = BitboardGameState()
+                others = [cell for cell in filler if cell not in line]
+                for black, white in zip(line, others):
+                    state.make_move(*black)
+                    if not state.game_over:
+                        state.make_move(*white)
+                self.assertTrue(state.game_over)
+                self.assertEqual(state.winner, 1)
+
+    def test_occupied_cell_and_finished_game_are_rejected(self):
+        state = BitboardGameState()
+        self.assertTrue(state.make_move(7, 7))
+        self.assertFalse(state.make_move(7, 7))
+        self.assertEqual(state.moves, [(7, 7)])
+        self.assertEqual(state.current_player, 2)
+
+
+def load_position(num_stones, seed):
+    state = BitboardGameState()
+    for row, col in build_position(num_stones, seed):
+        state.make_move(row, col)
+    return state
+
+
+class TestSearchEngine(unittest.TestCase):
+    def test_interrupted_search_unwinds_position(self):
+        """A search stopped mid-tree leaves the engine at the root position"""
+        for seed in range(4):
+            with self.subTest(seed=seed):
+                state = load_position(40, seed)
+                engine = SearchEngine()
+                # Stop deterministically after a node budget instead of a wall clock
+                engine._should_stop = lambda: engine.nodes > 3000
+                move = engine.search(state, time_limit=60)
+                root = SearchEngine()
+                root._setup(state)
+                self.assertEqual(engine.hash, root.hash)
+                self.assertEqual(engine.score, root.score)
+                self.assertEqual(engine.history, root.history)
+                stats = engine.stats
+                self.assertGreaterEqual(stats["depth"], 1)
+                self.assertEqual(stats["pv"][0], move)
+                self.assertLessEqual(len(stats["pv"]), stats["depth"])
+
+
+class TestThreatSolver(unittest.TestCase):
+    def test_node_budget_timeout_leaves_position_unchanged(self):
+        """Every phase starts from the real position even after a budget timeout"""
+        solver = ThreatSolver(max_nodes=50)
+        attack = solver._attack
+        roots = []
+        nesting = [0]
+
+        def traced_attack(pos, depth, threes):
+            if nesting[0] == 0:
+                roots.append((pos.board.copy(), list(pos.moves)))
+            nesting[0] += 1
+            try:
+                return attack(pos, depth, threes)
+            finally:
+                nesting[0] -= 1
+
+        solver._attack = traced_attack
+        for seed in range(40):
+            for stones in (30, 60):
+                state = load_position(stones, seed)
+                roots.clear()
+                move = solver.find_win(state)
+                for board, moves in roots:
+                    self.assertEqual(moves, state.moves)
+                    self.assertTrue(np.array_equal(board, state.board))
+                if move is not None:
+                    self.assertEqual(state.board[move], 0)
+
+    def test_finds_four_to_five(self):
+        state = BitboardGameState()
+        for move in [(7, 3), (0, 0), (7, 4), (0, 2), (7, 5), (0, 4), (7, 6), (14, 14)]:
+            state.make_move(*move)
+        self.assertIn(ThreatSolver().find_win(state), [(7, 2), (7, 7)])
+
+
+class ScriptedAI:
+    """Plays the given moves in order; an exception instance is raised instead"""
+
+    def __init__(self, moves):
+        self.moves = list(moves)
+        self.difficulty = 2
+
+    def make_move(self, game_state, time_limit=None, stop_event=None):
+        move = self.moves.pop(0)
+        if isinstance(move, Exception):
+            raise move
+        return move
+
+    def defensive_move(self, game_state):
+        return gomoko.SimpleAI().defensive_move(game_state)
+
+
+class TestGomokuGameAI(unittest.TestCase):
+    def setUp(self):
+        self.delay = gomoko.AI_MOVE_DELAY
+        gomoko.AI_MOVE_DELAY = 0
+        self.game = GomokuGame()
+        self.game.record_replays = False
+        self.game.game_mode = "human_vs_ai"
+        pygame.event.clear()
+
+    def tearDown(self):
+        self.game.cancel_ai()
+        self.game.ai_executor.shutdown(wait=True)
+        gomoko.AI_MOVE_DELAY = self.delay
+        pygame.quit()
+
+    def click(self, row, col):
+        self.game.animating = False
+        self.game.handle_click((MARGIN + col * GRID_SIZE, MARGIN + row * GRID_SIZE))
+
+    def wait_for_ai(self):
+        # Let the worker finish and post its event, but do not handle it yet
+        self.game.ai_future.result(timeout=10)
+        return [event for event in pygame.event.get() if event.type == AI_MOVE_EVENT]
+
+    def test_click_after_move_is_posted_is_ignored(self):
+        """Between the worker posting its move and the main loop playing it, clicks do nothing"""
+        self.game.ai = ScriptedAI([(8, 8)])
+        self.click(7, 7)
+        events = self.wait_for_ai()
+        self.assertTrue(self.game.ai_future.done())
+        self.click(3, 3)
+        self.assertEqual(self.game.state.moves, [(7, 7)])
+        for event in events:
+            self.game.handle_ai_move(event)
+        self.assertEqual(self.game.state.moves, [(7, 7), (8, 8)])
+        self.assertEqual(self.game.state.current_player, 1)
+        self.assertFalse(self.game.ai_thinking())
+
+    def test_result_for_an_older_position_is_discarded(self):
+        self.game.ai = ScriptedAI([(8, 8)])
+        self.click(7, 7)
+        events = self.wait_for_ai()
+        self.game.state.make_move(0, 0)  # The position moved on without cancelling the search
+        for event in events:
+            self.game.handle_ai_move(event)
+        self.assertEqual(self.game.state.moves, [(7, 7), (0, 0)])
+        self.assertFalse(self.game.ai_thinking())
+
+    def test_failed_search_is_reported_and_white_still_moves(self):
+        """An exception in the search plays a fallback move instead of handing White to the human"""
+        self.game.ai = ScriptedAI([RuntimeError("search failed"), (9, 9)])
+        self.click(7, 7)
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            for event in self.wait_for_ai():
+                self.game.handle_ai_move(event)
+        self.assertIn("search failed", stderr.getvalue())
+        self.assertIn("search failed", self.game.ai_error)
+        self.assertEqual(len(self.game.state.moves), 2)
+        self.assertEqual(self.game.state.current_player, 1)
+        self.click(0, 0)
+        self.assertEqual(self.game.state.moves[-1], (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
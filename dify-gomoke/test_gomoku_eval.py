@@ -0,0 +1,92 @@
+import unittest
+
+import numpy as np
+
+from gomoku_eval import count_patterns_batch, describe, evaluate, evaluate_batch
+
+SIZE = 15
+STONES = {".": 0, "X": 1, "O": 2}
+
+
+def board_from(rows, top=5):
+    # Rows of ".XO" drawn from column 0 of row `top` downwards
+    board = np.zeros((SIZE, SIZE), dtype=int)
+    for r, row in enumerate(rows):
+        for c, ch in enumerate(row):
+            board[top + r, c] = STONES[ch]
+    return board
+
+
+def rotate(board):
+    # The same shapes on a column instead of a row
+    return board.T.copy()
+
+
+class TestPatterns(unittest.TestCase):
+    CASES = [
+        ("..XXXXX..", {"five": 1}),
+        ("..XXXXXX..", {"five": 1}),
+        ("..XXXX...", {"open four": 1}),
+        ("OXXXX....", {"closed four": 1}),
+        (".X.XXX...", {"closed four": 1}),
+        (".XX.XX...", {"closed four": 1}),
+        (".XXX.X...", {"closed four": 1}),
+        ("OXXXX.X..", {"closed four": 1}),
+        ("X.XXX.X..", {"closed four": 2}),
+        ("..XXX....", {"open three": 1}),
+        (".X.XX....", {"open three": 1}),
+        (".XX.X....", {"open three": 1}),
+        ("OXXX.....", {"closed three": 1}),
+        ("OX.XX....", {"closed three": 1}),
+        (".X..XX...", {"closed three": 1}),
+        ("X.X.X....", {"closed three": 1}),
+        ("...XX....", {"open two": 1}),
+        (".X.X.....", {"open two": 1}),
+        (".X..X....", {"open two": 1}),
+        ("OXX......", {"closed two": 1}),
+        ("X...X....", {"closed two": 1}),
+        ("....X....", {}),
+    ]
+
+    def test_each_pattern_name(self):
+        for row, expected in self.CASES:
+            with self.subTest(row=row):
+                self.assertEqual(describe(board_from([row]), 1), expected)
+
+    def test_columns_and_colours(self):
+        for row, expected in self.CASES:
+            swapped = row.replace("X", "x").replace("O", "X").replace("x", "O")
+            with self.subTest(row=row):
+                self.assertEqual(describe(rotate(board_from([swapped])), 2), expected)
+
+    def test_diagonals(self):
+        board = np.zeros((SIZE, SIZE), dtype=int)
+        for i in range(1, 4):
+            board[4 + i, 4 + i] = 1      # open three on the diagonal
+            board[12 - i, 1 + i] = 2     # open three on the anti-diagonal
+        self.assertEqual(describe(board, 1), {"open three": 1})
+        self.assertEqual(describe(board, 2), {"open three": 1})
+
+    def test_no_room_for_five(self):
+        """Shapes that can never become five are worthless"""
+        for row in ("OXXXO", "OXXXXO", "O.XX.O"):
+            with self.subTest(row=row):
+                self.assertEqual(describe(board_from([row]), 1), {})
+
+    def test_board_edge_counts_as_blocked(self):
+        self.assertEqual(describe(board_from(["XXXX."]), 1), {"closed four": 1})
+        self.assertEqual(describe(board_from(["XXX..."]), 1), {"closed three": 1})
+
+    def test_batch_matches_single(self):
+        rng = np.random.default_rng(0)
+        boards = rng.choice(3, size=(20, SIZE, SIZE), p=[0.7, 0.15, 0.15])
+        counts = count_patterns_batch(boards)
+        scores = evaluate_batch(boards, 1)
+        for i, board in enumerate(boards):
+            self.assertTrue(np.array_equal(counts[i], count_patterns_batch(board[None])[0]))
+            self.assertEqual(scores[i], evaluate(board, 1))
+            self.assertEqual(evaluate(board, 2), -evaluate(board, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()